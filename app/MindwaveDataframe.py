@@ -5,88 +5,264 @@
 # Read all CSV files previously saved in "folder_path" by the MindWave device 
 # and merge them on a CSV file stored at "output_filename" after running "merge_csv_files()" function. 
 # This code also has the function "db_preprocessing()" that executes basic data cleaning routines. 
-# Run the code by toggle off comments at Export Dataframe section. 
+# Run the code (python MindwaveDataframe.py) to merge the new files and write the
+# cleaned data to "cleaned_filename", chunk by chunk so any database size fits in memory.
 
-import pandas as pd
+import concurrent.futures
+import glob
+import json
 import os
+import pandas as pd
 
 
 # ==================================================
 #   Merge DataFrame and save "MindwaveDB.csv" file
 # ==================================================
 
-# Merges all CSV files in a folder into a single CSV file, skipping specified files.
+# Merges the CSV files written by the recordings (named "*-MindwaveData.csv")
+# in a folder into a single CSV file. Any other CSV file in the folder, like
+# the merged or the cleaned database, is never read as input.
+# The merge is incremental: a manifest next to the output file remembers the
+# files already merged (name, size, modification time and row count), and
+# only new files are read and appended. If a merged file was changed or
+# deleted, or the output file doesn't match the manifest, everything is
+# merged again from scratch.
 # Args:
 # - folder_path: The path to the folder containing the CSV files.
 # - output_filename: The name of the output CSV file.
+# - workers: Processes that read new files in parallel, all cores by default.
+# - full_rebuild: Ignores the manifest and merges every file again.
 
 folder_path = "output_files/"
 output_filename = folder_path + "MindwaveDB.csv"
+manifest_suffix = ".manifest.json"
+data_filename_pattern = "*-MindwaveData.csv"
+# Doesn't match data_filename_pattern, so it is never merged back.
+cleaned_filename = folder_path + "MindwaveDB_clean.csv"
 
-def merge_csv_files(folder_path, output_filename):
+def merge_csv_files(folder_path, output_filename, workers=None, full_rebuild=False):
 
-    # Get all valid filenames and sort them in ascending order
-    all_dataframes = []
-    filenames = [filename for filename in os.listdir(folder_path) 
-                 if filename.endswith(".csv") and filename not in (
-                    "history.csv", "MindwaveDB.csv")]
-    filenames.sort()  
+    # Get the filenames of the recordings and sort them in ascending order
+    filenames = sorted(os.path.basename(filepath)
+                       for filepath in glob.glob(os.path.join(glob.escape(folder_path), data_filename_pattern)))
+    file_states = {filename: file_state(os.path.join(folder_path, filename)) for filename in filenames}
 
-    # Read the files from before and store their values in "all_dataframes" array
-    for filename in filenames:
-        filepath = os.path.join(folder_path, filename)
-        try:
-            df = pd.read_csv(filepath)
-            all_dataframes.append(df)
-            print(f"Archivo '{filename}' cargado correctamente.")
-        except pd.errors.EmptyDataError:
-            print(f"Advertencia: El archivo '{filename}' está vacío y se omitirá.")
-        except pd.errors.ParserError:
-            print(f"Error: No se pudo analizar el archivo '{filename}'. Se omitirá.")
-
-    # Convert "all_dataframes" array into a DataFrame and export it to "MindwaveDB.csv"
-    if all_dataframes:
-        merged_df = pd.concat(all_dataframes, ignore_index=True)
-        merged_df.to_csv(output_filename, index=False)
-        print(f"\nArchivos CSV combinados y guardados en '{output_filename}'.\n")
-    else:
-        print("\nNo se encontraron archivos CSV válidos para combinar.\n")
+    # Decides which files still have to be merged.
+    manifest = read_manifest(output_filename)
+    if not full_rebuild and not manifest_is_valid(manifest, output_filename, file_states):
+        if manifest is not None or os.path.exists(output_filename):
+            print("El archivo combinado no coincide con los archivos CSV, se combinarán todos de nuevo.")
+        full_rebuild = True
+    if full_rebuild:
+        manifest = {"output_size": 0, "columns": None, "files": {}}
+        if os.path.exists(output_filename):
+            os.remove(output_filename)
+    new_filenames = [filename for filename in filenames if filename not in manifest["files"]]
+
+    if not new_filenames:
+        write_manifest(manifest, output_filename)
+        print("\nNo hay archivos CSV nuevos para combinar.\n")
+        return
+
+    # Read the new files, in parallel if there is more than one, and append
+    # them to the output file in ascending order.
+    filepaths = [os.path.join(folder_path, filename) for filename in new_filenames]
+    merged_rows = 0
+    for filename, df, error in read_csv_files(filepaths, workers):
+        if error is not None:
+            print(error)
+            continue
+        if manifest["columns"] is None:
+            manifest["columns"] = list(df.columns)
+        elif list(df.columns) != manifest["columns"]:
+            print(f"Advertencia: Las columnas del archivo '{filename}' no coinciden, se ordenarán como en el archivo combinado.")
+            df = df.reindex(columns=manifest["columns"])
+        df.to_csv(output_filename, mode="a", index=False, header=(manifest["output_size"] == 0))
+        manifest["output_size"] = os.path.getsize(output_filename)
+        manifest["files"][filename] = dict(file_states[filename], rows=len(df))
+        merged_rows += len(df)
+        print(f"Archivo '{filename}' cargado correctamente.")
+
+    # Saves the manifest after the data, so a crash in between is noticed
+    # by the output size and repaired on the next run.
+    write_manifest(manifest, output_filename)
+    print(f"\n{merged_rows} filas nuevas combinadas y guardadas en '{output_filename}'.\n")
+
+
+# Size and modification time identify a version of a file.
+def file_state(filepath):
+    file_stat = os.stat(filepath)
+    return {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns}
+
+
+def read_manifest(output_filename):
+    try:
+        with open(output_filename + manifest_suffix) as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_manifest(manifest, output_filename):
+    temp_filename = output_filename + manifest_suffix + ".part"
+    with open(temp_filename, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(temp_filename, output_filename + manifest_suffix)
+
+
+# The manifest can be used if the output file is the one it describes and
+# none of the files merged into it has changed.
+def manifest_is_valid(manifest, output_filename, file_states):
+    if manifest is None or not os.path.exists(output_filename):
+        return False
+    if os.path.getsize(output_filename) != manifest["output_size"]:
+        return False
+    for filename, merged_state in manifest["files"].items():
+        current_state = file_states.get(filename)
+        if current_state is None or current_state["size"] != merged_state["size"] \
+                or current_state["mtime_ns"] != merged_state["mtime_ns"]:
+            return False
+    return True
+
+
+# Reads one CSV file, returns (filename, DataFrame, error message).
+def read_csv_file(filepath):
+    filename = os.path.basename(filepath)
+    try:
+        return filename, pd.read_csv(filepath), None
+    except pd.errors.EmptyDataError:
+        return filename, None, f"Advertencia: El archivo '{filename}' está vacío y se omitirá."
+    except pd.errors.ParserError:
+        return filename, None, f"Error: No se pudo analizar el archivo '{filename}'. Se omitirá."
 
 
-# ===============================
-#   Run merge and export script
-# ===============================
+# Yields the results of read_csv_file() in the order of filepaths, reading
+# with several processes when there is more than one file.
+def read_csv_files(filepaths, workers=None):
+    if workers == 1 or len(filepaths) == 1:
+        yield from map(read_csv_file, filepaths)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(read_csv_file, filepaths)
 
-merge_csv_files(folder_path, output_filename)
+
+# ==================================================
+#   Load Parquet/Feather session files (optional)
+# ==================================================
+
+# Loads all session files written by columnarWriter in a folder into one
+# DataFrame, keeping their column types. Needs pyarrow.
+# Args:
+# - folder_path: The path to the folder containing the session files.
+# - columns: The columns to read, all by default. Leaving out "raw_values"
+#   makes loading much faster.
+
+def load_session_files(folder_path, columns=None):
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    all_dataframes = []
+    filenames = sorted(filename for filename in os.listdir(folder_path)
+                       if filename.endswith((".parquet", ".feather")))
+    for filename in filenames:
+        filepath = os.path.join(folder_path, filename)
+        if filename.endswith(".parquet"):
+            table = pq.read_table(filepath, columns=columns)
+        else:
+            table = feather.read_table(filepath, columns=columns)
+        all_dataframes.append(table.to_pandas())
+        print(f"Archivo '{filename}' cargado correctamente.")
+
+    if all_dataframes:
+        return pd.concat(all_dataframes, ignore_index=True)
+    return pd.DataFrame(columns=columns)
 
 
 # =========================
 #   Data Cleaning actions
 # =========================
 
-def db_preproccesing():
-    # Load the merged CSV file into a pandas DataFrame
-    df = pd.read_csv(folder_path + "MindwaveDB.csv")
+# Columns dropped by the data cleaning. The unread ones are not even
+# parsed; 'amount_of_noise' is read because the filter needs it.
+dropped_columns = ['date_time', 'blink', 'amount_of_noise', 'sample_index']
+unread_columns = ('date_time', 'blink', 'raw_values', 'sample_index')
+
+# Column types of MindwaveDB.csv. Nullable types, because the first rows
+# of a test may have no attention or meditation values yet.
+csv_dtypes = {
+    'delta': 'UInt32', 'theta': 'UInt32', 'low_alpha': 'UInt32', 'high_alpha': 'UInt32',
+    'low_beta': 'UInt32', 'high_beta': 'UInt32', 'low_gamma': 'UInt32', 'mid_gamma': 'UInt32',
+    'raw_value': 'Int16', 'attention': 'UInt8', 'meditation': 'UInt8',
+    'amount_of_noise': 'UInt8', 'category': 'UInt8'
+}
 
+# Cleans one chunk of the database.
+def clean_chunk(df):
     # Remove rows where 'amount_of_noise' is greater than 0, 
     # and where 'meditation' and 'attention' have a value of 0. Resets the df index.
     df = df[(df['amount_of_noise'] == 0) & 
             (df['meditation'] > 0) & 
-            (df['attention'] > 0)].reset_index(drop=True)
+            (df['attention'] > 0)]
+
+    # Drop 'blink', 'date_time', 'amount_of_noise' and 'sample_index' columns
+    return df.drop(dropped_columns, axis=1, errors='ignore')
+
+# Yields the database in chunks of at most chunksize rows: read_csv chunks
+# for a CSV file, batches of the row groups for a Parquet file (needs pyarrow).
+def read_chunks(input_filename, chunksize):
+    if input_filename.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(input_filename)
+        columns = [name for name in parquet_file.schema_arrow.names if name not in unread_columns]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_filename, chunksize=chunksize, dtype=csv_dtypes, na_values=["None"],
+                               usecols=lambda column: column not in unread_columns)
+
+# Cleans the merged database chunk by chunk, so only chunksize rows are in
+# memory at a time however large the database is.
+# - Without output_filename, returns the cleaned rows as one DataFrame.
+# - With output_filename, appends every cleaned chunk to that CSV file as
+#   soon as it is ready (renamed from "<output_filename>.part" at the end)
+#   and returns the number of rows written; memory then stays bounded by
+#   chunksize.
+def db_preproccesing(input_filename=folder_path + "MindwaveDB.csv", output_filename=None, chunksize=100000):
+    if output_filename is None:
+        cleaned_chunks = [clean_chunk(df) for df in read_chunks(input_filename, chunksize)]
+        if not cleaned_chunks:
+            return pd.DataFrame()
+        return pd.concat(cleaned_chunks, ignore_index=True)
+
+    temp_filename = output_filename + ".part"
+    written_rows = 0
+    with open(temp_filename, "w", newline="") as output_file:
+        for chunk_number, df in enumerate(read_chunks(input_filename, chunksize)):
+            df = clean_chunk(df)
+            df.to_csv(output_file, index=False, header=(chunk_number == 0))
+            written_rows += len(df)
+    os.replace(temp_filename, output_filename)
+    return written_rows
+
+
+# ========================
+#   Main Execution block
+# ========================
 
-    # Drop 'blink', 'date_time' and 'amount_of_noise' columns
-    df = df.drop(['date_time', 'blink', 'amount_of_noise'], axis=1, errors='ignore')
-    return df
+# Merges the new CSV files and writes the cleaned rows to cleaned_filename,
+# one chunk at a time. Nothing runs when the module is imported, only when
+# it is executed. To work with the cleaned rows in memory instead, for
+# databases smaller than the memory: df = db_preproccesing()
+def main():
+    merge_csv_files(folder_path, output_filename)
 
+    written_rows = db_preproccesing(output_filename, cleaned_filename)
+    print(f"{written_rows} filas limpias guardadas en '{cleaned_filename}'.")
 
-# ==================================
-#   Export dataframe to a CSV file
-# ==================================
+    # Shows the first cleaned rows without loading the whole file
+    if written_rows > 0:
+        print(pd.read_csv(cleaned_filename, nrows=5).T)
 
-df = db_preproccesing()
-# df.to_csv(output_filename, index=False)
 
-# Now 'df' contains the processed data
-print(df.shape)
-# print(df.dtypes)
-print(df.head().T)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
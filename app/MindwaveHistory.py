@@ -0,0 +1,244 @@
+# MindwaveHistory.py
+# @author: Esteban Martinez
+# @github: EstebanMz
+
+# Registry of the people who took the tests and catalog of the files of
+# their tests, stored in an SQLite database ("history.sqlite" inside
+# "folder_path") instead of history.csv.
+# Registering a person adds one row, no matter how many are stored, and
+# several collection stations can write to the same database: SQLite locks
+# the file during a write and the others wait up to "timeout" seconds.
+# Every row has the ID of the session it belongs to, the same ID is used
+# for the files written during that session.
+# Every test is registered when its CSV file is complete, with its time,
+# category and noise statistics, so tests can be found with an indexed
+# query instead of listing "folder_path" and parsing the filenames.
+#
+# The database uses SQLite's default rollback journal and not WAL mode,
+# because WAL doesn't work when the folder is shared over the network.
+
+import csv
+import datetime
+import os
+import sqlite3
+
+from MindwaveWriteData import folder_path
+
+database_filename = folder_path + "history.sqlite"
+history_csv_filename = folder_path + "history.csv"
+
+# Raise it and add the changes to createTables() when the tables change.
+SCHEMA_VERSION = 2
+
+
+class historyStore:
+    def __init__(self, filename=database_filename, timeout=30.0):
+        # isolation_level=None: transactions are started explicitly with
+        # "BEGIN IMMEDIATE", which takes the write lock right away.
+        self.connection = sqlite3.connect(filename, timeout=timeout, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.createTables()
+
+    # ====================
+    #   Database Schema
+    # ====================
+
+    # Creates the tables and indexes of a new database, or the ones missing
+    # in a database of an earlier version. Rows of an old history.csv are
+    # imported once, by the station that creates the tables.
+    def createTables(self):
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        with self.transaction():
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                self.createSubjectsTable()
+            if version < 2:
+                self.createTestsTables()
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def createSubjectsTable(self):
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS subjects (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT,
+                register_date TEXT NOT NULL,
+                last_name TEXT,
+                first_name TEXT,
+                age INTEGER,
+                gender TEXT
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS subjects_register_date ON subjects (register_date)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS subjects_name ON subjects (last_name, first_name)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS subjects_session_id ON subjects (session_id)")
+        self.importHistoryCsv()
+
+    # "tests" has one row per test CSV file, "session_files" the files that
+    # cover a whole session (capture and Parquet/Feather files).
+    def createTestsTables(self):
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tests (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                test_number INTEGER,
+                filename TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                category INTEGER NOT NULL,
+                row_count INTEGER NOT NULL,
+                noise_mean REAL,
+                noise_max INTEGER,
+                noisy_rows INTEGER
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tests_category ON tests (category, start_time)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tests_start_time ON tests (start_time)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tests_session_id ON tests (session_id)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS session_files (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_type TEXT NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS session_files_session_id ON session_files (session_id)")
+
+    # Copies the rows of history.csv, written by earlier versions, into the
+    # database. The CSV file is left as it is.
+    def importHistoryCsv(self):
+        if not os.path.exists(history_csv_filename):
+            return
+        with open(history_csv_filename, newline="") as history_file:
+            rows = [(row.get("register_date"), row.get("last_name"), row.get("first_name"),
+                     row.get("age"), row.get("gender"))
+                    for row in csv.DictReader(history_file)]
+        self.connection.executemany(
+            "INSERT INTO subjects (register_date, last_name, first_name, age, gender) VALUES (?, ?, ?, ?, ?)", rows)
+        print(f"{len(rows)} registros importados de {history_csv_filename}")
+
+    # Runs the statements inside it as one transaction, holding the write
+    # lock from the start so concurrent stations can't interleave.
+    def transaction(self):
+        return _transaction(self.connection)
+
+    # ======================
+    #   Subject Registry
+    # ======================
+
+    # Registers a person and returns the ID of the new row.
+    def addSubject(self, first_name, last_name, age, gender, session_id=None, register_date=None):
+        if register_date is None:
+            register_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaction():
+            cursor = self.connection.execute(
+                "INSERT INTO subjects (session_id, register_date, last_name, first_name, age, gender) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, register_date, last_name, first_name, age, gender))
+        return cursor.lastrowid
+
+    # Returns the people registered between two dates ("%Y-%m-%d %H:%M:%S"
+    # text, both optional), oldest first.
+    def subjects(self, since=None, until=None):
+        return self.connection.execute(
+            "SELECT * FROM subjects WHERE register_date >= ? AND register_date <= ? ORDER BY register_date",
+            (since or "", until or "9999")).fetchall()
+
+    # Returns the person registered in a session, None if there is none.
+    def subjectOfSession(self, session_id):
+        return self.connection.execute(
+            "SELECT * FROM subjects WHERE session_id = ?", (session_id,)).fetchone()
+
+    # ====================
+    #   Session Catalog
+    # ====================
+
+    # Registers a finished test. noise_values are the amount_of_noise
+    # values of its rows (None where there was none yet).
+    def addTest(self, session_id, filename, start_time, end_time, category, row_count,
+                noise_values=(), test_number=None):
+        noise_values = [value for value in noise_values if value is not None]
+        noise_mean = sum(noise_values) / len(noise_values) if noise_values else None
+        noise_max = max(noise_values) if noise_values else None
+        noisy_rows = sum(1 for value in noise_values if value > 0)
+        with self.transaction():
+            cursor = self.connection.execute(
+                "INSERT INTO tests (session_id, test_number, filename, start_time, end_time, category, "
+                "row_count, noise_mean, noise_max, noisy_rows) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, test_number, filename, start_time, end_time, category,
+                 row_count, noise_mean, noise_max, noisy_rows))
+        return cursor.lastrowid
+
+    # Registers a file of the whole session, e.g. file_type "capture" or "parquet".
+    def addSessionFile(self, session_id, filename, file_type):
+        with self.transaction():
+            self.connection.execute(
+                "INSERT INTO session_files (session_id, filename, file_type) VALUES (?, ?, ?)",
+                (session_id, filename, file_type))
+
+    # Returns the tests matching all the given conditions, oldest first,
+    # with the name of the person who took them (if registered).
+    # - category: limbToTest of the test (0 = rest, 1 = right, 2 = left).
+    # - since, until: start time range, "%Y-%m-%d %H:%M:%S" text.
+    # - last_name, first_name, session_id: the person or session.
+    # - max_noise_mean: leaves out tests with more noise on average.
+    def findTests(self, category=None, since=None, until=None, last_name=None, first_name=None,
+                  session_id=None, max_noise_mean=None):
+        conditions, parameters = [], []
+        for condition, value in (("tests.category = ?", category),
+                                 ("tests.start_time >= ?", since),
+                                 ("tests.start_time <= ?", until),
+                                 ("subjects.last_name = ?", last_name),
+                                 ("subjects.first_name = ?", first_name),
+                                 ("tests.session_id = ?", session_id),
+                                 ("tests.noise_mean <= ?", max_noise_mean)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.connection.execute(
+            "SELECT tests.*, subjects.last_name, subjects.first_name FROM tests "
+            "LEFT JOIN subjects ON subjects.session_id = tests.session_id" + where +
+            " ORDER BY tests.start_time, tests.test_number", parameters).fetchall()
+
+    # Same conditions as findTests(), returns the rows of the tests as one
+    # DataFrame, with the session_id and test_number of each row.
+    def loadTests(self, **conditions):
+        import pandas as pd
+
+        all_dataframes = []
+        for test in self.findTests(**conditions):
+            df = pd.read_csv(test["filename"])
+            df["session_id"] = test["session_id"]
+            df["test_number"] = test["test_number"]
+            all_dataframes.append(df)
+        if all_dataframes:
+            return pd.concat(all_dataframes, ignore_index=True)
+        return pd.DataFrame()
+
+    # Returns the session files of a session, optionally only of one type.
+    def sessionFiles(self, session_id, file_type=None):
+        return self.connection.execute(
+            "SELECT * FROM session_files WHERE session_id = ? AND file_type = COALESCE(?, file_type)",
+            (session_id, file_type)).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+
+class _transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
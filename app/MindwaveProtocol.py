@@ -0,0 +1,206 @@
+# MindwaveProtocol.py
+# @author: Esteban Martinez
+# @github: EstebanMz
+
+# Runs the tests of a session (see testsQueueArray in MindwaveReaderStart.py)
+# on the monotonic clock, in its own thread: test banners, the visual signal
+# for motor imagination every CUE_INTERVAL seconds, the warning 10 seconds
+# before the end of a test and the end of every test happen at their planned
+# time, no matter how many packets the MindWave has sent or how late they
+# arrive. Reading and saving data only follow what this thread decides.
+#
+# Every event shown to the volunteer is recorded as a marker (see
+# mindwavemobile.MindwaveMarkers) with the moment it was shown, and the
+# delay between the planned and the real moment (jitter) is measured.
+
+import bisect
+import threading
+import time
+
+# Seconds between two visual signals of a motor imagination test, and
+# seconds after a signal in which the volunteer imagines the movement.
+CUE_INTERVAL = 5
+CUE_LENGTH = 1
+# The MindWave computes a row of EEG powers from the last second of samples.
+ROW_LENGTH_NS = 1000000000
+# Seconds before the end of a test when the warning is shown.
+WARNING_TIME = 10
+# Seconds between two empty lines during a resting test.
+REST_LINE_INTERVAL = 20
+
+# Labels of the markers that start a trial, to be cut into an epoch.
+TRIAL_LABELS = ("cue", "rest")
+
+# Marker codes. Visual signals use the category of their test (1 = right,
+# 2 = left); resting tests get a silent marker with code 0 at the same
+# pace, so they can be cut into epochs like the others.
+REST_CODE = 0
+TEST_START_CODE = 100
+TEST_END_CODE = 101
+
+# The last part of every wait is a busy loop, sleeping is not that precise.
+SPIN_TIME_NS = 1000000
+
+
+# ========================
+#   Protocol Scheduling
+# ========================
+
+# Returns the events of a session as (seconds since the start, test number,
+# action, marker code, marker label) tuples in time order. Tests follow
+# each other without pauses; action is a function that shows the event.
+def buildSchedule(tests):
+    events = []
+    test_start = 0
+    for test_number, (description, category, length) in enumerate(tests):
+        events.append((test_start, test_number, lambda description=description, length=length:
+                       printTestBanner(description, length), TEST_START_CODE, description))
+        for second in range(CUE_INTERVAL, length, CUE_INTERVAL):
+            if category != 0:
+                events.append((test_start + second, test_number, printCue, category, "cue"))
+                events.append((test_start + second + CUE_LENGTH, test_number, printEmptyLine, None, None))
+            else:
+                events.append((test_start + second, test_number, None, REST_CODE, "rest"))
+        if category == 0:
+            for second in range(REST_LINE_INTERVAL - 1, length, REST_LINE_INTERVAL):
+                events.append((test_start + second, test_number, printEmptyLine, None, None))
+        if length > WARNING_TIME:
+            events.append((test_start + length - WARNING_TIME, test_number,
+                           lambda category=category: printWarning(category), None, None))
+        events.append((test_start + length, test_number, None, TEST_END_CODE, description))
+        test_start += length
+    # stable, so events of the same second keep their order
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+class protocolScheduler(threading.Thread):
+    def __init__(self, tests, markers=None):
+        threading.Thread.__init__(self, daemon=True)
+        self.tests = tests
+        self.markers = markers
+        self.events = buildSchedule(tests)
+        self.stop_event = threading.Event()
+        # Set when a test has ended, one per test.
+        self.test_ended = [threading.Event() for _ in tests]
+        # monotonic_ns times of the start and end of every test, filled in as they happen.
+        self.test_start_times = [None] * len(tests)
+        self.test_end_times = [None] * len(tests)
+        # Times and categories of the visual signals, for categoryAt().
+        self.cue_times = []
+        self.cue_categories = []
+        # Nanoseconds between the planned and the real time of every shown event.
+        self.jitters = []
+        self.start_time = None
+
+    def run(self):
+        self.start_time = time.monotonic_ns()
+        for seconds, test_number, action, code, label in self.events:
+            planned_time = self.start_time + seconds * 1000000000
+            if not self.waitUntil(planned_time):
+                break
+            if action is not None:
+                action()
+            onset_time = time.monotonic_ns()
+            self.jitters.append(onset_time - planned_time)
+            if code is not None and self.markers is not None:
+                self.markers.addMarker(code, label, onset_time)
+            if code == TEST_START_CODE:
+                self.test_start_times[test_number] = onset_time
+            elif code == TEST_END_CODE:
+                self.test_end_times[test_number] = onset_time
+                self.test_ended[test_number].set()
+            elif label == "cue":
+                self.cue_times.append(onset_time)
+                self.cue_categories.append(code)
+        # Unblocks the reading of tests that will not run anymore.
+        for test_ended in self.test_ended:
+            test_ended.set()
+
+    # Sleeps until time.monotonic_ns() reaches planned_time, returns False
+    # if the scheduler was stopped meanwhile.
+    def waitUntil(self, planned_time):
+        while True:
+            remaining = planned_time - time.monotonic_ns()
+            if remaining <= 0:
+                return not self.stop_event.is_set()
+            if remaining > SPIN_TIME_NS:
+                if self.stop_event.wait((remaining - SPIN_TIME_NS) / 1e9):
+                    return False
+
+    def stop(self):
+        self.stop_event.set()
+
+    # Number of visual signals and resting markers of the session.
+    def numberOfTrials(self):
+        return sum(1 for event in self.events if event[4] in TRIAL_LABELS)
+
+    # True once the test has ended (or the scheduler was stopped).
+    def testIsOver(self, test_number):
+        return self.test_ended[test_number].is_set()
+
+    # Waits until the test has started, at most timeout seconds.
+    def waitForTest(self, test_number, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.test_start_times[test_number] is None and not self.testIsOver(test_number):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self.stop_event.wait(0.01)
+        return True
+
+    # Category of a row of EEG powers with time time_ns (monotonic_ns): the
+    # category of the test if the second after a visual signal makes up at
+    # least half of the second the row was computed from, 0 otherwise.
+    def categoryAt(self, time_ns):
+        cue_number = bisect.bisect_right(self.cue_times, time_ns) - 1
+        if cue_number < 0:
+            return 0
+        cue_time = self.cue_times[cue_number]
+        overlap = min(time_ns, cue_time + CUE_LENGTH * 1000000000) - max(time_ns - ROW_LENGTH_NS, cue_time)
+        if overlap >= ROW_LENGTH_NS // 2:
+            return self.cue_categories[cue_number]
+        return 0
+
+    # Jitter of the shown events in milliseconds, None if none was shown.
+    def jitterReport(self):
+        if not self.jitters:
+            return None
+        jitters = sorted(jitter / 1e6 for jitter in self.jitters)
+        return {
+            "events": len(jitters),
+            "mean_ms": sum(jitters) / len(jitters),
+            "p95_ms": jitters[min(len(jitters) - 1, int(0.95 * len(jitters)))],
+            "max_ms": jitters[-1],
+        }
+
+    def printJitterReport(self):
+        report = self.jitterReport()
+        if report is not None:
+            print(f"Desfase de {report['events']} eventos: media {report['mean_ms']:.2f} ms, "
+                  f"p95 {report['p95_ms']:.2f} ms, máximo {report['max_ms']:.2f} ms")
+
+
+# ===================================
+#   Print Periodic Text on Terminal
+# ===================================
+
+# Banner with the description and the length of a test, at its start.
+def printTestBanner(description, length):
+    print('\n'*2 + '='*100 + '\n' + '='*100 + '\n')
+    print(f"\t{description} Duración: {round(length/60)} minutos.")
+    print('\n' + '='*100 + '\n' + '='*100 + '\n'*2, flush=True)
+
+# Tells the volunteer to think in the motor imagination movement.
+def printCue():
+    print('\n'*10 + 'X'*50 + '\n' + 'X'*50 + '\n' + 'X'*50, flush=True)
+
+def printEmptyLine():
+    print('', flush=True)
+
+# Notification when there are 10 seconds left for a running test.
+def printWarning(category):
+    if category != 0:
+        print('\n'*10 + 'X'*50 + '\n' + 'X'*50)
+    else:
+        print('\n'*2 + 'X'*50 + '\n' + 'X'*50)
+    print(f'    Esta prueba finaliza en {WARNING_TIME} segundos.', flush=True)
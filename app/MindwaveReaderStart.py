@@ -7,12 +7,14 @@
 # depends on the argument of the function writeDataPoints(), which is called
 # in the Main Execution block by reading testQueueArray, written at the start.
 #
-# Duration of tests is tied by the fact that the MindWave Mobile records a packet
-# of data at a pace of once per second. That means if you set SHORT_TEST_LENGTH 
-# to 120, any test with that input value will last 120 seconds, or 2 minutes.
+# Tests are run on the monotonic clock by a protocolScheduler (see
+# MindwaveProtocol.py) in its own thread, so if you set SHORT_TEST_LENGTH to
+# 120, any test with that input value lasts 120 seconds, or 2 minutes, even
+# if packets from the MindWave are lost or delayed. The MindWave sends a row
+# of EEG powers about once per second, so the CSV file has about as many rows.
 # 
 # The data saved from the sensor is:
-# - Time of DataPoint reading
+# - Time of DataPoint reading (milliseconds, from the headset's sample clock)
 # - EEG Power Bands (Delta, Theta, Low Alpha, High Alpha, Low Beta, High Beta,
 #   Low Gamma, Mid Gamma)
 # - Raw Data
@@ -21,23 +23,46 @@
 # - Blink (Only displays "None", drop the column in preprocessing)
 # - Amount of Noise (also known as Poor Signal Level)
 # - Motor imagination movement Category
+#
+# Every cue is also recorded as a marker with its exact time (see
+# mindwavemobile.MindwaveMarkers), and the raw samples around it are cut
+# into one epoch per trial, saved as an .npz file at the end of the session.
+# The delay of the cues from their planned time is shown at the end.
 
 import bluetooth
 import datetime
+import numpy as np
 from mindwavemobile.MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint, AttentionDataPoint, MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint
 from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
-from MindwaveWriteData import writeData
+from mindwavemobile.MindwaveCapture import MindwaveCaptureRecorder, RecordingTransport
+from mindwavemobile.MindwaveTransports import RfcommTransport
+from mindwavemobile.MindwaveMarkers import MindwaveMarkers
+from mindwavemobile.MindwaveEpochs import MindwaveEpochs
+from MindwaveWriteData import writeData, streamWriter, columnarWriter, columnarWriterAvailable, sessionClock, writeEpochs, folder_path
+from MindwaveHistory import historyStore
+from MindwaveProtocol import protocolScheduler, TRIAL_LABELS
 import os
+import time
+import uuid
 
 
 # ===============
 #   Tests Queue
 # ===============
 
-# Length (rows) for output CSV files.
+# Length (seconds) of the tests.
 SHORT_TEST_LENGTH = 120
 LONG_TEST_LENGTH = 240
 
+# Seconds of raw samples before and after every cue kept in its epoch.
+EPOCH_BEFORE_CUE = 0.5
+EPOCH_AFTER_CUE = 4.0
+
+# Format of the typed copy of the whole session, "parquet" or "feather".
+# It also keeps all raw values of every second and needs pyarrow; with
+# None (or without pyarrow) only the CSV files are written.
+SESSION_FILE_FORMAT = "parquet"
+
 # Defines an array with the motor imagination tests that will be held 
 # in the moment the MindWave is connected to this device.
 # - test[0]: Name or description of the event.
@@ -59,136 +84,196 @@ testsQueueArray = [
 ]
 
 
-# ===================================
-#   Print Periodic Text on Terminal
-# ===================================
-
-# Prints the following info when getDataPoints() is running:
-# - A block of text every 5 seconds that tells the volunteer to think in the
-#   corresponding motor imagination movement at the start of the test. 
-#   It takes in mind to not send this visual signal whether it's a resting test.
-# - A notification when there are 10 seconds left for a running test.
-def printTestInfo(arrayLength, limbToTest, readingTime):
-
-    # Movement block indicator
-    if arrayLength % 5 == 0 and limbToTest != 0:
-        print('\n'*10 + 'X'*50 + '\n' + 'X'*50 + '\n' + 'X'*50)
-    elif (arrayLength - 1) % 5 == 0 and limbToTest != 0:
-        print('')
-    elif (arrayLength + 1) % 20 == 0 and limbToTest == 0:
-        print('')
-
-    # Test ending message for both types of tests.
-    if arrayLength == (readingTime - 10) and limbToTest != 0:
-        print('\n'*10 + 'X'*50 + '\n' + 'X'*50)
-        print('    Esta prueba finaliza en 10 segundos.')
-    elif arrayLength == (readingTime - 10) and limbToTest == 0:
-        print('\n'*2 + 'X'*50 + '\n' + 'X'*50)
-        print('    Esta prueba finaliza en 10 segundos.')
-
-
 # =====================================
 #   MindWave DataPoint Read and Write
 # =====================================
 
-# Returns an array with the data read from the sensor. Its size depends on 
-# the value of the readingTime argument.
-# The other argument, limbToTest, defines a category for when a motor imagination 
-# is displayed on terminal, it also defines the type of test to be executed.
-def getDataPoints(limbToTest, readingTime):
+# Nanoseconds a test keeps reading after its end for the first row computed
+# after it. The MindWave sends a row about once per second.
+END_OF_TEST_GRACE_NS = 3000000000
+
+# Data points read by getDataPoints() that belong to the next test.
+nextTestDataPoints = []
+
+# Writes the data read from the sensor to csvWriter (a streamWriter) row by
+# row, and to sessionWriter (a columnarWriter) if there is one, while test
+# number testNumber of the scheduler (a protocolScheduler) runs. A row
+# belongs to the test if its time is between the end of the previous test
+# (the start of the first one) and the end of this one, so no row is lost
+# or written twice between two tests.
+# The time of a row is the time.monotonic_ns() time of its sample on the
+# headset's 512 Hz clock (see MindwaveSampleClock), the writers format it.
+# Its category is the one of the visual signal shown in the second it was
+# computed from, if any (see protocolScheduler.categoryAt()).
+# The raw samples go to epochs (a MindwaveEpochs) if there is one.
+# Returns the amount of noise of every written row, for the session catalog.
+def getDataPoints(testNumber, scheduler, csvWriter, sessionWriter=None, epochs=None):
+    global nextTestDataPoints
 
     # Initializes the variables of all DataPoint instances.
     rawValue = attention = meditation = amountOfNoise = blink = None
     delta = theta = lowAlpha = highAlpha = lowBeta = highBeta = lowGamma = midGamma = None
-    category = 0    # Motor imagination movement category
-
-    # Creates the array that will store the sensor readings.
-    eegPower = "delta,theta,low_alpha,high_alpha,low_beta,high_beta,low_gamma,mid_gamma"
-    dataHeader = f"date_time,{eegPower},raw_value,attention,meditation,blink,amount_of_noise,category"
-    dataPointsArray = [dataHeader]
-
-    # DataPoint reading loop.
-    while(len(dataPointsArray) <= readingTime):
-
-        # DataPoint is the class that reads the next data point from the headset.
-        dataPoint = mindwaveDataPointReader.readNextDataPoint()
-
-        # Checks if the read data point belongs to one of the specified 
-        # instances in the DataPoint class. If it's true, the function continues
-        # to extract and store its value for that DataPoint instance.
-        if isinstance(dataPoint, (PoorSignalLevelDataPoint, AttentionDataPoint,
-                                    MeditationDataPoint, BlinkDataPoint,
-                                    RawDataPoint, EEGPowersDataPoint)):
-
-            if isinstance(dataPoint, PoorSignalLevelDataPoint):
-                amountOfNoise = dataPoint.amountOfNoise
-
-            elif isinstance(dataPoint, AttentionDataPoint):
-                attention = dataPoint.attentionValue
-
-            elif isinstance(dataPoint, MeditationDataPoint):
-                meditation = dataPoint.meditationValue
-
-            elif isinstance(dataPoint, BlinkDataPoint):
-                blink = dataPoint.blinkValue
 
-            elif isinstance(dataPoint, RawDataPoint):
-                rawValue = dataPoint.rawValue
+    # Raw values read since the last row, for sessionWriter and epochs,
+    # and the sample index of the first one.
+    secondRawValues = []
+    firstRawSample = None
+    noiseValues = []
 
-            # In this last instance, all the DataPoints are arranged 
-            # to be stored in dataPointsArray.
-            elif isinstance(dataPoint, EEGPowersDataPoint):
+    # Host time of every raw sample, with the drift of the headset's clock.
+    sampleClock = mindwaveDataPointReader.sampleClock()
 
-                # Creates dateTime variable with the current date and time.
-                now = datetime.datetime.now()
-                dateTime = now.strftime("%Y-%m-%d %H:%M:%S")
-
-                # Defines the variables for the data points corresponding to
-                # the group of EEG Powers.
-                delta, theta = dataPoint.delta, dataPoint.theta
-                lowAlpha, highAlpha = dataPoint.lowAlpha, dataPoint.highAlpha
-                lowBeta, highBeta = dataPoint.lowBeta, dataPoint.highBeta
-                lowGamma, midGamma = dataPoint.lowGamma, dataPoint.midGamma
-
-                # Saves a row with all the data values read in the instances.
-                dataRow = f"{dateTime},{delta},{theta},{lowAlpha},{highAlpha},"\
-                          f"{lowBeta},{highBeta},{lowGamma},{midGamma},"\
-                          f"{rawValue},{attention},{meditation},{blink},{amountOfNoise},"\
-                          f"{category}"
-
-                # Assigns to "category" the value of the running "limbToTest" value 
-                # the second after a visual signal shows up on terminal.
-                if (len(dataPointsArray) + 1) % 5 == 0 and limbToTest != 0:
-                    category = limbToTest
-                else:
-                    category = 0
-
-                # Adds the data from the sensor as a new row to the array.
-                # print(dataRow)                    # Debugging
-                dataPointsArray.append(dataRow)
-
-                # Calls printTestInfo() function.
-                printTestInfo(len(dataPointsArray), limbToTest, readingTime)
-
-    # Returns the data array containing all readings from a test.
-    return dataPointsArray
-
-
-# ======================================
-#   Save Test from Array to CSV format
-# ======================================
-
-# Inputs the DataPoints array and outputs the CSV file.
-def writeDataPoints(limbToTest, readingTime):
-
-    # Executes getDataPoints() function and stores the return result in data
-    data = getDataPoints(limbToTest, readingTime)
-
-    # Create an instance of writeData() class
-    exportData = writeData(data)
-
-    # Call the method to write data to CSV
-    exportData.writeFile()
+    # Start of the test, rows from before it are left out.
+    scheduler.waitForTest(testNumber)
+    if testNumber > 0:
+        testStartTime = scheduler.test_end_times[testNumber - 1]
+    else:
+        testStartTime = scheduler.test_start_times[testNumber]
+
+    # Data points read since the last row. They are handed to the next test
+    # together with the row that ends this one.
+    rowDataPoints = []
+    dataPoints, nextTestDataPoints = nextTestDataPoints, []
+
+    # DataPoint reading loop. It goes on after the scheduler ends the test,
+    # until the first row from after the end arrives: rows computed before
+    # the end may still be on their way. Waits at most half a second for data.
+    while True:
+        if not dataPoints:
+            if scheduler.testIsOver(testNumber):
+                # If the scheduler was stopped, or the row after the end is
+                # late, data that was not read yet is left for the next test.
+                testEndTime = scheduler.test_end_times[testNumber]
+                if testEndTime is None or time.monotonic_ns() - testEndTime > END_OF_TEST_GRACE_NS:
+                    nextTestDataPoints = rowDataPoints
+                    return noiseValues
+
+            # Reads all the data points parsed from the bytes received so far,
+            # in the same order the headset sent them.
+            dataPoints = mindwaveDataPointReader.readDataPoints(timeout=0.5)
+
+        for position, dataPoint in enumerate(dataPoints):
+            rowDataPoints.append(dataPoint)
+
+            # Checks if the read data point belongs to one of the specified 
+            # instances in the DataPoint class. If it's true, the function continues
+            # to extract and store its value for that DataPoint instance.
+            if isinstance(dataPoint, (PoorSignalLevelDataPoint, AttentionDataPoint,
+                                        MeditationDataPoint, BlinkDataPoint,
+                                        RawDataPoint, EEGPowersDataPoint)):
+
+                if isinstance(dataPoint, PoorSignalLevelDataPoint):
+                    amountOfNoise = dataPoint.amountOfNoise
+
+                elif isinstance(dataPoint, AttentionDataPoint):
+                    attention = dataPoint.attentionValue
+
+                elif isinstance(dataPoint, MeditationDataPoint):
+                    meditation = dataPoint.meditationValue
+
+                elif isinstance(dataPoint, BlinkDataPoint):
+                    blink = dataPoint.blinkValue
+
+                elif isinstance(dataPoint, RawDataPoint):
+                    rawValue = dataPoint.rawValue
+                    if sessionWriter is not None or epochs is not None:
+                        if not secondRawValues:
+                            firstRawSample = dataPoint.sampleIndex
+                        secondRawValues.append(rawValue)
+
+                # In this last instance, all the DataPoints are arranged 
+                # to be written to the CSV file.
+                elif isinstance(dataPoint, EEGPowersDataPoint):
+
+                    # Time of the row, the receive time until the sample clock
+                    # has an estimate.
+                    rowTime = sampleClock.timeOfSample(dataPoint.sampleIndex)
+                    if rowTime is None:
+                        rowTime = dataPoint.receiveTimeNs
+
+                    # The first row from after the end of the test belongs to
+                    # the next one, like everything read since the last row.
+                    testEndTime = scheduler.test_end_times[testNumber]
+                    if testEndTime is not None and rowTime >= testEndTime:
+                        nextTestDataPoints = rowDataPoints + dataPoints[position + 1:]
+                        return noiseValues
+                    rowDataPoints = []
+
+                    # The raw values of this second go to the epochs even if the
+                    # row is left out, epochs need every sample.
+                    rowRawValues, secondRawValues = secondRawValues, []
+                    if epochs is not None and rowRawValues:
+                        epochs.addRawValues(np.array(rowRawValues),
+                                            np.arange(firstRawSample, firstRawSample + len(rowRawValues)))
+
+                    if testStartTime is not None and rowTime < testStartTime:
+                        continue
+
+                    # Defines the variables for the data points corresponding to
+                    # the group of EEG Powers.
+                    delta, theta = dataPoint.delta, dataPoint.theta
+                    lowAlpha, highAlpha = dataPoint.lowAlpha, dataPoint.highAlpha
+                    lowBeta, highBeta = dataPoint.lowBeta, dataPoint.highBeta
+                    lowGamma, midGamma = dataPoint.lowGamma, dataPoint.midGamma
+
+                    # Motor imagination movement category of the row.
+                    category = scheduler.categoryAt(rowTime)
+
+                    # Saves a row with all the data values read in the instances.
+                    dataRow = [rowTime, delta, theta, lowAlpha, highAlpha,
+                               lowBeta, highBeta, lowGamma, midGamma,
+                               rawValue, attention, meditation, blink, amountOfNoise,
+                               category, dataPoint.sampleIndex]
+
+                    # Writes the data from the sensor as a new row to the CSV file.
+                    # print(dataRow)                    # Debugging
+                    csvWriter.writeRow(dataRow)
+                    noiseValues.append(amountOfNoise)
+                    if sessionWriter is not None:
+                        sessionWriter.writeRow(dataRow, rowRawValues)
+
+        dataPoints = []
+
+
+# ============================
+#   Save Test to CSV format
+# ============================
+
+# Header of the CSV file of every test.
+eegPower = ["delta", "theta", "low_alpha", "high_alpha", "low_beta", "high_beta", "low_gamma", "mid_gamma"]
+# "sample_index" is the number of raw samples received before the row,
+# to align it with the capture file and the raw values of the session file.
+dataHeader = (["date_time"] + eegPower
+              + ["raw_value", "attention", "meditation", "blink", "amount_of_noise", "category", "sample_index"])
+
+# Streams the rows of a test into a CSV file while it runs. The file only
+# gets its final name once the test is complete, an interrupted test is
+# left as a ".part" file with the rows read until then.
+# With a sessionWriter, the test also becomes one row group of the session file.
+# With a sessionId, the finished test is registered in the session catalog,
+# from the start to the end the scheduler gave the test.
+# "clock" (a sessionClock) formats the times of the rows; scheduler and
+# epochs are passed on to getDataPoints().
+def writeDataPoints(limbToTest, scheduler, testNumber, sessionWriter=None, sessionId=None, clock=None, epochs=None):
+    with streamWriter(dataHeader, clock=clock) as csvWriter:
+        noiseValues = getDataPoints(testNumber, scheduler, csvWriter, sessionWriter, epochs)
+    if sessionWriter is not None:
+        sessionWriter.endTest()
+    if sessionId is not None:
+        catalogClock = clock if clock is not None else sessionClock()
+        startTime = catalogTime(catalogClock, scheduler.test_start_times[testNumber])
+        endTime = catalogTime(catalogClock, scheduler.test_end_times[testNumber])
+        with historyStore() as history:
+            history.addTest(sessionId, csvWriter.filename, startTime, endTime, limbToTest,
+                            csvWriter.row_count, noiseValues, testNumber)
+
+
+# Date and time of a monotonic time of the scheduler for the catalog. A test
+# the scheduler was stopped in has no end time, then it ends now.
+def catalogTime(clock, monotonic_ns):
+    if monotonic_ns is None:
+        monotonic_ns = time.monotonic_ns()
+    return clock.toDatetime(monotonic_ns).strftime("%Y-%m-%d %H:%M:%S")
 
 
 # ========================
@@ -200,9 +285,20 @@ if __name__ == '__main__':
     # Clears console at the start.
     os.system('clear')
 
+    # Identifies this session in the history database.
+    sessionId = uuid.uuid4().hex
+
+    # Every byte received from the MindWave is also recorded to a capture
+    # file, so all 512 raw values per second are kept even though the CSV
+    # files only store one row per second. It can be read again with
+    # mindwavemobile.MindwaveCapture.MindwaveCaptureReader.
+    captureFilename = datetime.datetime.now().strftime(folder_path + "%Y-%m-%d %H_%M_%S-MindwaveCapture.bin")
+    captureTransport = RecordingTransport(RfcommTransport(), MindwaveCaptureRecorder(captureFilename))
+
     # Initializes DataPoint Reader and attempts to establish a connection 
-    # with the MindWave device.
-    mindwaveDataPointReader = MindwaveDataPointReader()
+    # with the MindWave device. The reader receives data in its own thread,
+    # so printing and saving files don't delay reading from the headset.
+    mindwaveDataPointReader = MindwaveDataPointReader(readInBackground=True, transport=captureTransport)
     mindwaveDataPointReader.start()
 
     # If MindWave is connected, it will first read the testsQueueArray and
@@ -211,19 +307,60 @@ if __name__ == '__main__':
     # their personal data (first name, last name, age and gender).
     if (mindwaveDataPointReader.isConnected()):
 
-        # Loop that runs the different test defined at testQueueArray.
-        for test in testsQueueArray:
-            print('\n'*2 + '='*100 + '\n' + '='*100 + '\n')
-            print(f"\t{test[0]} Duración: {round(test[2]/60)} minutos.")
-            print('\n' + '='*100 + '\n' + '='*100 + '\n'*2)
-            writeDataPoints(test[1], test[2])
+        # Turns the monotonic times of the rows into dates and times, the
+        # same for every file of the session.
+        clock = sessionClock()
+
+        # The scheduler runs the queued tests and records their events next
+        # to the capture file; an epoch of raw samples is cut around every
+        # visual signal and every resting marker.
+        markers = MindwaveMarkers(captureFilename + ".markers")
+        scheduler = protocolScheduler(testsQueueArray, markers)
+        epochs = MindwaveEpochs(scheduler.numberOfTrials(),
+                                sampleClock=mindwaveDataPointReader.sampleClock(),
+                                before=EPOCH_BEFORE_CUE, after=EPOCH_AFTER_CUE,
+                                baseline=(-EPOCH_BEFORE_CUE, 0.0))
+        markers.addListener(lambda marker: epochs.addMarker(marker) if marker.label in TRIAL_LABELS else None)
+
+        # Creates the session file if its format is set and pyarrow is installed.
+        sessionWriter = None
+        if SESSION_FILE_FORMAT is not None and columnarWriterAvailable():
+            sessionWriter = columnarWriter(file_format=SESSION_FILE_FORMAT, clock=clock)
+        elif SESSION_FILE_FORMAT is not None:
+            print("Aviso: pyarrow no está instalado, solo se guardarán los archivos CSV.")
+
+        # Starts the tests defined at testQueueArray, and saves the data of
+        # each of them while the scheduler runs it.
+        scheduler.start()
+        for testNumber, test in enumerate(testsQueueArray):
+            writeDataPoints(test[1], scheduler, testNumber, sessionWriter, sessionId, clock, epochs)
+        scheduler.join()
+        scheduler.printJitterReport()
+
+        # Finishes the session file, the markers and the epochs.
+        if sessionWriter is not None:
+            sessionWriter.close()
+        markers.close()
+        epochsFilename = writeEpochs(epochs)
+
+        # Stops the reading thread, no more data is needed.
+        mindwaveDataPointReader.stop()
+
+        # Registers the files that cover the whole session in the catalog.
+        with historyStore() as history:
+            history.addSessionFile(sessionId, captureFilename, "capture")
+            history.addSessionFile(sessionId, captureFilename + ".markers", "markers")
+            history.addSessionFile(sessionId, epochsFilename, "epochs")
+            if sessionWriter is not None:
+                history.addSessionFile(sessionId, sessionWriter.filename, SESSION_FILE_FORMAT)
 
         # Write the user info before finishing the connection with the MindWave.
         userData = writeData([])
-        userData.writePersonalData()
+        userData.writePersonalData(sessionId)
 
     # Error message when device is not connected or couldn't be found.
     else:
+        mindwaveDataPointReader.stop()
         print(
             "\nError de conexión: No se pudo conectar con el dispositivo MindWave Mobile. "\
             "Reinicia la diadema y ejecuta de nuevo el código."
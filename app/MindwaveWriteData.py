@@ -2,12 +2,50 @@
 # @author: Esteban Martinez
 # @github: EstebanMz
 
+import csv
 import datetime
 import os
-import pandas as pd
+import time
+
+# Optional, only needed by columnarWriter (pip install pyarrow).
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 
 folder_path = "output_files/"
 
+# When streamWriter forces written rows onto the disk (SD card) with fsync:
+# - "never": whenever the system decides, fastest.
+# - "close": once, before the finished file is renamed.
+# - "flush": at every periodic flush, safest against power loss.
+FSYNC_POLICIES = ("never", "close", "flush")
+
+# Turns time.monotonic_ns() times, which the reader stamps on every data
+# point, into dates and times. Both clocks are read once when it is
+# created: monotonic times don't jump when the system clock is adjusted,
+# so the times of a session stay in order and keep their sub-millisecond
+# spacing. Rows carry monotonic times and only the writers format them.
+class sessionClock:
+    def __init__(self):
+        self.wall_time_ns = time.time_ns()
+        self.monotonic_time_ns = time.monotonic_ns()
+
+    # Nanoseconds since the epoch of a monotonic time.
+    def wallTimeNs(self, monotonic_ns):
+        return self.wall_time_ns + (monotonic_ns - self.monotonic_time_ns)
+
+    # Local date and time, like datetime.now().
+    def toDatetime(self, monotonic_ns):
+        return datetime.datetime.fromtimestamp(self.wallTimeNs(monotonic_ns) / 1e9)
+
+    # "%Y-%m-%d %H:%M:%S.mmm", with milliseconds.
+    def formatTime(self, monotonic_ns):
+        return self.toDatetime(monotonic_ns).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
 class writeData:
     def __init__(self, data_array):
         self.data_array = data_array
@@ -19,6 +57,8 @@ class writeData:
 
     # Converts an array into a CSV file which gets stored as "filename" value.
     def writeFile(self):
+        import pandas as pd
+
         # Generate filename with date and time
         now = datetime.datetime.now()
         test_filename = now.strftime(folder_path + "%Y-%m-%d %H_%M_%S-MindwaveData.csv")
@@ -36,10 +76,11 @@ class writeData:
     #   Personal Info Form
     # ======================
 
-    # Writes personal data to history.csv.
-    def writePersonalData(self):
-        # Generate filename for history file.
-        history_filename = folder_path + "history.csv"
+    # Registers the personal data in the history database (see
+    # MindwaveHistory.py), linked to the files of the session by session_id.
+    def writePersonalData(self, session_id=None):
+        from MindwaveHistory import historyStore, database_filename
+
         # last_name: The last name of the person.
         # first_name: The first name of the person.
         # age: The age of the person.
@@ -50,31 +91,204 @@ class writeData:
         age = input("Ingrese su edad: ")
         gender = input("Ingrese su genero (F/M): ")
 
-        # Gets current time.
-        now = datetime.datetime.now()
-        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Defines a dictionary with user data.
-        new_data = {
-            "register_date": timestamp,
-            "last_name": last_name,
-            "first_name": first_name,
-            "age": age,
-            "gender": gender
-        }
-
-        # Checks if history file doesn't exist, then creates a new file.
-        if not os.path.exists(history_filename):
-            df = pd.DataFrame([new_data])
-
-        # If history.csv is found, registers the personal data by 
-        # concatenating the input data with the read version.
+        # Adds one row to the history, without reading or rewriting the others.
+        with historyStore() as history:
+            history.addSubject(first_name, last_name, age, gender, session_id=session_id)
+        print(f"Personal data saved to {database_filename}")
+
+
+# ========================
+#   Streaming CSV Writer
+# ========================
+
+# Writes the rows of a test to a CSV file while the test runs, instead of
+# keeping them all in memory and writing them at the end.
+# Rows are written to "<filename>.part" through a buffer that is flushed
+# every "flush_interval" seconds, so a crash only loses the last moments
+# of a test and what was written stays in the .part file. close() renames
+# it to "filename" in one step, so every .csv file in folder_path is
+# complete. The default filename is the one writeFile() uses.
+# The first value of every row is a time.monotonic_ns() time, written as
+# date and time by "clock" (a sessionClock, a new one if None).
+class streamWriter:
+    def __init__(self, header, filename=None, flush_interval=1.0, fsync_policy="close", clock=None):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy must be one of {FSYNC_POLICIES}")
+        if filename is None:
+            now = datetime.datetime.now()
+            filename = now.strftime(folder_path + "%Y-%m-%d %H_%M_%S-MindwaveData.csv")
+        self.filename = filename
+        self.temp_filename = filename + ".part"
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.clock = clock if clock is not None else sessionClock()
+        self.row_count = 0
+
+        # Opens the temporary file and writes the header row.
+        self.file = open(self.temp_filename, "w", newline="", buffering=64 * 1024)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+        self.last_flush = time.monotonic()
+
+    # Appends one row (a list of values) to the file.
+    def writeRow(self, row):
+        self.writer.writerow([self.clock.formatTime(row[0])] + list(row[1:]))
+        self.row_count += 1
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    # Hands the buffered rows to the system, and to the disk with "flush" policy.
+    def flush(self):
+        self.file.flush()
+        if self.fsync_policy == "flush":
+            os.fsync(self.file.fileno())
+        self.last_flush = time.monotonic()
+
+    # Finishes the file and gives it its final name.
+    def close(self):
+        self.file.flush()
+        if self.fsync_policy != "never":
+            os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temp_filename, self.filename)
+        print(f"Data saved to {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    # If the test failed, keeps the rows written so far in the .part file.
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.close()
         else:
-            df = pd.read_csv(history_filename)
-            new_df = pd.DataFrame([new_data])
-            df = pd.concat([df, new_df], ignore_index=True)
-
-        # Saves history.csv
-        df.to_csv(history_filename, index=False)
-        print(f"Personal data saved to {history_filename}")
-        
\ No newline at end of file
+            self.file.close()
+
+
+# ============================
+#   Columnar Session Writer
+# ============================
+
+# File formats of columnarWriter and the extension of their files.
+COLUMNAR_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+EEG_POWER_COLUMNS = ["delta", "theta", "low_alpha", "high_alpha", "low_beta", "high_beta", "low_gamma", "mid_gamma"]
+
+# Returns True if pyarrow is installed and columnarWriter can be used.
+def columnarWriterAvailable():
+    return pa is not None
+
+# Typed columns of the session files: the same columns as the CSV files,
+# plus "raw_values" with every raw value of that second and "test", the
+# number of the test in the session. The raw values of a row are the
+# samples before "sample_index", their times can be rebuilt with
+# mindwavemobile.MindwaveSampleClock.
+def columnarSchema():
+    return pa.schema(
+        [pa.field("date_time", pa.timestamp("ms"))]
+        + [pa.field(name, pa.uint32()) for name in EEG_POWER_COLUMNS]
+        + [pa.field("raw_value", pa.int16()),
+           pa.field("raw_values", pa.list_(pa.int16())),
+           pa.field("attention", pa.uint8()),
+           pa.field("meditation", pa.uint8()),
+           pa.field("blink", pa.uint8()),
+           pa.field("amount_of_noise", pa.uint8()),
+           pa.field("category", pa.uint8()),
+           pa.field("sample_index", pa.uint64()),
+           pa.field("test", pa.uint16())])
+
+# Writes a whole session to one typed and compressed Parquet or Feather
+# (Arrow IPC) file, which pandas loads much faster than the CSV files.
+# Rows are collected during a test and written as one row group (Parquet)
+# or record batch (Feather) by endTest(). Like streamWriter, the file is
+# written as "<filename>.part" and renamed by close().
+# Rows are the same as for streamWriter, "clock" turns their times into
+# timestamps. Needs pyarrow; check columnarWriterAvailable() first.
+class columnarWriter:
+    def __init__(self, filename=None, file_format="parquet", compression="zstd", clock=None):
+        if pa is None:
+            raise ImportError("columnarWriter needs pyarrow: pip install pyarrow")
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"file_format must be one of {tuple(COLUMNAR_FORMATS)}")
+        if filename is None:
+            now = datetime.datetime.now()
+            filename = now.strftime(folder_path + "%Y-%m-%d %H_%M_%S-MindwaveSession") + COLUMNAR_FORMATS[file_format]
+        self.filename = filename
+        self.temp_filename = filename + ".part"
+        self.schema = columnarSchema()
+        self.clock = clock if clock is not None else sessionClock()
+        self.test_number = 0
+        self.columns = {name: [] for name in self.schema.names}
+
+        # Parquet compresses per column chunk, Feather per record batch buffer.
+        if file_format == "parquet":
+            self.writer = pq.ParquetWriter(self.temp_filename, self.schema, compression=compression)
+        else:
+            options = ipc.IpcWriteOptions(compression=compression)
+            self.writer = ipc.new_file(self.temp_filename, self.schema, options=options)
+
+    # Adds a row in the format of the CSV files, with the raw values of
+    # that second if they were kept.
+    def writeRow(self, row, raw_values=None):
+        date_time = self.clock.toDatetime(row[0])
+        values = [date_time] + list(row[1:10]) + [raw_values] + list(row[10:]) + [self.test_number]
+        for name, value in zip(self.schema.names, values):
+            self.columns[name].append(value)
+
+    # Writes the rows of the finished test as one row group.
+    def endTest(self):
+        if self.columns["test"]:
+            table = pa.Table.from_pydict(self.columns, schema=self.schema)
+            if isinstance(self.writer, pq.ParquetWriter):
+                self.writer.write_table(table, row_group_size=table.num_rows)
+            else:
+                self.writer.write_table(table)
+            self.columns = {name: [] for name in self.schema.names}
+        self.test_number += 1
+
+    # Writes the last test and gives the file its final name.
+    def close(self):
+        if self.columns["test"]:
+            self.endTest()
+        self.writer.close()
+        os.replace(self.temp_filename, self.filename)
+        print(f"Session saved to {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.close()
+        else:
+            self.writer.close()
+
+
+# ==================
+#   Epochs Writer
+# ==================
+
+# Saves the epochs of a session (a mindwavemobile.MindwaveEpochs) as a
+# NumPy .npz file: "epochs" (trials x channels x samples), "codes" (the
+# marker code of every trial), "marker_samples" and "times" (seconds of
+# every sample relative to its marker). Load it with numpy.load().
+# Written as "<filename>.part" and renamed at the end, like the other files.
+def writeEpochs(epochs, filename=None):
+    import numpy as np
+
+    if filename is None:
+        now = datetime.datetime.now()
+        filename = now.strftime(folder_path + "%Y-%m-%d %H_%M_%S-MindwaveEpochs.npz")
+    temp_filename = filename + ".part"
+    with open(temp_filename, "wb") as epochs_file:
+        np.savez(epochs_file, epochs=epochs.epochs(), codes=epochs.codes(),
+                 marker_samples=epochs.markerSamples(), times=epochs.times())
+    os.replace(temp_filename, filename)
+    print(f"Epochs saved to {filename}")
+    # Samples lost on the way leave gaps, epochs across them are dropped.
+    if epochs.missingSampleCount or epochs.droppedMarkerCount:
+        print(f"Aviso: faltaron {epochs.missingSampleCount} muestras y se descartaron "
+              f"{epochs.droppedMarkerCount} épocas.")
+    # Markers whose window was still open when the session ended.
+    pending_markers = epochs.numberOfPendingMarkers()
+    if pending_markers:
+        print(f"Aviso: {pending_markers} épocas quedaron incompletas al terminar la sesión y no se guardaron.")
+    return filename
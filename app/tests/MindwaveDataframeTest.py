@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd
+
+import MindwaveDataframe
+from MindwaveDataframe import merge_csv_files
+
+
+class MergeCsvFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.temporaryDirectory = tempfile.TemporaryDirectory()
+        self.folderPath = self.temporaryDirectory.name + "/"
+        self.outputFilename = self.folderPath + "MindwaveDB.csv"
+
+    def tearDown(self):
+        self.temporaryDirectory.cleanup()
+
+    def writeCsv(self, filename, values):
+        pd.DataFrame({"raw_value": values}).to_csv(self.folderPath + filename, index=False)
+
+    def merge(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            merge_csv_files(self.folderPath, self.outputFilename, workers=1)
+        return list(pd.read_csv(self.outputFilename)["raw_value"])
+
+    def testOnlyRecordingsAreMerged(self):
+        self.writeCsv("2024-01-01 10_00_00-MindwaveData.csv", [1, 2])
+        self.writeCsv("2024-01-01 11_00_00-MindwaveData.csv", [3])
+        self.writeCsv("MindwaveDB_clean.csv", [7, 8])
+        self.writeCsv("history.csv", [9])
+        self.assertEqual(self.merge(), [1, 2, 3], "should merge the recordings in ascending order")
+        self.writeCsv("2024-01-02 10_00_00-MindwaveData.csv", [4])
+        self.assertEqual(self.merge(), [1, 2, 3, 4], "should append only the new recording")
+
+
+class MainTest(unittest.TestCase):
+    def testCleanedFileIsNotMergedAgain(self):
+        with tempfile.TemporaryDirectory() as temporaryDirectory:
+            folderPath = temporaryDirectory + "/"
+            pd.DataFrame({"date_time": ["a", "b", "c"], "attention": [50, 0, 60], "meditation": [40, 30, 20],
+                          "amount_of_noise": [0, 0, 0], "raw_value": [1, 2, 3]}) \
+                .to_csv(folderPath + "2024-01-01 10_00_00-MindwaveData.csv", index=False)
+            with unittest.mock.patch.multiple(MindwaveDataframe, folder_path=folderPath,
+                                              output_filename=folderPath + "MindwaveDB.csv",
+                                              cleaned_filename=folderPath + "MindwaveDB_clean.csv"):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    MindwaveDataframe.main()
+                    MindwaveDataframe.main()
+            self.assertEqual(len(pd.read_csv(folderPath + "MindwaveDB.csv")), 3, "should merge the recording once")
+            cleaned = pd.read_csv(folderPath + "MindwaveDB_clean.csv")
+            self.assertEqual(list(cleaned["raw_value"]), [1, 3], "should stream the cleaned rows to the file")
+            self.assertNotIn("date_time", cleaned.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
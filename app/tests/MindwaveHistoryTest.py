@@ -0,0 +1,210 @@
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import MindwaveHistory
+from MindwaveHistory import historyStore, SCHEMA_VERSION
+
+
+class HistoryStoreTestCase(unittest.TestCase):
+    # Every test gets its own database, and history.csv points into the same
+    # temporary folder so the real one is never imported.
+    def setUp(self):
+        self.temporaryDirectory = tempfile.TemporaryDirectory()
+        self.databaseFilename = os.path.join(self.temporaryDirectory.name, "history.sqlite")
+        self.historyCsvFilename = os.path.join(self.temporaryDirectory.name, "history.csv")
+        historyCsvPatch = unittest.mock.patch.object(MindwaveHistory, "history_csv_filename", self.historyCsvFilename)
+        historyCsvPatch.start()
+        self.addCleanup(historyCsvPatch.stop)
+
+    def tearDown(self):
+        self.temporaryDirectory.cleanup()
+
+    def openStore(self, timeout=30.0):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return historyStore(self.databaseFilename, timeout=timeout)
+
+    def userVersion(self):
+        connection = sqlite3.connect(self.databaseFilename)
+        try:
+            return connection.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            connection.close()
+
+
+class SubjectRegistryTest(HistoryStoreTestCase):
+    def testNewDatabaseGetsCurrentSchema(self):
+        with self.openStore() as history:
+            subjectId = history.addSubject("Ana", "Gómez", 30, "F", session_id="s1",
+                                           register_date="2024-01-01 10:00:00")
+            self.assertEqual(history.subjectOfSession("s1")["id"], subjectId)
+        self.assertEqual(self.userVersion(), SCHEMA_VERSION, "should record the schema version")
+
+    def testSubjectsAreFilteredByRegisterDate(self):
+        with self.openStore() as history:
+            for day in (3, 1, 2):
+                history.addSubject("Ana", "Gómez", 30, "F", register_date=f"2024-01-0{day} 10:00:00")
+            registerDates = [subject["register_date"] for subject in history.subjects(since="2024-01-02")]
+        self.assertEqual(registerDates, ["2024-01-02 10:00:00", "2024-01-03 10:00:00"],
+                         "should return the subjects since the date, oldest first")
+
+
+class HistoryCsvImportTest(HistoryStoreTestCase):
+    def writeHistoryCsv(self):
+        with open(self.historyCsvFilename, "w", newline="") as historyFile:
+            historyFile.write("register_date,last_name,first_name,age,gender\n"
+                              "2023-05-01 09:00:00,Pérez,Luis,41,M\n"
+                              "2023-05-02 11:30:00,Ruiz,Eva,27,F\n")
+
+    def testRowsOfHistoryCsvAreImportedOnce(self):
+        self.writeHistoryCsv()
+        with self.openStore() as history:
+            self.assertEqual([(subject["last_name"], subject["age"]) for subject in history.subjects()],
+                             [("Pérez", 41), ("Ruiz", 27)], "should import every row of history.csv")
+        with self.openStore() as history:
+            self.assertEqual(len(history.subjects()), 2, "should not import history.csv again")
+        self.assertTrue(os.path.exists(self.historyCsvFilename), "should leave history.csv as it is")
+
+    def testUnversionedDatabaseIsMigrated(self):
+        # a database from before the schema was versioned has user_version 0
+        sqlite3.connect(self.databaseFilename).close()
+        self.writeHistoryCsv()
+        with self.openStore() as history:
+            self.assertEqual(len(history.subjects()), 2, "should import history.csv while migrating")
+            history.addTest("s1", "a.csv", "2024-01-01 10:00:00", "2024-01-01 10:02:00", 1, 120)
+        self.assertEqual(self.userVersion(), SCHEMA_VERSION, "should raise the schema version")
+
+
+class ConcurrentStationsTest(HistoryStoreTestCase):
+    def testConcurrentInsertsAreAllKept(self):
+        self.openStore().close()
+        errors = []
+
+        def registerSubjects(station):
+            try:
+                # no history.csv to import, so nothing is printed
+                with historyStore(self.databaseFilename) as history:
+                    for number in range(50):
+                        history.addSubject(f"Station {station}", str(number), 20, "F")
+            except sqlite3.Error as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=registerSubjects, args=(station,)) for station in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [], "stations should wait for each other")
+        with self.openStore() as history:
+            self.assertEqual(len(history.subjects()), 200, "should keep every row")
+
+    def testTransactionHoldsWriteLockFromTheStart(self):
+        with self.openStore() as history, self.openStore(timeout=0.1) as otherStation:
+            with history.transaction():
+                # BEGIN IMMEDIATE locks before the first write
+                with self.assertRaises(sqlite3.OperationalError):
+                    otherStation.addSubject("Eva", "Ruiz", 27, "F")
+            otherStation.addSubject("Eva", "Ruiz", 27, "F")
+            self.assertEqual(len(history.subjects()), 1, "should write once the lock is released")
+
+    def testFailedTransactionIsRolledBack(self):
+        with self.openStore() as history:
+            with self.assertRaises(ValueError):
+                with history.transaction():
+                    history.connection.execute(
+                        "INSERT INTO subjects (register_date, last_name) VALUES ('2024-01-01 10:00:00', 'Ruiz')")
+                    raise ValueError("station crashed")
+            self.assertEqual(len(history.subjects()), 0, "should not keep half a transaction")
+
+
+class SchemaUpgradeTest(HistoryStoreTestCase):
+    def testVersionOneDatabaseGetsTheCatalog(self):
+        # version 1 only had the subjects table
+        connection = sqlite3.connect(self.databaseFilename)
+        connection.execute("CREATE TABLE subjects (id INTEGER PRIMARY KEY, session_id TEXT, "
+                           "register_date TEXT NOT NULL, last_name TEXT, first_name TEXT, age INTEGER, gender TEXT)")
+        connection.execute("INSERT INTO subjects (session_id, register_date, last_name, first_name) "
+                           "VALUES ('s1', '2024-01-01 10:00:00', 'Ruiz', 'Eva')")
+        connection.execute("PRAGMA user_version = 1")
+        connection.commit()
+        connection.close()
+        with open(self.historyCsvFilename, "w") as historyFile:
+            historyFile.write("register_date,last_name,first_name,age,gender\n2023-05-01 09:00:00,Pérez,Luis,41,M\n")
+        with self.openStore() as history:
+            history.addTest("s1", "a.csv", "2024-01-01 10:00:00", "2024-01-01 10:02:00", 1, 120)
+            history.addSessionFile("s1", "s1.bin", "capture")
+            self.assertEqual([subject["last_name"] for subject in history.subjects()], ["Ruiz"],
+                             "should keep the subjects and not import history.csv again")
+            self.assertEqual(history.findTests()[0]["first_name"], "Eva", "should join the existing subject")
+            self.assertEqual(history.sessionFiles("s1")[0]["filename"], "s1.bin")
+        self.assertEqual(self.userVersion(), SCHEMA_VERSION, "should raise the schema version")
+
+
+class SessionCatalogTest(HistoryStoreTestCase):
+    def setUp(self):
+        HistoryStoreTestCase.setUp(self)
+        self.history = self.openStore()
+        self.addCleanup(self.history.close)
+        self.history.addSubject("Eva", "Ruiz", 27, "F", session_id="s1")
+        self.history.addSubject("Luis", "Pérez", 41, "M", session_id="s2")
+        self.history.addTest("s1", self.writeTestCsv("s1-0.csv", [1, 2]), "2024-01-01 10:00:00",
+                             "2024-01-01 10:02:00", 1, 2, [0, 0], 0)
+        self.history.addTest("s1", self.writeTestCsv("s1-1.csv", [3]), "2024-01-01 10:02:00",
+                             "2024-01-01 10:04:00", 2, 1, [200, None], 1)
+        self.history.addTest("s2", self.writeTestCsv("s2-0.csv", [4]), "2024-01-02 10:00:00",
+                             "2024-01-02 10:02:00", 1, 1, [0, 50], 0)
+        # nobody was registered in this session
+        self.history.addTest("s3", self.writeTestCsv("s3-0.csv", [5]), "2024-01-03 10:00:00",
+                             "2024-01-03 10:02:00", 0, 1, [], 0)
+
+    def writeTestCsv(self, filename, rawValues):
+        filename = os.path.join(self.temporaryDirectory.name, filename)
+        with open(filename, "w") as testFile:
+            testFile.write("raw_value\n" + "".join(f"{rawValue}\n" for rawValue in rawValues))
+        return filename
+
+    def findSessionsAndNumbers(self, **conditions):
+        return [(test["session_id"], test["test_number"]) for test in self.history.findTests(**conditions)]
+
+    def testAllTestsAreFoundOldestFirst(self):
+        self.assertEqual(self.findSessionsAndNumbers(), [("s1", 0), ("s1", 1), ("s2", 0), ("s3", 0)])
+
+    def testTestsAreFilteredByEveryCondition(self):
+        self.assertEqual(self.findSessionsAndNumbers(category=1), [("s1", 0), ("s2", 0)])
+        self.assertEqual(self.findSessionsAndNumbers(since="2024-01-02", until="2024-01-02 23:59:59"), [("s2", 0)])
+        self.assertEqual(self.findSessionsAndNumbers(last_name="Ruiz"), [("s1", 0), ("s1", 1)])
+        self.assertEqual(self.findSessionsAndNumbers(first_name="Luis", category=1), [("s2", 0)])
+        self.assertEqual(self.findSessionsAndNumbers(session_id="s3"), [("s3", 0)])
+        self.assertEqual(self.findSessionsAndNumbers(max_noise_mean=20), [("s1", 0)])
+        self.assertEqual(self.findSessionsAndNumbers(category=2, last_name="Pérez"), [])
+
+    def testTestsAreJoinedWithTheirSubject(self):
+        tests = self.history.findTests()
+        self.assertEqual([(test["first_name"], test["last_name"]) for test in tests],
+                         [("Eva", "Ruiz"), ("Eva", "Ruiz"), ("Luis", "Pérez"), (None, None)],
+                         "should keep tests of sessions without a subject")
+
+    def testNoiseStatisticsIgnoreMissingValues(self):
+        test = self.history.findTests(session_id="s1", category=2)[0]
+        self.assertEqual((test["noise_mean"], test["noise_max"], test["noisy_rows"]), (200, 200, 1))
+        test = self.history.findTests(session_id="s3")[0]
+        self.assertEqual((test["noise_mean"], test["noise_max"], test["noisy_rows"]), (None, None, 0))
+
+    def testLoadTestsConcatenatesTheFiles(self):
+        df = self.history.loadTests(last_name="Ruiz")
+        self.assertEqual(list(df["raw_value"]), [1, 2, 3])
+        self.assertEqual(list(df["session_id"]), ["s1", "s1", "s1"])
+        self.assertEqual(list(df["test_number"]), [0, 0, 1])
+        self.assertTrue(self.history.loadTests(category=5).empty, "should return an empty DataFrame")
+
+
+if __name__ == '__main__':
+    unittest.main()
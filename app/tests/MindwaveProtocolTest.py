@@ -0,0 +1,121 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from MindwaveProtocol import buildSchedule, protocolScheduler, TEST_START_CODE, TEST_END_CODE, REST_CODE
+from mindwavemobile.MindwaveMarkers import MindwaveMarkers
+
+SECOND_NS = 1000000000
+
+
+def eventsWithoutActions(events):
+    return [(seconds, testNumber, code, label) for seconds, testNumber, _, code, label in events]
+
+
+class BuildScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.events = buildSchedule([["derecha", 1, 12], ["descanso", 0, 25]])
+
+    def testEventsAreInTimeOrder(self):
+        seconds = [event[0] for event in self.events]
+        self.assertEqual(seconds, sorted(seconds))
+        self.assertTrue(all(event[2] is not None or event[3] is not None for event in self.events),
+                        "every event should be shown or recorded")
+
+    def testMarkersOfEveryTest(self):
+        markers = [event for event in eventsWithoutActions(self.events) if event[2] is not None]
+        self.assertEqual(markers, [
+            (0, 0, TEST_START_CODE, "derecha"),
+            (5, 0, 1, "cue"),
+            (10, 0, 1, "cue"),
+            (12, 0, TEST_END_CODE, "derecha"),
+            (12, 1, TEST_START_CODE, "descanso"),
+            (17, 1, REST_CODE, "rest"),
+            (22, 1, REST_CODE, "rest"),
+            (27, 1, REST_CODE, "rest"),
+            (32, 1, REST_CODE, "rest"),
+            (37, 1, TEST_END_CODE, "descanso"),
+        ], "the end of a test should come before the start of the next one")
+
+    def testShownEventsWithoutMarkers(self):
+        shownSeconds = [event[0] for event in self.events if event[2] is not None and event[3] is None]
+        # warnings 10 s before the end, empty lines after the cues and during the rest
+        self.assertEqual(shownSeconds, [2, 6, 11, 27, 31])
+
+    def testNumberOfTrials(self):
+        scheduler = protocolScheduler([["derecha", 1, 12], ["descanso", 0, 25]])
+        self.assertEqual(scheduler.numberOfTrials(), 6)
+
+
+class CategoryAtTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = protocolScheduler([["izquierda", 2, 20]])
+        self.cueTime = 100 * SECOND_NS
+        self.scheduler.cue_times = [self.cueTime, self.cueTime + 5 * SECOND_NS]
+        self.scheduler.cue_categories = [2, 1]
+
+    def testRowsBeforeTheFirstCue(self):
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime - 1), 0)
+
+    def testRowsComputedDuringTheCue(self):
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + SECOND_NS), 2, "the whole second")
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + SECOND_NS // 2), 2, "half of it")
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + 3 * SECOND_NS // 2), 2, "the other half")
+
+    def testRowsMostlyOutsideTheCue(self):
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + 2 * SECOND_NS // 5), 0)
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + 8 * SECOND_NS // 5), 0)
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + 4 * SECOND_NS), 0)
+
+    def testRowsOfTheNextCue(self):
+        self.assertEqual(self.scheduler.categoryAt(self.cueTime + 6 * SECOND_NS), 1)
+
+
+class JitterReportTest(unittest.TestCase):
+    def testNoEventsNoReport(self):
+        self.assertIsNone(protocolScheduler([]).jitterReport())
+
+    def testStatisticsInMilliseconds(self):
+        scheduler = protocolScheduler([])
+        # 1 ms to 20 ms, unordered
+        scheduler.jitters = [jitter * 1000000 for jitter in (20, 3, 1, 19, 2, 4, 5, 6, 7, 8,
+                                                              9, 10, 11, 12, 13, 14, 15, 16, 17, 18)]
+        report = scheduler.jitterReport()
+        self.assertEqual(report["events"], 20)
+        self.assertAlmostEqual(report["mean_ms"], 10.5)
+        self.assertAlmostEqual(report["p95_ms"], 20.0)
+        self.assertAlmostEqual(report["max_ms"], 20.0)
+
+
+class ProtocolSchedulerTest(unittest.TestCase):
+    def testRunsTestsAndRecordsTheirMarkers(self):
+        markers = MindwaveMarkers()
+        scheduler = protocolScheduler([["uno", 1, 1], ["dos", 2, 1]], markers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.start()
+            self.assertTrue(scheduler.waitForTest(1, timeout=5))
+            scheduler.join(5)
+        self.assertTrue(scheduler.testIsOver(0) and scheduler.testIsOver(1))
+        self.assertEqual([(marker.code, marker.label) for marker in markers.markers()],
+                         [(TEST_START_CODE, "uno"), (TEST_END_CODE, "uno"),
+                          (TEST_START_CODE, "dos"), (TEST_END_CODE, "dos")])
+        self.assertEqual(scheduler.test_end_times[0], markers.markers()[1].timeNs)
+        self.assertLess(scheduler.jitterReport()["max_ms"], 50, "events should happen on time")
+
+    def testStopEndsEveryTest(self):
+        scheduler = protocolScheduler([["largo", 0, 60]])
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.start()
+            scheduler.stop()
+            scheduler.join(5)
+        self.assertFalse(scheduler.is_alive())
+        self.assertTrue(scheduler.testIsOver(0), "readers waiting for the test should be released")
+        self.assertIsNone(scheduler.test_end_times[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
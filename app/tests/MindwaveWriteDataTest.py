@@ -0,0 +1,139 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from MindwaveWriteData import streamWriter, sessionClock, columnarWriter, columnarWriterAvailable, writeEpochs
+from mindwavemobile.MindwaveEpochs import MindwaveEpochs
+
+SECOND_NS = 1000000000
+
+
+class StreamWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.temporaryDirectory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temporaryDirectory.name, "test-MindwaveData.csv")
+        self.clock = sessionClock()
+
+    def tearDown(self):
+        self.temporaryDirectory.cleanup()
+
+    def readLines(self, filename):
+        with open(filename, newline="") as csvFile:
+            return csvFile.read().splitlines()
+
+    def testRowsGoToPartFileUntilClose(self):
+        csvWriter = streamWriter(["date_time", "attention"], filename=self.filename, clock=self.clock)
+        csvWriter.writeRow([self.clock.monotonic_time_ns, 50])
+        csvWriter.flush()
+        self.assertFalse(os.path.exists(self.filename), "should not use the final name before close")
+        self.assertEqual(len(self.readLines(self.filename + ".part")), 2, "should stream rows to the .part file")
+        with contextlib.redirect_stdout(io.StringIO()):
+            csvWriter.close()
+        self.assertFalse(os.path.exists(self.filename + ".part"), "should rename the .part file")
+        self.assertEqual(self.readLines(self.filename)[0], "date_time,attention")
+        self.assertEqual(csvWriter.row_count, 1)
+
+    def testTimesAreFormattedAndNoneIsEmpty(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            with streamWriter(["date_time", "attention", "blink"], filename=self.filename, clock=self.clock) as csvWriter:
+                csvWriter.writeRow([self.clock.monotonic_time_ns + SECOND_NS // 2, 50, None])
+        expectedTime = self.clock.formatTime(self.clock.monotonic_time_ns + SECOND_NS // 2)
+        self.assertEqual(self.readLines(self.filename)[1], expectedTime + ",50,",
+                         "should write the time with milliseconds and None as an empty field")
+
+    def testInvalidFsyncPolicyIsRejected(self):
+        with self.assertRaises(ValueError):
+            streamWriter(["date_time"], filename=self.filename, fsync_policy="always")
+        self.assertFalse(os.path.exists(self.filename + ".part"), "should not create a file")
+
+    def testCrashBeforeCloseLeavesOnlyPartFile(self):
+        with self.assertRaises(RuntimeError):
+            with streamWriter(["date_time", "attention"], filename=self.filename, clock=self.clock,
+                              fsync_policy="flush") as csvWriter:
+                csvWriter.writeRow([self.clock.monotonic_time_ns, 50])
+                raise RuntimeError("headset disconnected")
+        self.assertFalse(os.path.exists(self.filename), "an interrupted test should not look complete")
+        self.assertEqual(len(self.readLines(self.filename + ".part")), 2, "should keep the rows written so far")
+
+
+@unittest.skipUnless(columnarWriterAvailable(), "pyarrow is not installed")
+class ColumnarWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.temporaryDirectory = tempfile.TemporaryDirectory()
+        self.clock = sessionClock()
+
+    def tearDown(self):
+        self.temporaryDirectory.cleanup()
+
+    def writeSession(self, fileFormat):
+        filename = os.path.join(self.temporaryDirectory.name, "session." + fileFormat)
+        firstTime = self.clock.monotonic_time_ns + 1500000
+        with contextlib.redirect_stdout(io.StringIO()):
+            with columnarWriter(filename, file_format=fileFormat, clock=self.clock) as sessionWriter:
+                sessionWriter.writeRow([firstTime, 1, 2, 3, 4, 5, 6, 7, 16777215,
+                                        -2048, 50, 60, None, 0, 1, 512], [-1, 0, 2047])
+                sessionWriter.endTest()
+                sessionWriter.writeRow([firstTime + SECOND_NS, 8, 7, 6, 5, 4, 3, 2, 1,
+                                        7, None, None, None, 200, 2, 1024], None)
+        self.assertFalse(os.path.exists(filename + ".part"), "should rename the .part file")
+        return filename, firstTime
+
+    def checkRoundTrip(self, table, firstTime):
+        import pyarrow as pa
+
+        self.assertEqual(table.schema.field("delta").type, pa.uint32())
+        self.assertEqual(table.schema.field("raw_value").type, pa.int16())
+        self.assertEqual(table.schema.field("raw_values").type, pa.list_(pa.int16()))
+        self.assertEqual(table.schema.field("sample_index").type, pa.uint64())
+        self.assertEqual(table.schema.field("date_time").type, pa.timestamp("ms"))
+        rows = table.to_pylist()
+        expectedTime = self.clock.toDatetime(firstTime)
+        expectedTime = expectedTime.replace(microsecond=expectedTime.microsecond // 1000 * 1000)
+        self.assertEqual(rows[0]["date_time"], expectedTime,
+                         "should turn the monotonic time into a timestamp with the session clock")
+        self.assertEqual([row["mid_gamma"] for row in rows], [16777215, 1])
+        self.assertEqual([row["raw_value"] for row in rows], [-2048, 7])
+        self.assertEqual([row["raw_values"] for row in rows], [[-1, 0, 2047], None])
+        self.assertEqual([row["attention"] for row in rows], [50, None], "should keep missing values")
+        self.assertEqual([row["blink"] for row in rows], [None, None])
+        self.assertEqual([row["sample_index"] for row in rows], [512, 1024])
+        self.assertEqual([row["test"] for row in rows], [0, 1], "should number the tests")
+
+    def testParquetRoundTrip(self):
+        import pyarrow.parquet as pq
+
+        filename, firstTime = self.writeSession("parquet")
+        self.assertEqual(pq.ParquetFile(filename).num_row_groups, 2, "should write one row group per test")
+        self.checkRoundTrip(pq.read_table(filename), firstTime)
+
+    def testFeatherRoundTrip(self):
+        import pyarrow.feather as feather
+
+        filename, firstTime = self.writeSession("feather")
+        self.checkRoundTrip(feather.read_table(filename), firstTime)
+
+
+class WriteEpochsTest(unittest.TestCase):
+    def testIncompleteEpochsAreReported(self):
+        epochs = MindwaveEpochs(4, sampleRate=10, before=0.5, after=1.0, baseline=None)
+        epochs.addMarkerAtSample(10, 1)
+        epochs.addMarkerAtSample(25, 2)
+        epochs.addRawValues(np.arange(30))
+        with tempfile.TemporaryDirectory() as temporaryDirectory:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                filename = writeEpochs(epochs, os.path.join(temporaryDirectory, "epochs.npz"))
+            with np.load(filename) as savedEpochs:
+                self.assertEqual(list(savedEpochs["codes"]), [1], "should save the complete epoch")
+        self.assertIn("1 épocas quedaron incompletas", output.getvalue(), "should report the pending marker")
+
+
+if __name__ == '__main__':
+    unittest.main()
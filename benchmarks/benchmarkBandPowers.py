@@ -0,0 +1,71 @@
+# benchmarkBandPowers.py
+#
+# Raw samples per second MindwaveBandPowers turns into band powers, fed one
+# sample at a time like RawDataPoints arrive and in blocks like
+# MindwaveRawSampleColumns hands them out, compared with one FFT per window
+# in a Python loop. The headset sends 512 samples per second, "x real time"
+# is how much faster than that the samples are processed; on a Raspberry Pi
+# it should stay well above 1x.
+#
+# python benchmarks/benchmarkBandPowers.py [--seconds 300] [--window 512] [--hop 64]
+
+import argparse
+import time
+
+import numpy as np
+
+from mindwavemobile.MindwaveBandPowers import MindwaveBandPowers
+
+SAMPLE_RATE = 512
+
+
+def buildRawValues(seconds):
+    random = np.random.default_rng(0)
+    sampleTimes = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    rawValues = 80 * np.sin(2 * np.pi * 10 * sampleTimes) + random.normal(0, 40, len(sampleTimes))
+    return rawValues.round().astype(np.int16)
+
+
+def feedSamples(bandPowers, rawValues):
+    for rawValue in rawValues.tolist():
+        bandPowers.addRawValue(rawValue)
+
+
+def feedBlocks(bandPowers, rawValues, blockSize=512):
+    for position in range(0, len(rawValues), blockSize):
+        bandPowers.addRawValues(rawValues[position:position + blockSize])
+
+
+def loopPerWindow(rawValues, windowSize, hopSize):
+    # one FFT per window, as a straightforward implementation would do it
+    taper = np.hanning(windowSize)
+    for windowStart in range(0, len(rawValues) - windowSize + 1, hopSize):
+        window = rawValues[windowStart:windowStart + windowSize].astype(float)
+        np.abs(np.fft.rfft((window - window.mean()) * taper)) ** 2
+
+
+def runBenchmark(name, benchmarkFunction, numberOfSamples):
+    startTime = time.perf_counter()
+    benchmarkFunction()
+    elapsedTime = time.perf_counter() - startTime
+    print("{:<32} {:>14,.0f} samples/s ({:,.0f}x real time)".format(
+        name, numberOfSamples / elapsedTime, numberOfSamples / elapsedTime / SAMPLE_RATE))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=300)
+    parser.add_argument("--window", type=int, default=512)
+    parser.add_argument("--hop", type=int, default=64)
+    arguments = parser.parse_args()
+    rawValues = buildRawValues(arguments.seconds)
+
+    def createBandPowers():
+        return MindwaveBandPowers(windowSize=arguments.window, hopSize=arguments.hop,
+                                  onBandPowers=lambda powers, sampleNumbers: None)
+
+    print("window {} samples, {:g} results/s".format(arguments.window, SAMPLE_RATE / arguments.hop))
+    runBenchmark("one FFT per window", lambda: loopPerWindow(rawValues, arguments.window, arguments.hop),
+                 len(rawValues))
+    runBenchmark("addRawValue per sample", lambda: feedSamples(createBandPowers(), rawValues), len(rawValues))
+    runBenchmark("addRawValues, 512 blocks", lambda: feedBlocks(createBandPowers(), rawValues), len(rawValues))
@@ -0,0 +1,56 @@
+# benchmarkDataPoints.py
+#
+# Parse time per payload and memory per data point of
+# MindwavePacketPayloadParser over a million payloads, mixing raw value
+# payloads with the once per second payload of poor signal, attention,
+# meditation and EEG powers.
+#
+# python benchmarks/benchmarkDataPoints.py
+
+import time
+import tracemalloc
+
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser
+
+NUMBER_OF_PAYLOADS = 1000000
+NUMBER_OF_KEPT_DATA_POINTS = 100000
+
+
+def buildPayloads(numberOfPayloads):
+    eegPowersPayload = bytes([0x02, 0x00, 0x04, 0x30, 0x05, 0x40, 0x83, 0x18] + list(range(24)))
+    payloads = []
+    for index in range(numberOfPayloads):
+        if (index % 513 == 512):
+            payloads.append(eegPowersPayload)
+        else:
+            rawValue = index % 4096 - 2048
+            payloads.append(bytes([0x80, 0x02]) + (rawValue & 0xffff).to_bytes(2, "big"))
+    return payloads
+
+
+def measureParseTime(payloads):
+    payloadParser = MindwavePacketPayloadParser()
+    startTime = time.perf_counter()
+    for payloadBytes in payloads:
+        payloadParser.parseDataPoints(payloadBytes)
+    elapsedTime = time.perf_counter() - startTime
+    print("parse time     {:>8.3f} us/payload ({:.2f} s for {} payloads)".format(
+        elapsedTime / len(payloads) * 1e6, elapsedTime, len(payloads)))
+
+
+def measureMemoryPerDataPoint(payloads):
+    payloadParser = MindwavePacketPayloadParser()
+    keptDataPoints = []
+    tracemalloc.start()
+    for payloadBytes in payloads[:NUMBER_OF_KEPT_DATA_POINTS]:
+        keptDataPoints.extend(payloadParser.parseDataPoints(payloadBytes))
+    currentMemory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("memory         {:>8.1f} bytes/data point ({} data points kept)".format(
+        currentMemory / len(keptDataPoints), len(keptDataPoints)))
+
+
+if __name__ == '__main__':
+    payloads = buildPayloads(NUMBER_OF_PAYLOADS)
+    measureParseTime(payloads)
+    measureMemoryPerDataPoint(payloads)
@@ -0,0 +1,329 @@
+# benchmarkPipeline.py
+#
+# Benchmark suite for the path from headset bytes to files on disk, meant
+# to be run on the deployment target (Raspberry Pi 4B) before shipping.
+# Every stage processes the whole stream, synthetic by default or a
+# recorded capture file, and reports:
+#
+# - throughput in its own unit and as a multiple of real time,
+# - latency percentiles of single calls (they include about 0.1 us of
+#   timer overhead),
+# - peak memory allocated while the stage ran (tracemalloc).
+#
+# Throughput, latencies and memory are measured in separate passes so the
+# measurements do not slow each other down. Results can be saved as JSON
+# and compared with a saved baseline; the script exits with 1 when a stage
+# got slower or uses more memory than the baseline allows.
+#
+# PYTHONPATH=. python benchmarks/benchmarkPipeline.py
+# PYTHONPATH=. python benchmarks/benchmarkPipeline.py --capture session.bin --stages framing,parsing
+# PYTHONPATH=. python benchmarks/benchmarkPipeline.py --json new.json --compare baseline.json
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser, DATA_ROW_DECODERS
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+from mindwavemobile.MindwaveTransports import CaptureFileTransport, REAL_TIME_BYTES_PER_SECOND
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+CHUNK_SIZE = 1024
+CSV_ROWS_PER_FILE = 512
+RAW_VALUE_PERIOD_NS = 1000000000 // 512
+
+
+def framePackets(streamBytes):
+    # (payload, checksum) of every packet with a correct checksum
+    framer = MindwavePacketFramer()
+    packets = []
+    for payloadBytes, checkSumIsOk in framer.feed(streamBytes):
+        if (checkSumIsOk):
+            payloadBytes = bytes(payloadBytes)
+            packets.append((payloadBytes, ~sum(payloadBytes) & 0xff))
+    return packets
+
+
+def splitIntoChunks(streamBytes):
+    return [streamBytes[position:position + CHUNK_SIZE] for position in range(0, len(streamBytes), CHUNK_SIZE)]
+
+
+def dataRowsOf(packets):
+    # (decoder, value bytes) of every known data row, the input of the data
+    # point constructors
+    payloadParser = MindwavePacketPayloadParser(keepDataValueBytes=True)
+    dataRows = []
+    for payloadBytes, _ in packets:
+        for dataPoint in payloadParser.parseDataPoints(payloadBytes):
+            if (type(dataPoint) in DATA_ROW_DECODERS.values()):
+                dataRows.append((type(dataPoint), dataPoint.dataValueBytes))
+    return dataRows
+
+
+def csvRowsOf(dataRows):
+    # one row per raw value in the format of MindwaveReaderStart, the
+    # heaviest load the CSV writer can get from a session; rows start with
+    # a time.monotonic_ns() time like the ones the reader stamps
+    rows = []
+    receiveTimeNs = time.monotonic_ns()
+    sampleIndex = 0
+    for decoder, valueBytes in dataRows:
+        if (decoder.__name__ == "RawDataPoint"):
+            rawValue = int.from_bytes(valueBytes, "big", signed=True)
+            rows.append([receiveTimeNs + sampleIndex * RAW_VALUE_PERIOD_NS,
+                         1, 2, 3, 4, 5, 6, 7, 8, rawValue, 50, 60, None, 0, 0, sampleIndex])
+            sampleIndex += 1
+    return rows
+
+
+class Stage:
+    # prepare(stream) returns (steps, unitsPerStep, finish) for one pass:
+    # every step is called once, finish (or None) afterwards.
+    def __init__(self, name, unit, prepare):
+        self.name = name
+        self.unit = unit
+        self.prepare = prepare
+
+
+def prepareFraming(stream):
+    framer = MindwavePacketFramer()
+
+    def frameChunk(chunk):
+        for _ in framer.feed(chunk):
+            pass
+    return [lambda chunk=chunk: frameChunk(chunk) for chunk in stream.chunks], len(stream.packets), None
+
+
+def prepareCheckSum(stream):
+    framer = MindwavePacketFramer()
+    return ([lambda payloadBytes=payloadBytes, checkSum=checkSum: framer._checkSumIsOk(payloadBytes, checkSum)
+             for payloadBytes, checkSum in stream.packets], len(stream.packets), None)
+
+
+def prepareParsing(stream):
+    payloadParser = MindwavePacketPayloadParser()
+    return ([lambda payloadBytes=payloadBytes: payloadParser.parseDataPoints(payloadBytes)
+             for payloadBytes, _ in stream.packets], len(stream.packets), None)
+
+
+def prepareDataPoints(stream):
+    return ([lambda decoder=decoder, valueBytes=valueBytes: decoder(valueBytes)
+             for decoder, valueBytes in stream.dataRows], len(stream.dataRows), None)
+
+
+def prepareReader(stream):
+    # readNextDataPoint over the stream replayed from a file
+    dataPointReader = MindwaveDataPointReader(transport=CaptureFileTransport(stream.capturePath))
+    dataPointReader.start()
+    numberOfDataPoints = stream.numberOfDataPoints
+    return [dataPointReader.readNextDataPoint] * numberOfDataPoints, numberOfDataPoints, dataPointReader.stop
+
+
+def prepareCsvWriting(stream):
+    from MindwaveWriteData import writeData
+    outputDirectory = tempfile.TemporaryDirectory()
+    os.mkdir(os.path.join(outputDirectory.name, "output_files"))
+    workingDirectory = os.getcwd()
+    os.chdir(outputDirectory.name)
+    # writeData takes the rows as comma separated strings
+    rows = [",".join(str(value) for value in row) for row in stream.csvRows]
+
+    def writeFile(fileRows):
+        with contextlib.redirect_stdout(io.StringIO()):
+            writeData(fileRows).writeFile()
+
+    def finish():
+        os.chdir(workingDirectory)
+        outputDirectory.cleanup()
+    steps = [lambda fileRows=rows[position:position + CSV_ROWS_PER_FILE]: writeFile(fileRows)
+             for position in range(0, len(rows), CSV_ROWS_PER_FILE)]
+    return steps, len(rows), finish
+
+
+def prepareCsvStreaming(stream):
+    from MindwaveWriteData import streamWriter
+    outputDirectory = tempfile.TemporaryDirectory()
+    csvWriter = streamWriter(["row"], filename=os.path.join(outputDirectory.name, "streamed.csv"))
+    rows = stream.csvRows
+
+    def finish():
+        with contextlib.redirect_stdout(io.StringIO()):
+            csvWriter.close()
+        outputDirectory.cleanup()
+    return [lambda row=row: csvWriter.writeRow(row) for row in rows], len(rows), finish
+
+
+def prepareBinaryWriting(stream):
+    # the received bytes as they are, as a capture recorder stores them
+    outputFile = tempfile.NamedTemporaryFile(delete=False)
+
+    def finish():
+        outputFile.close()
+        os.remove(outputFile.name)
+    return ([lambda chunk=chunk: outputFile.write(chunk) for chunk in stream.chunks]
+            + [outputFile.flush], len(stream.bytes), finish)
+
+
+STAGES = [
+    Stage("framing", "packets", prepareFraming),
+    Stage("checksum", "packets", prepareCheckSum),
+    Stage("parsing", "packets", prepareParsing),
+    Stage("dataPoints", "data points", prepareDataPoints),
+    Stage("reader", "data points", prepareReader),
+    Stage("csvWriting", "rows", prepareCsvWriting),
+    Stage("csvStreaming", "rows", prepareCsvStreaming),
+    Stage("binaryWriting", "bytes", prepareBinaryWriting),
+]
+
+
+class Stream:
+    def __init__(self, streamBytes, capturePath):
+        self.bytes = streamBytes
+        self.capturePath = capturePath
+        self.seconds = len(streamBytes) / REAL_TIME_BYTES_PER_SECOND
+        self.chunks = splitIntoChunks(streamBytes)
+        self.packets = framePackets(streamBytes)
+        self.dataRows = dataRowsOf(self.packets)
+        payloadParser = MindwavePacketPayloadParser()
+        self.numberOfDataPoints = sum(len(payloadParser.parseDataPoints(payloadBytes))
+                                      for payloadBytes, _ in self.packets)
+        self.csvRows = csvRowsOf(self.dataRows)
+
+
+def measureThroughput(stage, stream):
+    steps, units, finish = stage.prepare(stream)
+    startTime = time.perf_counter()
+    for step in steps:
+        step()
+    elapsedTime = time.perf_counter() - startTime
+    if (finish is not None):
+        finish()
+    return units, elapsedTime
+
+
+def measureLatencies(stage, stream):
+    steps, _, finish = stage.prepare(stream)
+    latencies = []
+    clock = time.perf_counter_ns
+    for step in steps:
+        startTime = clock()
+        step()
+        latencies.append(clock() - startTime)
+    if (finish is not None):
+        finish()
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {"p50Us": percentiles[49] / 1e3, "p95Us": percentiles[94] / 1e3,
+            "p99Us": percentiles[98] / 1e3, "maxUs": max(latencies) / 1e3}
+
+
+def measurePeakMemory(stage, stream):
+    steps, _, finish = stage.prepare(stream)
+    tracemalloc.start()
+    for step in steps:
+        step()
+    _, peakMemory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if (finish is not None):
+        finish()
+    return peakMemory
+
+
+def runStage(stage, stream):
+    units, elapsedTime = measureThroughput(stage, stream)
+    result = {
+        "unit": stage.unit + "/s",
+        "throughput": units / elapsedTime,
+        "realTime": stream.seconds / elapsedTime,
+    }
+    result.update(measureLatencies(stage, stream))
+    result["peakMemoryBytes"] = measurePeakMemory(stage, stream)
+    return result
+
+
+def printResult(name, result):
+    print("{:<14} {:>14,.0f} {:<15} {:>8.0f}x real time   p50 {:>8.2f} us   p95 {:>8.2f} us   "
+          "p99 {:>8.2f} us   peak {:>10,} bytes".format(
+              name, result["throughput"], result["unit"], result["realTime"],
+              result["p50Us"], result["p95Us"], result["p99Us"], result["peakMemoryBytes"]))
+
+
+def findRegressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if (name not in baseline["stages"]):
+            continue
+        baselineResult = baseline["stages"][name]
+        if (result["throughput"] < baselineResult["throughput"] * (1 - tolerance)):
+            regressions.append("{}: throughput {:,.0f} {} is below the baseline {:,.0f}".format(
+                name, result["throughput"], result["unit"], baselineResult["throughput"]))
+        if (result["peakMemoryBytes"] > baselineResult["peakMemoryBytes"] * (1 + tolerance)):
+            regressions.append("{}: peak memory {:,} bytes is above the baseline {:,}".format(
+                name, result["peakMemoryBytes"], baselineResult["peakMemoryBytes"]))
+    return regressions
+
+
+def loadStream(arguments):
+    if (arguments.capture is not None):
+        with open(arguments.capture, "rb") as captureFile:
+            return Stream(captureFile.read(), arguments.capture), None
+    capturePath = os.path.join(tempfile.mkdtemp(), "synthetic.bin")
+    generator = MindwaveStreamGenerator(seed=0, blinkInterval=10)
+    generator.writeFile(capturePath, arguments.seconds)
+    with open(capturePath, "rb") as captureFile:
+        return Stream(captureFile.read(), capturePath), capturePath
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the acquisition-to-disk pipeline.")
+    parser.add_argument("--seconds", type=int, default=60, help="length of the synthetic stream")
+    parser.add_argument("--capture", help="recorded byte stream to use instead of a synthetic one")
+    parser.add_argument("--stages", help="comma separated stages, all by default: "
+                                         + ",".join(stage.name for stage in STAGES))
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="baseline JSON file of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative slowdown or memory growth against the baseline")
+    arguments = parser.parse_args()
+
+    stream, syntheticCapturePath = loadStream(arguments)
+    selectedNames = None if arguments.stages is None else arguments.stages.split(",")
+    print("{} on {} {}, Python {}".format(
+        arguments.capture or "{} s synthetic stream".format(arguments.seconds),
+        platform.machine(), platform.system(), platform.python_version()))
+    print("{:,} bytes, {:,} packets, {:.0f} s of data\n".format(len(stream.bytes), len(stream.packets), stream.seconds))
+
+    results = {}
+    for stage in STAGES:
+        if (selectedNames is not None and stage.name not in selectedNames):
+            continue
+        if (stage.name == "csvWriting" and importlib.util.find_spec("pandas") is None):
+            print("{:<14} skipped, pandas is not installed".format(stage.name))
+            continue
+        results[stage.name] = runStage(stage, stream)
+        printResult(stage.name, results[stage.name])
+
+    if (syntheticCapturePath is not None):
+        os.remove(syntheticCapturePath)
+        os.rmdir(os.path.dirname(syntheticCapturePath))
+    if (arguments.json is not None):
+        with open(arguments.json, "w") as jsonFile:
+            json.dump({"machine": platform.machine(), "python": platform.python_version(),
+                       "streamSeconds": stream.seconds, "stages": results}, jsonFile, indent=2)
+    if (arguments.compare is not None):
+        with open(arguments.compare) as baselineFile:
+            regressions = findRegressions(results, json.load(baselineFile), arguments.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        sys.exit(1 if len(regressions) > 0 else 0)
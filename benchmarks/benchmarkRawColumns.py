@@ -0,0 +1,72 @@
+# benchmarkRawColumns.py
+#
+# Raw samples decoded per second by MindwavePacketPayloadParser, creating
+# a RawDataPoint per sample versus writing them into the numpy arrays of
+# MindwaveRawSampleColumns. The synthetic stream has one raw value per
+# packet like the headset sends them, plus one EEG powers packet for every
+# 512 raw values.
+#
+# python benchmarks/benchmarkRawColumns.py
+
+import time
+
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from mindwavemobile.MindwaveRawSampleColumns import MindwaveRawSampleColumns
+from mindwavemobile.MindwaveStreamGenerator import buildPacket
+
+SECONDS_OF_DATA = 200
+CHUNK_SIZE = 1024
+
+
+def buildStream(secondsOfData):
+    packets = []
+    for second in range(secondsOfData):
+        for sample in range(512):
+            rawValue = (sample * 7 + second) % 4096 - 2048
+            packets.append(buildPacket([0x80, 0x02] + list((rawValue & 0xffff).to_bytes(2, "big"))))
+        eegPowers = [0x83, 0x18] + [(second + i) % 256 for i in range(24)]
+        packets.append(buildPacket([0x02, 0x00, 0x04, 0x30, 0x05, 0x40] + eegPowers))
+    return b"".join(packets)
+
+
+def framePayloads(streamBytes):
+    framer = MindwavePacketFramer()
+    return [bytes(payloadBytes) for payloadBytes, _ in framer.feed(streamBytes)]
+
+
+def decodeStream(streamBytes, payloadParser):
+    framer = MindwavePacketFramer()
+    for position in range(0, len(streamBytes), CHUNK_SIZE):
+        for payloadBytes, checkSumIsOk in framer.feed(streamBytes[position:position + CHUNK_SIZE]):
+            if (checkSumIsOk):
+                payloadParser.parseDataPoints(payloadBytes)
+
+
+def decodePayloads(payloads, payloadParser):
+    for payloadBytes in payloads:
+        payloadParser.parseDataPoints(payloadBytes)
+
+
+def runBenchmark(name, decodeFunction, data, useRawSampleColumns):
+    rawSampleColumns = None
+    if (useRawSampleColumns):
+        rawSampleColumns = MindwaveRawSampleColumns(onBlock=lambda rawValues, sampleNumbers: None)
+    payloadParser = MindwavePacketPayloadParser(rawSampleColumns=rawSampleColumns)
+    startTime = time.perf_counter()
+    decodeFunction(data, payloadParser)
+    if (rawSampleColumns is not None):
+        rawSampleColumns.flush()
+    elapsedTime = time.perf_counter() - startTime
+    numberOfSamples = SECONDS_OF_DATA * 512
+    print("{:<40} {:>12,.0f} raw samples/s ({:.0f}x real time)".format(
+        name, numberOfSamples / elapsedTime, numberOfSamples / elapsedTime / 512))
+
+
+if __name__ == '__main__':
+    streamBytes = buildStream(SECONDS_OF_DATA)
+    payloads = framePayloads(streamBytes)
+    runBenchmark("payloads, RawDataPoint objects", decodePayloads, payloads, False)
+    runBenchmark("payloads, numpy raw columns", decodePayloads, payloads, True)
+    runBenchmark("framing + payloads, RawDataPoint objects", decodeStream, streamBytes, False)
+    runBenchmark("framing + payloads, numpy raw columns", decodeStream, streamBytes, True)
@@ -0,0 +1,57 @@
+# benchmarkRawFilters.py
+#
+# Time MindwaveRawFilters needs per block of raw values, with DC removal,
+# a 50 Hz notch and a 1-45 Hz band-pass, compared with the same biquads
+# run sample by sample in Python. A block has to be filtered in less time
+# than the headset needs to send it (blockSize / 512 seconds).
+#
+# python benchmarks/benchmarkRawFilters.py [--seconds 120] [--block-size 512]
+
+import argparse
+import time
+
+import numpy as np
+
+from mindwavemobile.MindwaveRawFilters import MindwaveRawFilters, notchSection, dcBlockerSection, butterworthSections
+
+SAMPLE_RATE = 512
+
+
+def filterPerSample(signal, sections):
+    for b0, b1, b2, a1, a2 in sections:
+        output, s1, s2 = [], 0.0, 0.0
+        for x in signal:
+            y = b0 * x + s1
+            s1 = b1 * x - a1 * y + s2
+            s2 = b2 * x - a2 * y
+            output.append(y)
+        signal = output
+    return signal
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=120)
+    parser.add_argument("--block-size", type=int, default=512)
+    arguments = parser.parse_args()
+    rawValues = np.random.default_rng(0).normal(0, 100, arguments.seconds * SAMPLE_RATE).round().astype(np.int16)
+
+    sections = ([dcBlockerSection(0.5, SAMPLE_RATE), notchSection(50.0, SAMPLE_RATE)]
+                + butterworthSections(1.0, SAMPLE_RATE, 4, highPass=True) + butterworthSections(45.0, SAMPLE_RATE, 4))
+    startTime = time.perf_counter()
+    filterPerSample(rawValues.tolist(), sections)
+    elapsedTime = time.perf_counter() - startTime
+    print("{:<28} {:>12,.0f} samples/s ({:,.0f}x real time)".format(
+        "per sample in Python", len(rawValues) / elapsedTime, len(rawValues) / elapsedTime / SAMPLE_RATE))
+
+    rawFilters = MindwaveRawFilters(bandPass=(1.0, 45.0), maximumBlockSize=max(arguments.block_size, 1))
+    startTime = time.perf_counter()
+    for position in range(0, len(rawValues), arguments.block_size):
+        rawFilters.filterBlock(rawValues[position:position + arguments.block_size])
+    elapsedTime = time.perf_counter() - startTime
+    print("{:<28} {:>12,.0f} samples/s ({:,.0f}x real time)".format(
+        "blocks of {}".format(arguments.block_size), len(rawValues) / elapsedTime,
+        len(rawValues) / elapsedTime / SAMPLE_RATE))
+    report = rawFilters.latencyReport()
+    print("per block: p50 {p50Ms:.3f} ms, p99 {p99Ms:.3f} ms, max {maximumMs:.3f} ms, "
+          "at most {maximumRealTimeShare:.2%} of the block's duration".format(**report))
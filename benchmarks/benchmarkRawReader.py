@@ -0,0 +1,138 @@
+# benchmarkRawReader.py
+#
+# Compares CPU time and peak memory per packet of reading data points
+# through the preallocated ring buffer and MindwavePacketFramer with the
+# previous implementation, which read packets byte by byte with getByte(),
+# grew the buffer with += and re-sliced it after every packet.
+# Runs without a headset, the bytes come from an in-memory transport.
+#
+# python benchmarks/benchmarkRawReader.py
+
+import time
+import tracemalloc
+
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveMobileRawReader import MindwaveMobileRawReader
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from mindwavemobile.MindwaveStreamGenerator import buildPacket
+
+NUMBER_OF_PACKETS = 100000
+
+
+class InMemoryTransport:
+    def __init__(self, streamBytes, maximumChunkSize=64):
+        self._stream = memoryview(streamBytes)
+        self._position = 0
+        self._maximumChunkSize = maximumChunkSize
+
+    def recv(self, amountOfBytes):
+        amountOfBytes = min(amountOfBytes, self._maximumChunkSize)
+        chunk = bytes(self._stream[self._position:self._position + amountOfBytes])
+        self._position += len(chunk)
+        return chunk
+
+    def receiveInto(self, freeBuffer):
+        amountOfBytes = min(len(freeBuffer), self._maximumChunkSize)
+        chunk = self._stream[self._position:self._position + amountOfBytes]
+        freeBuffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+
+class LegacyRawReader(MindwaveMobileRawReader):
+    # Buffer handling as it was before the ring buffer.
+    def __init__(self, transport):
+        MindwaveMobileRawReader.__init__(self, transport=transport)
+        self._buffer = []
+
+    def _readMoreBytesIntoBuffer(self, amountOfBytes):
+        newBytes = self._readBytesFromMindwaveMobile(amountOfBytes)
+        self._buffer += newBytes
+
+    def _readBytesFromMindwaveMobile(self, amountOfBytes):
+        missingBytes = amountOfBytes
+        receivedBytes = b''
+        while(missingBytes > 0):
+            receivedBytes += self._transport.recv(missingBytes)
+            missingBytes = amountOfBytes - len(receivedBytes)
+        return receivedBytes
+
+    def _getNextByte(self):
+        nextByte = self._buffer[self._bufferPosition]
+        self._bufferPosition += 1
+        return nextByte
+
+    def _getNextBytes(self, amountOfBytes):
+        nextBytes = list(self._buffer[self._bufferPosition: self._bufferPosition + amountOfBytes])
+        self._bufferPosition += amountOfBytes
+        return nextBytes
+
+    def clearAlreadyReadBuffer(self):
+        self._buffer = self._buffer[self._bufferPosition:]
+        self._bufferPosition = 0
+
+    def _bufferSize(self):
+        return len(self._buffer)
+
+
+class LegacyDataPointReader(MindwaveDataPointReader):
+    # Byte by byte packet reading as it was before MindwavePacketFramer.
+    def __init__(self, rawReader):
+        MindwaveDataPointReader.__init__(self, transport=rawReader._transport)
+        self._mindwaveMobileRawReader = rawReader
+
+    def _putNextDataPointsInQueue(self):
+        self._dataPointQueue.extend(self._readDataPointsFromOnePacket())
+
+    def _readDataPointsFromOnePacket(self):
+        self._goToStartOfNextPacket()
+        payloadLength = self._mindwaveMobileRawReader.getByte()
+        payloadBytes = self._mindwaveMobileRawReader.getBytes(payloadLength)
+        checkSum = self._mindwaveMobileRawReader.getByte()
+        if (not self._checkSumIsOk(payloadBytes, checkSum)):
+            return self._readDataPointsFromOnePacket()
+        dataPoints = MindwavePacketPayloadParser(payloadBytes).parseDataPoints()
+        self._mindwaveMobileRawReader.clearAlreadyReadBuffer()
+        return dataPoints
+
+    def _goToStartOfNextPacket(self):
+        while(True):
+            byte = self._mindwaveMobileRawReader.getByte()
+            if (byte == MindwaveMobileRawReader.START_OF_PACKET_BYTE):
+                byte = self._mindwaveMobileRawReader.getByte()
+                if (byte == MindwaveMobileRawReader.START_OF_PACKET_BYTE):
+                    return
+
+    def _checkSumIsOk(self, payloadBytes, checkSum):
+        return (~sum(payloadBytes) + 256) % 256 == checkSum
+
+
+def buildRawValuePacket(rawValue):
+    return buildPacket(bytes([0x80, 0x02]) + (rawValue & 0xffff).to_bytes(2, "big"))
+
+
+def buildStream(numberOfPackets):
+    # a bit more than needed, the legacy reader reads ahead up to 100 bytes
+    return b"".join(buildRawValuePacket(i % 2048 - 1024) for i in range(numberOfPackets + 100))
+
+
+def runBenchmark(name, dataPointReader):
+    tracemalloc.start()
+    startTime = time.process_time()
+    for _ in range(NUMBER_OF_PACKETS):
+        dataPointReader.readNextDataPoint()
+    elapsedTime = time.process_time() - startTime
+    _, peakMemory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{:<36} {:>8.2f} us/packet {:>10} bytes peak".format(
+        name, elapsedTime / NUMBER_OF_PACKETS * 1e6, peakMemory))
+
+
+if __name__ == '__main__':
+    streamBytes = buildStream(NUMBER_OF_PACKETS)
+
+    legacyReader = LegacyRawReader(InMemoryTransport(streamBytes))
+    runBenchmark("legacy list buffer, byte by byte", LegacyDataPointReader(legacyReader))
+
+    dataPointReader = MindwaveDataPointReader(transport=InMemoryTransport(streamBytes))
+    runBenchmark("ring buffer + framer", dataPointReader)
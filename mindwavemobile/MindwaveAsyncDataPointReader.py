@@ -0,0 +1,113 @@
+import asyncio
+import collections
+import socket
+import time
+
+from .MindwavePacketFramer import MindwavePacketFramer
+from .MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from .MindwaveSampleClock import MindwaveSampleClock
+from .MindwaveTransports import findMindwaveMobileAddress
+
+
+class AsyncMindwaveDataPointReader:
+    # asyncio counterpart of MindwaveDataPointReader, so one event loop can
+    # read several headsets:
+    #
+    #     reader = AsyncMindwaveDataPointReader(address="9C:B7:0D:72:CD:02")
+    #     await reader.start()
+    #     async for dataPoint in reader:
+    #         ...
+    #
+    # Bytes come from streamReader, anything with an awaitable read(n) that
+    # returns b"" at the end of the stream (e.g. asyncio.StreamReader).
+    # Without one, start() opens a non-blocking RFCOMM socket to address.
+    # Like the synchronous reader, every data point is stamped with the
+    # time.monotonic_ns() at which its chunk was read (receiveTimeNs) and
+    # its sampleIndex, and the sample clock is fed with the raw samples.
+    CHUNK_SIZE = 1024
+
+    def __init__(self, address=None, streamReader=None, rawSampleColumns=None):
+        self._mindwaveMobileAddress = address
+        self._streamReader = streamReader
+        self._streamWriter = None
+        self._packetFramer = MindwavePacketFramer()
+        self._payloadParser = MindwavePacketPayloadParser(rawSampleColumns=rawSampleColumns)
+        self._dataPointQueue = collections.deque()
+        self._endOfStream = False
+        self._sampleClock = MindwaveSampleClock()
+
+    async def start(self):
+        if (self._streamReader is not None):
+            return
+        if (self._mindwaveMobileAddress is None):
+            self._mindwaveMobileAddress = await self._findMindwaveMobileAddress()
+        mindwaveMobileSocket = socket.socket(socket.AF_BLUETOOTH, socket.SOCK_STREAM, socket.BTPROTO_RFCOMM)
+        mindwaveMobileSocket.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(mindwaveMobileSocket, (self._mindwaveMobileAddress, 1))
+        self._streamReader, self._streamWriter = await asyncio.open_connection(sock=mindwaveMobileSocket)
+
+    async def _findMindwaveMobileAddress(self):
+        # discovery is blocking and needs pybluez, keep it off the event loop
+        address = await asyncio.get_running_loop().run_in_executor(None, findMindwaveMobileAddress)
+        if (address is None):
+            raise IOError("Could not discover Mindwave Mobile.")
+        return address
+
+    async def close(self):
+        if (self._streamWriter is not None):
+            self._streamWriter.close()
+            await self._streamWriter.wait_closed()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        dataPoints = await self.readDataPoints(maxDataPoints=1)
+        if (len(dataPoints) == 0):
+            raise StopAsyncIteration
+        return dataPoints[0]
+
+    async def readDataPoints(self, maxDataPoints=None, timeout=None):
+        # Same contract as MindwaveDataPointReader.readDataPoints: data points
+        # of the packets received so far, waiting at most timeout seconds
+        # (None: until a packet arrives) when there are none. An empty list
+        # is returned after the timeout or at the end of the stream.
+        if (len(self._dataPointQueue) == 0):
+            try:
+                await asyncio.wait_for(self._putNextDataPointsInQueue(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if (maxDataPoints is None or maxDataPoints >= len(self._dataPointQueue)):
+            dataPoints = list(self._dataPointQueue)
+            self._dataPointQueue.clear()
+            return dataPoints
+        return [self._dataPointQueue.popleft() for _ in range(maxDataPoints)]
+
+    async def _putNextDataPointsInQueue(self):
+        while (len(self._dataPointQueue) == 0 and not self._endOfStream):
+            chunk = await self._streamReader.read(self.CHUNK_SIZE)
+            if (len(chunk) == 0):
+                self._endOfStream = True
+                return
+            receiveTimeNs = time.monotonic_ns()
+            self._payloadParser.receiveTimeNs = receiveTimeNs
+            rawSampleCount = self._payloadParser.rawSampleCount
+            for payloadBytes, checkSumIsOk in self._packetFramer.feed(chunk):
+                if (checkSumIsOk):
+                    self._dataPointQueue.extend(self._payloadParser.parseDataPoints(payloadBytes))
+            if (self._payloadParser.rawSampleCount > rawSampleCount):
+                self._sampleClock.addObservation(self._payloadParser.rawSampleCount - 1, receiveTimeNs)
+
+    def sampleClock(self):
+        # MindwaveSampleClock fed with the received raw samples
+        return self._sampleClock
+
+    def statistics(self):
+        return {
+            "packets": self._packetFramer.packetCount,
+            "badCheckSums": self._packetFramer.badCheckSumCount,
+            "skippedBytes": self._packetFramer.skippedByteCount,
+            "resyncs": self._packetFramer.resyncCount,
+            "unknownDataRows": sum(self._payloadParser.unknownDataRowCounts.values()),
+            "malformedDataRows": self._payloadParser.malformedDataRowCount,
+        }
@@ -0,0 +1,146 @@
+import collections
+
+import numpy as np
+
+# (name, lowest frequency, highest frequency) in Hz, lowest included and
+# highest excluded. Named like the EEGPowersDataPoint attributes; the
+# headset does not document its own band edges, these are the usual ones.
+DEFAULT_BANDS = (
+    ("delta", 0.5, 4.0),
+    ("theta", 4.0, 8.0),
+    ("lowAlpha", 8.0, 10.0),
+    ("highAlpha", 10.0, 13.0),
+    ("lowBeta", 13.0, 18.0),
+    ("highBeta", 18.0, 30.0),
+    ("lowGamma", 30.0, 40.0),
+    ("midGamma", 40.0, 50.0),
+)
+
+TAPERS = {
+    "hann": np.hanning,
+    "hamming": np.hamming,
+    "blackman": np.blackman,
+    "rectangular": np.ones,
+}
+
+
+class MindwaveBandPowers:
+    # Band powers computed from the raw values, as a replacement for the
+    # once per second EEGPowersDataPoint: every hopSize samples the last
+    # windowSize samples are tapered and transformed, and the power
+    # spectral density is summed per band (in raw units squared, the
+    # window's mean removed). With 512 Hz, windowSize 512 and hopSize 64
+    # that is 8 results per second over the last second.
+    #
+    # Samples are collected in a preallocated buffer that is compacted
+    # instead of wrapped, like MindwaveRingBuffer, so every window is a
+    # contiguous slice; all windows that became complete by one call are
+    # transformed together with one FFT over a strided view.
+    #
+    # onBandPowers(bandPowers, sampleNumbers) receives an array of shape
+    # (windows, bands) with the running number of the last sample of each
+    # window, without it results are kept until readBandPowers is called.
+    def __init__(self, sampleRate=512, windowSize=512, hopSize=64, taper="hann",
+                 bands=DEFAULT_BANDS, onBandPowers=None):
+        if (taper not in TAPERS):
+            raise ValueError("taper must be one of {}".format(tuple(TAPERS)))
+        if (windowSize < 2 or not 1 <= hopSize <= windowSize):
+            raise ValueError("windowSize must be at least 2 and hopSize between 1 and windowSize")
+        self._sampleRate = sampleRate
+        self._windowSize = windowSize
+        self._hopSize = hopSize
+        self._bandNames = [name for name, _, _ in bands]
+        self._taper = TAPERS[taper](windowSize)
+        self._bandMatrix = self._createBandMatrix(bands)
+        self._samples = np.zeros(4 * windowSize + 4 * hopSize)
+        self._numberOfSamples = 0
+        # position in the buffer where the next window starts
+        self._nextWindowStart = 0
+        # running number of the sample at the start of the buffer
+        self._firstSampleNumber = 0
+        self._onBandPowers = onBandPowers
+        self._results = collections.deque()
+
+    def _createBandMatrix(self, bands):
+        # Maps the one-sided power spectrum to band powers with one matrix
+        # product. Includes the density scaling, so the entries are the
+        # power per bin times the bin width.
+        frequencies = np.fft.rfftfreq(self._windowSize, 1.0 / self._sampleRate)
+        scaling = 1.0 / (self._sampleRate * np.sum(self._taper ** 2))
+        binWidth = self._sampleRate / self._windowSize
+        oneSided = np.full(len(frequencies), 2.0)
+        oneSided[0] = 1.0
+        if (self._windowSize % 2 == 0):
+            oneSided[-1] = 1.0
+        bandMatrix = np.zeros((len(frequencies), len(bands)))
+        for bandNumber, (_, lowestFrequency, highestFrequency) in enumerate(bands):
+            inBand = (frequencies >= lowestFrequency) & (frequencies < highestFrequency)
+            bandMatrix[inBand, bandNumber] = oneSided[inBand] * scaling * binWidth
+        return bandMatrix
+
+    def bandNames(self):
+        return list(self._bandNames)
+
+    def windowDuration(self):
+        return self._windowSize / self._sampleRate
+
+    def resultsPerSecond(self):
+        return self._sampleRate / self._hopSize
+
+    def addRawValue(self, rawValue):
+        # One sample at a time, e.g. from a RawDataPoint. Windows are only
+        # transformed once hopSize samples arrived, so this stays cheap.
+        if (self._numberOfSamples == len(self._samples)):
+            self._compact()
+        self._samples[self._numberOfSamples] = rawValue
+        self._numberOfSamples += 1
+        if (self._numberOfSamples - self._nextWindowStart >= self._windowSize):
+            self._computeReadyWindows()
+
+    def addRawValues(self, rawValues, sampleNumbers=None):
+        # A block of samples. Takes the arguments of the onBlock callback of
+        # MindwaveRawSampleColumns, so it can be passed as onBlock directly;
+        # samples are numbered in the order they are added.
+        rawValues = np.asarray(rawValues)
+        while (len(rawValues) > 0):
+            if (self._numberOfSamples == len(self._samples)):
+                self._compact()
+            amountOfSamples = min(len(rawValues), len(self._samples) - self._numberOfSamples)
+            self._samples[self._numberOfSamples:self._numberOfSamples + amountOfSamples] = rawValues[:amountOfSamples]
+            self._numberOfSamples += amountOfSamples
+            rawValues = rawValues[amountOfSamples:]
+            self._computeReadyWindows()
+
+    def _computeReadyWindows(self):
+        availableSamples = self._numberOfSamples - self._nextWindowStart
+        if (availableSamples < self._windowSize):
+            return
+        numberOfWindows = (availableSamples - self._windowSize) // self._hopSize + 1
+        windowSpan = (numberOfWindows - 1) * self._hopSize + self._windowSize
+        samples = self._samples[self._nextWindowStart:self._nextWindowStart + windowSpan]
+        windows = np.lib.stride_tricks.sliding_window_view(samples, self._windowSize)[::self._hopSize]
+        windows = windows - windows.mean(axis=1, keepdims=True)
+        spectra = np.fft.rfft(windows * self._taper, axis=1)
+        powerSpectra = spectra.real ** 2 + spectra.imag ** 2
+        bandPowers = powerSpectra @ self._bandMatrix
+        firstLastSample = self._firstSampleNumber + self._nextWindowStart + self._windowSize - 1
+        lastSamples = np.uint64(firstLastSample) + np.uint64(self._hopSize) * np.arange(numberOfWindows, dtype=np.uint64)
+        self._nextWindowStart += numberOfWindows * self._hopSize
+        if (self._onBandPowers is not None):
+            self._onBandPowers(bandPowers, lastSamples)
+        else:
+            self._results.append((bandPowers, lastSamples))
+
+    def _compact(self):
+        # keeps the samples still needed by the next window
+        keptSamples = self._numberOfSamples - self._nextWindowStart
+        self._samples[:keptSamples] = self._samples[self._nextWindowStart:self._numberOfSamples]
+        self._firstSampleNumber += self._nextWindowStart
+        self._numberOfSamples = keptSamples
+        self._nextWindowStart = 0
+
+    def readBandPowers(self):
+        # Returns all (bandPowers, sampleNumbers) results in order.
+        results = list(self._results)
+        self._results.clear()
+        return results
@@ -0,0 +1,237 @@
+import array
+import bisect
+import mmap
+import os
+import sys
+import time
+
+from .MindwavePacketFramer import MindwavePacketFramer, MAXIMUM_PAYLOAD_LENGTH, PACKET_OVERHEAD
+from .MindwavePacketPayloadParser import MindwavePacketPayloadParser
+
+# A capture is the byte stream of a session exactly as it was received,
+# every raw value included, in three append-only files:
+#
+#   path           the received bytes
+#   path.chunks    (byte offset, time.monotonic_ns()) of every received chunk
+#   path.packets   (packet number, byte offset) of every packetIndexInterval-th
+#                  packet with a correct checksum
+#
+# Index records are two little-endian uint64. A capture cut short by a crash
+# is still readable, bytes after the last index record just have no index.
+CHUNK_INDEX_SUFFIX = ".chunks"
+PACKET_INDEX_SUFFIX = ".packets"
+# about one entry per second of headset data
+DEFAULT_PACKET_INDEX_INTERVAL = 512
+READ_CHUNK_SIZE = 4096
+
+
+class MindwaveCaptureRecorder:
+    def __init__(self, path, packetIndexInterval=DEFAULT_PACKET_INDEX_INTERVAL, flushInterval=1.0):
+        # Files are flushed at most every flushInterval seconds, so a crash
+        # loses at most that much of the session. An existing capture is
+        # never overwritten or continued, that raises FileExistsError.
+        self._dataFile = open(path, "xb")
+        self._chunkIndexFile = open(path + CHUNK_INDEX_SUFFIX, "xb")
+        self._packetIndexFile = open(path + PACKET_INDEX_SUFFIX, "xb")
+        self._packetIndexInterval = packetIndexInterval
+        self._flushInterval = flushInterval
+        self._lastFlushTime = time.monotonic()
+        self._recordedByteCount = 0
+        self._packetFramer = MindwavePacketFramer()
+
+    def recordChunk(self, chunk, timestampNs=None):
+        if (timestampNs is None):
+            timestampNs = time.monotonic_ns()
+        self._dataFile.write(chunk)
+        self._chunkIndexFile.write(_indexRecord(self._recordedByteCount, timestampNs))
+        self._recordedByteCount += len(chunk)
+        for _, checkSumIsOk in self._packetFramer.feed(chunk):
+            packetNumber = self._packetFramer.packetCount - 1
+            if (checkSumIsOk and packetNumber % self._packetIndexInterval == 0):
+                self._packetIndexFile.write(_indexRecord(packetNumber, self._packetFramer.packetOffset))
+        if (time.monotonic() - self._lastFlushTime >= self._flushInterval):
+            self.flush()
+
+    def flush(self):
+        # index files last, so their records never point past the data
+        self._dataFile.flush()
+        self._chunkIndexFile.flush()
+        self._packetIndexFile.flush()
+        self._lastFlushTime = time.monotonic()
+
+    def close(self):
+        self.flush()
+        for openFile in (self._dataFile, self._chunkIndexFile, self._packetIndexFile):
+            openFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+
+class RecordingTransport:
+    # Wraps another transport (see MindwaveTransports) and records every
+    # chunk it receives, e.g.
+    #
+    #     transport = RecordingTransport(RfcommTransport(), MindwaveCaptureRecorder("session.bin"))
+    #     reader = MindwaveDataPointReader(transport=transport)
+    def __init__(self, transport, recorder):
+        self._transport = transport
+        self._recorder = recorder
+
+    def connect(self):
+        self._transport.connect()
+
+    def isConnected(self):
+        return self._transport.isConnected()
+
+    def receiveInto(self, freeBuffer):
+        amountOfBytes = self._transport.receiveInto(freeBuffer)
+        if (amountOfBytes > 0):
+            self._recorder.recordChunk(freeBuffer[:amountOfBytes])
+        return amountOfBytes
+
+    def waitForBytes(self, timeout=None):
+        return self._transport.waitForBytes(timeout)
+
+    def close(self):
+        self._transport.close()
+        self._recorder.close()
+
+
+class MindwaveCaptureReader:
+    # Memory-maps a capture, so any window of a long session can be found
+    # with the indexes and parsed again without reading the rest. Times are
+    # time.monotonic_ns() values as recorded; startTime() is the first one.
+    def __init__(self, path):
+        self._dataFile = open(path, "rb")
+        if (os.fstat(self._dataFile.fileno()).st_size > 0):
+            self._capture = mmap.mmap(self._dataFile.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._capture = b""
+        chunkIndex = _readIndex(path + CHUNK_INDEX_SUFFIX)
+        self._chunkOffsets = chunkIndex[0::2]
+        self._chunkTimes = chunkIndex[1::2]
+        packetIndex = _readIndex(path + PACKET_INDEX_SUFFIX)
+        self._indexedPacketNumbers = packetIndex[0::2]
+        self._indexedPacketOffsets = packetIndex[1::2]
+
+    def size(self):
+        return len(self._capture)
+
+    def startTime(self):
+        return self._chunkTimes[0] if len(self._chunkTimes) > 0 else None
+
+    def endTime(self):
+        return self._chunkTimes[-1] if len(self._chunkTimes) > 0 else None
+
+    def offsetAtTime(self, timestampNs):
+        # offset of the first byte received at or after timestampNs
+        chunkNumber = bisect.bisect_left(self._chunkTimes, timestampNs)
+        if (chunkNumber == len(self._chunkOffsets)):
+            return self.size()
+        return self._chunkOffsets[chunkNumber]
+
+    def timeAtOffset(self, offset):
+        # time at which the byte at offset was received
+        chunkNumber = bisect.bisect_right(self._chunkOffsets, offset) - 1
+        if (chunkNumber < 0):
+            return None
+        return self._chunkTimes[chunkNumber]
+
+    def readBytes(self, startOffset=0, endOffset=None):
+        # zero-copy view, valid until close()
+        return memoryview(self._capture)[startOffset:endOffset]
+
+    def packets(self, startOffset=0, endOffset=None):
+        # Yields (packetNumber, offset, payloadBytes) of the packets with a
+        # correct checksum starting in [startOffset, endOffset). Framing
+        # starts at the closest indexed packet, so it is in sync from the
+        # first byte; payloadBytes is a view valid until the next packet.
+        if (endOffset is None):
+            endOffset = self.size()
+        indexNumber = bisect.bisect_right(self._indexedPacketOffsets, startOffset) - 1
+        packetNumber, framingOffset = 0, 0
+        if (indexNumber >= 0):
+            packetNumber = self._indexedPacketNumbers[indexNumber]
+            framingOffset = self._indexedPacketOffsets[indexNumber]
+        framer = MindwavePacketFramer()
+        # a packet starting just before endOffset needs the bytes after it
+        stopOffset = min(self.size(), endOffset + MAXIMUM_PAYLOAD_LENGTH + PACKET_OVERHEAD)
+        for chunkOffset in range(framingOffset, stopOffset, READ_CHUNK_SIZE):
+            chunk = self.readBytes(chunkOffset, min(chunkOffset + READ_CHUNK_SIZE, stopOffset))
+            for payloadBytes, checkSumIsOk in framer.feed(chunk):
+                if (not checkSumIsOk):
+                    continue
+                packetOffset = framingOffset + framer.packetOffset
+                if (packetOffset >= endOffset):
+                    return
+                if (packetOffset >= startOffset):
+                    yield packetNumber, packetOffset, payloadBytes
+                packetNumber += 1
+
+    def offsetOfPacket(self, packetNumber):
+        # offset of the packet, None if the capture has fewer packets
+        for number, offset, _ in self.packets(self._indexedOffsetBefore(packetNumber)):
+            if (number == packetNumber):
+                return offset
+        return None
+
+    def _indexedOffsetBefore(self, packetNumber):
+        indexNumber = bisect.bisect_right(self._indexedPacketNumbers, packetNumber) - 1
+        return self._indexedPacketOffsets[indexNumber] if indexNumber >= 0 else 0
+
+    def dataPointsBetween(self, startTimeNs, endTimeNs, payloadParser=None):
+        # (receive time, data point) of the packets whose first byte was
+        # received in [startTimeNs, endTimeNs)
+        return self._parsePackets(self.packets(self.offsetAtTime(startTimeNs), self.offsetAtTime(endTimeNs)),
+                                  payloadParser)
+
+    def dataPointsOfPackets(self, firstPacketNumber, numberOfPackets, payloadParser=None):
+        # (receive time, data point) of numberOfPackets packets
+        def selectedPackets():
+            for packet in self.packets(self._indexedOffsetBefore(firstPacketNumber)):
+                if (packet[0] >= firstPacketNumber + numberOfPackets):
+                    return
+                if (packet[0] >= firstPacketNumber):
+                    yield packet
+        return self._parsePackets(selectedPackets(), payloadParser)
+
+    def _parsePackets(self, packets, payloadParser):
+        if (payloadParser is None):
+            payloadParser = MindwavePacketPayloadParser()
+        timedDataPoints = []
+        for _, offset, payloadBytes in packets:
+            timestampNs = self.timeAtOffset(offset)
+            timedDataPoints.extend((timestampNs, dataPoint) for dataPoint in payloadParser.parseDataPoints(payloadBytes))
+        return timedDataPoints
+
+    def close(self):
+        if (isinstance(self._capture, mmap.mmap)):
+            self._capture.close()
+        self._dataFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+
+def _indexRecord(first, second):
+    return first.to_bytes(8, "little") + second.to_bytes(8, "little")
+
+
+def _readIndex(path):
+    index = array.array("Q")
+    if (os.path.exists(path)):
+        with open(path, "rb") as indexFile:
+            indexBytes = indexFile.read()
+        # an interrupted write may have left half a record
+        index.frombytes(indexBytes[:len(indexBytes) - len(indexBytes) % 16])
+        if (sys.byteorder == "big"):
+            index.byteswap()
+    return index
+
@@ -1,81 +1,174 @@
 from .MindwaveMobileRawReader import MindwaveMobileRawReader
-import struct
 import collections
+import time
 
+from .MindwavePacketFramer import MindwavePacketFramer
 from .MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from .MindwaveReaderThread import MindwaveReaderThread, BoundedDataPointQueue, OVERFLOW_BLOCK
+from .MindwaveSampleClock import MindwaveSampleClock
+
+# ten seconds of raw values
+DEFAULT_QUEUE_SIZE = 5120
 
 class MindwaveDataPointReader:
-    def __init__(self, address=None):
-        self._mindwaveMobileRawReader = MindwaveMobileRawReader(address=address)
+    def __init__(self, address=None, rawSampleColumns=None, readInBackground=False,
+                 queueSize=DEFAULT_QUEUE_SIZE, overflowPolicy=OVERFLOW_BLOCK, transport=None):
+        # Pass a MindwaveRawSampleColumns to receive raw values as numpy
+        # blocks instead of RawDataPoints.
+        # With readInBackground, start() launches a thread that reads and
+        # parses into a queue of queueSize data points; overflowPolicy
+        # (see MindwaveReaderThread) decides what happens when it is full.
+        # rawSampleColumns callbacks then run in that thread.
+        # transport replaces the bluetooth connection, e.g. to replay a
+        # capture file (see MindwaveTransports).
+        # Every data point is stamped with its receive time and sample
+        # index; sampleClock() turns sample indexes into host times.
+        self._mindwaveMobileRawReader = MindwaveMobileRawReader(address=address, transport=transport)
+        self._packetFramer = MindwavePacketFramer(self._mindwaveMobileRawReader.ringBuffer())
+        self._payloadParser = MindwavePacketPayloadParser(rawSampleColumns=rawSampleColumns)
         self._dataPointQueue = collections.deque()
+        self._sampleClock = MindwaveSampleClock()
+        self._readerThread = None
+        self._backgroundQueue = None
+        if (readInBackground):
+            self._backgroundQueue = BoundedDataPointQueue(queueSize, overflowPolicy)
 
     def start(self):
         self._mindwaveMobileRawReader.connectToMindWaveMobile()
+        if (self._backgroundQueue is not None and self.isConnected()):
+            self._readerThread = MindwaveReaderThread(self._readDataPointsFromHeadset, self._backgroundQueue)
+            self._readerThread.start()
+
+    def stop(self):
+        if (self._readerThread is not None):
+            self._readerThread.stop()
+        self._mindwaveMobileRawReader.close()
 
     def isConnected(self):
         return self._mindwaveMobileRawReader.isConnected()
 
     def readNextDataPoint(self):
+        if (self._readerThread is not None):
+            return self._readNextDataPointFromThread()
         if (not self._moreDataPointsInQueue()):
             self._putNextDataPointsInQueue()
         return self._getDataPointFromQueue()
 
+    def readDataPoints(self, maxDataPoints=None, timeout=None):
+        # Returns the data points of all packets received so far, in the
+        # order they were sent, at most maxDataPoints of them. If none are
+        # available, waits at most timeout seconds for the next packet
+        # (None waits until one arrives) and may return an empty list.
+        if (self._readerThread is not None):
+            return self._readDataPointsFromThread(maxDataPoints, timeout)
+        return self._readDataPointsFromHeadset(timeout, maxDataPoints)
+
+    def _readDataPointsFromHeadset(self, timeout, maxDataPoints=None):
+        if (not self._moreDataPointsInQueue()):
+            self._putAvailableDataPointsInQueue(maxDataPoints, timeout)
+        return self._getDataPointsFromQueue(maxDataPoints)
+
+    def _readNextDataPointFromThread(self):
+        return self._readDataPointsFromThread(1)[0]
+
+    def _readDataPointsFromThread(self, maxDataPoints=None, timeout=None):
+        dataPoints = self._backgroundQueue.getAll(maxDataPoints, timeout)
+        if (len(dataPoints) == 0 and self._backgroundQueue.isClosed()):
+            # queue was closed by stop() or because reading failed, and
+            # everything read before that was handed out already
+            if (self._readerThread.error is not None):
+                raise self._readerThread.error
+            raise IOError("Reading from the Mindwave Mobile was stopped.")
+        return dataPoints
+
+    def sampleClock(self):
+        # MindwaveSampleClock fed with the received raw samples
+        return self._sampleClock
+
+    def statistics(self):
+        # Counters since the reader was created, for monitoring a noisy link.
+        return {
+            "packets": self._packetFramer.packetCount,
+            "badCheckSums": self._packetFramer.badCheckSumCount,
+            "skippedBytes": self._packetFramer.skippedByteCount,
+            "resyncs": self._packetFramer.resyncCount,
+            "unknownDataRows": sum(self._payloadParser.unknownDataRowCounts.values()),
+            "malformedDataRows": self._payloadParser.malformedDataRowCount,
+            "droppedDataPoints": self._droppedDataPointCount(),
+        }
+
+    def _droppedDataPointCount(self):
+        if (self._backgroundQueue is None):
+            return 0
+        return self._backgroundQueue.droppedDataPointCount
+
+    def unknownDataRowCounts(self):
+        # (extended code level, data row code) -> number of rows the parser
+        # had no decoder for.
+        return dict(self._payloadParser.unknownDataRowCounts)
+
     def _moreDataPointsInQueue(self):
         return len(self._dataPointQueue) > 0
     
     def _getDataPointFromQueue(self):
-        return self._dataPointQueue.pop();
+        return self._dataPointQueue.popleft();
+
+    def _getDataPointsFromQueue(self, maxDataPoints):
+        if (maxDataPoints is None or maxDataPoints >= len(self._dataPointQueue)):
+            dataPoints = list(self._dataPointQueue)
+            self._dataPointQueue.clear()
+            return dataPoints
+        return [self._dataPointQueue.popleft() for _ in range(maxDataPoints)]
     
     def _putNextDataPointsInQueue(self):
-        dataPoints = self._readDataPointsFromOnePacket()
-        self._dataPointQueue.extend(dataPoints)
-    
-    def _readDataPointsFromOnePacket(self):
-        self._goToStartOfNextPacket()
-        payloadBytes, checkSum = self._readOnePacket()
-        if (not self._checkSumIsOk(payloadBytes, checkSum)):
-            print("checksum of packet was not correct, discarding packet...")
-            return self._readDataPointsFromOnePacket();
-        else:
-            dataPoints = self._readDataPointsFromPayload(payloadBytes)
-        self._mindwaveMobileRawReader.clearAlreadyReadBuffer()
-        return dataPoints;
-        
-    def _goToStartOfNextPacket(self):
-        while(True):
-            byte = self._mindwaveMobileRawReader.getByte()
-            if (byte == MindwaveMobileRawReader.START_OF_PACKET_BYTE):  # need two of these bytes at the start..
-                byte = self._mindwaveMobileRawReader.getByte()
-                if (byte == MindwaveMobileRawReader.START_OF_PACKET_BYTE):
-                    # now at the start of the packet..
-                    return;
-
-    def _readOnePacket(self):
-            payloadLength = self._readPayloadLength();
-            payloadBytes, checkSum = self._readPacket(payloadLength);
-            return payloadBytes, checkSum
-    
-    def _readPayloadLength(self):
-        payloadLength = self._mindwaveMobileRawReader.getByte()
-        return payloadLength
-
-    def _readPacket(self, payloadLength):
-        payloadBytes = self._mindwaveMobileRawReader.getBytes(payloadLength)
-        checkSum = self._mindwaveMobileRawReader.getByte()
-        return payloadBytes, checkSum
-
-    def _checkSumIsOk(self, payloadBytes, checkSum):
-        sumOfPayload = sum(payloadBytes)
-        lastEightBits = sumOfPayload % 256
-        invertedLastEightBits = self._computeOnesComplement(lastEightBits) #1's complement!
-        return invertedLastEightBits == checkSum;
-    
-    def _computeOnesComplement(self, lastEightBits):
-        return ~lastEightBits + 256
+        self._putBufferedDataPointsInQueue()
+        while (not self._moreDataPointsInQueue()):
+            self._mindwaveMobileRawReader.readAvailableBytesIntoBuffer()
+            self._putBufferedDataPointsInQueue()
+
+    def _putAvailableDataPointsInQueue(self, maxDataPoints, timeout):
+        self._putBufferedDataPointsInQueue()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Bounded, so a source that is always readable (e.g. a replayed
+        # recording) cannot keep this call from returning.
+        bytesLeftToRead = self._mindwaveMobileRawReader.ringBuffer().capacity()
+        while (bytesLeftToRead > 0 and not self._enoughDataPointsInQueue(maxDataPoints)):
+            if (self._moreDataPointsInQueue()):
+                waitingTime = 0
+            elif (deadline is None):
+                waitingTime = None
+            else:
+                waitingTime = max(0, deadline - time.monotonic())
+            if (not self._mindwaveMobileRawReader.waitForBytes(waitingTime)):
+                return
+            try:
+                bytesLeftToRead -= self._mindwaveMobileRawReader.readAvailableBytesIntoBuffer()
+            except IOError:
+                # end of the stream, hand out what was parsed before it and
+                # let the next call raise
+                if (self._moreDataPointsInQueue()):
+                    return
+                raise
+            self._putBufferedDataPointsInQueue()
+
+    def _enoughDataPointsInQueue(self, maxDataPoints):
+        return maxDataPoints is not None and len(self._dataPointQueue) >= maxDataPoints
+
+    def _putBufferedDataPointsInQueue(self):
+        # Parses every complete packet that is already in the buffer. All of
+        # them were complete when the last bytes arrived, that is their
+        # receive time; the parser stamps it on their data points.
+        receiveTimeNs = self._mindwaveMobileRawReader.lastReceiveTimeNs()
+        self._payloadParser.receiveTimeNs = receiveTimeNs
+        rawSampleCount = self._payloadParser.rawSampleCount
+        for payloadBytes, checkSumIsOk in self._packetFramer.packets():
+            if (checkSumIsOk):
+                self._dataPointQueue.extend(self._readDataPointsFromPayload(payloadBytes))
+        if (self._payloadParser.rawSampleCount > rawSampleCount and receiveTimeNs is not None):
+            self._sampleClock.addObservation(self._payloadParser.rawSampleCount - 1, receiveTimeNs)
         
     def _readDataPointsFromPayload(self, payloadBytes):
-        payloadParser = MindwavePacketPayloadParser(payloadBytes)
-        return payloadParser.parseDataPoints();
+        return self._payloadParser.parseDataPoints(payloadBytes);
     
     
     
@@ -1,21 +1,42 @@
    
 class DataPoint:
+    # __slots__ keep the data points small, a session creates 512 raw
+    # values per second. The value bytes are not kept unless the parser is
+    # asked to (keepDataValueBytes), then they are in dataValueBytes.
+    # The parser stamps every data point with the running number of the
+    # raw sample it belongs to or, if it is not a raw value, of the next
+    # raw sample (sampleIndex), and MindwaveDataPointReader has it stamp
+    # the time.monotonic_ns() at which its packet was received (receiveTimeNs).
+    __slots__ = ('dataValueBytes', 'receiveTimeNs', 'sampleIndex')
+
     def __init__(self, dataValueBytes):
-        self._dataValueBytes = dataValueBytes
+        self.dataValueBytes = None
+        self.receiveTimeNs = None
+        self.sampleIndex = None
 
 class UnknownDataPoint(DataPoint):
-    def __init__(self, dataValueBytes):
+    # A row the parser has no decoder for. Its value bytes are always kept,
+    # they are all there is to it.
+    __slots__ = ('unknownPoint', 'dataRowCode', 'extendedCodeLevel')
+
+    def __init__(self, dataValueBytes, dataRowCode=None, extendedCodeLevel=0):
         DataPoint.__init__(self, dataValueBytes)
-        self.unknownPoint = self._dataValueBytes[0]
+        self.dataValueBytes = bytes(dataValueBytes)
+        self.unknownPoint = self.dataValueBytes[0] if len(self.dataValueBytes) > 0 else None
+        self.dataRowCode = dataRowCode
+        self.extendedCodeLevel = extendedCodeLevel
 
     def __str__(self):
-        retMsgString = "Unknown OpCode. Value: {}".format(self.unknownPoint)
+        retMsgString = "Unknown OpCode {} (extended code level {}). Value: {}".format(
+            self.dataRowCode, self.extendedCodeLevel, self.dataValueBytes.hex())
         return retMsgString
 
 class PoorSignalLevelDataPoint(DataPoint):
+    __slots__ = ('amountOfNoise',)
+
     def __init__(self, dataValueBytes):
         DataPoint.__init__(self, dataValueBytes)
-        self.amountOfNoise = self._dataValueBytes[0];
+        self.amountOfNoise = dataValueBytes[0];
 
     def headSetHasContactToSkin(self):
         return self.amountOfNoise < 200;
@@ -27,73 +48,70 @@ class PoorSignalLevelDataPoint(DataPoint):
         return poorSignalLevelString
 
 class AttentionDataPoint(DataPoint):
-    def __init__(self, _dataValueBytes):
-        DataPoint.__init__(self, _dataValueBytes)
-        self.attentionValue = self._dataValueBytes[0] 
+    __slots__ = ('attentionValue',)
+
+    def __init__(self, dataValueBytes):
+        DataPoint.__init__(self, dataValueBytes)
+        self.attentionValue = dataValueBytes[0]
 
     def __str__(self):
         return "Attention Level: " + str(self.attentionValue)
 
 class MeditationDataPoint(DataPoint):
-    def __init__(self, _dataValueBytes):
-        DataPoint.__init__(self, _dataValueBytes)
-        self.meditationValue = self._dataValueBytes[0]
+    __slots__ = ('meditationValue',)
+
+    def __init__(self, dataValueBytes):
+        DataPoint.__init__(self, dataValueBytes)
+        self.meditationValue = dataValueBytes[0]
 
     def __str__(self):
         return "Meditation Level: " + str(self.meditationValue)
 
 class BlinkDataPoint(DataPoint):
-    def __init__(self, _dataValueBytes):
-        DataPoint.__init__(self, _dataValueBytes)
-        self.blinkValue = self._dataValueBytes[0]
+    __slots__ = ('blinkValue',)
+
+    def __init__(self, dataValueBytes):
+        DataPoint.__init__(self, dataValueBytes)
+        self.blinkValue = dataValueBytes[0]
 
     def __str__(self):
         return "Blink Level: " + str(self.blinkValue)
 
 class RawDataPoint(DataPoint):
+    __slots__ = ('rawValue',)
+
     def __init__(self, dataValueBytes):
         DataPoint.__init__(self, dataValueBytes)
-        self.rawValue = self._readRawValue()
-
-    def _readRawValue(self):
-        firstByte = self._dataValueBytes[0]
-        secondByte = self._dataValueBytes[1]
-        # TODO(check if this is correct iwth soem more tests..
-        # and see http://stackoverflow.com/questions/5994307/bitwise-operations-in-python
-        rawValue = firstByte * 256 + secondByte;
-        if rawValue >= 32768:
-            rawValue -= 65536
-        return rawValue # hope this is correct ;)
+        # two bytes, big-endian, two's complement
+        if (len(dataValueBytes) != 2):
+            raise ValueError("raw value needs 2 bytes, got {}".format(len(dataValueBytes)))
+        self.rawValue = int.from_bytes(dataValueBytes, "big", signed=True)
 
     def __str__(self):
         return "Raw Value: " + str(self.rawValue)
 
 class EEGPowersDataPoint(DataPoint):
+    __slots__ = ('delta', 'theta', 'lowAlpha', 'highAlpha',
+                 'lowBeta', 'highBeta', 'lowGamma', 'midGamma')
+
     def __init__(self, dataValueBytes):
         DataPoint.__init__(self, dataValueBytes)
-        self._rememberEEGValues();
+        self._rememberEEGValues(dataValueBytes);
         
-    def _rememberEEGValues(self):
-        self.delta = self._convertToBigEndianInteger(self._dataValueBytes[0:3]);
-        self.theta = self._convertToBigEndianInteger(self._dataValueBytes[3:6]);
-        self.lowAlpha = self._convertToBigEndianInteger(self._dataValueBytes[6:9]);
-        self.highAlpha = self._convertToBigEndianInteger(self._dataValueBytes[9:12]);
-        self.lowBeta = self._convertToBigEndianInteger(self._dataValueBytes[12:15]);
-        self.highBeta = self._convertToBigEndianInteger(self._dataValueBytes[15:18]);
-        self.lowGamma = self._convertToBigEndianInteger(self._dataValueBytes[18:21]);
-        self.midGamma = self._convertToBigEndianInteger(self._dataValueBytes[21:24]);
-
-
-    def _convertToBigEndianInteger(self, threeBytes):
-        # TODO(check if this is correct iwth soem more tests..
-        # and see http://stackoverflow.com/questions/5994307/bitwise-operations-in-python
-        # only use first 16 bits of second number, not rest inc ase number is negative, otherwise
-        # python would take all 1s before this bit...
-        # same with first number, only take first 8 bits...
-        bigEndianInteger = (threeBytes[0] << 16) |\
-         (((1 << 16) - 1) & (threeBytes[1] << 8)) |\
-          ((1 << 8) - 1) & threeBytes[2]
-        return bigEndianInteger
+    def _rememberEEGValues(self, dataValueBytes):
+        # Eight unsigned 3-byte big-endian values, converted with one call
+        # and then cut into pieces of 24 bits.
+        if (len(dataValueBytes) != 24):
+            raise ValueError("EEG powers need 24 bytes, got {}".format(len(dataValueBytes)))
+        eegPowers = int.from_bytes(dataValueBytes, "big")
+        self.delta = eegPowers >> 168
+        self.theta = (eegPowers >> 144) & 0xffffff
+        self.lowAlpha = (eegPowers >> 120) & 0xffffff
+        self.highAlpha = (eegPowers >> 96) & 0xffffff
+        self.lowBeta = (eegPowers >> 72) & 0xffffff
+        self.highBeta = (eegPowers >> 48) & 0xffffff
+        self.lowGamma = (eegPowers >> 24) & 0xffffff
+        self.midGamma = eegPowers & 0xffffff
         
     def __str__(self):
         return """EEG Powers:
@@ -0,0 +1,166 @@
+import collections
+
+import numpy as np
+
+# seconds of raw samples kept for markers whose window already started
+DEFAULT_HISTORY_SECONDS = 10.0
+
+
+class MindwaveEpochs:
+    # Cuts a fixed-length window of raw samples around every marker (an
+    # epoch, e.g. one motor imagery trial) into a preallocated array of
+    # shape (maximumEpochs, channels, samples) that can be handed to a
+    # classifier as it is. The Mindwave Mobile has one channel.
+    #
+    # An epoch spans [marker - before, marker + after) seconds and gets
+    # the mean of its baseline, (start, end) seconds around the marker,
+    # subtracted; baseline=None keeps the samples as they are.
+    #
+    # Raw samples come in through addRawValues, which takes the arguments
+    # of the onBlock callback of MindwaveRawSampleColumns and
+    # MindwaveRawFilters. Markers can be added from any thread: Marker
+    # times (see MindwaveMarkers) are turned into sample numbers with
+    # sampleClock when the next samples arrive, addMarkerAtSample takes
+    # the sample number itself. An epoch is complete once its last sample
+    # arrived. Markers whose window starts more than historySeconds before
+    # the newest sample, or that come when the array is full, are dropped
+    # and counted in droppedMarkerCount.
+    #
+    # With sampleNumbers, samples missing between two blocks are counted
+    # in missingSampleCount and the buffer starts over after the gap, so
+    # epochs across it are dropped instead of holding made-up samples.
+    def __init__(self, maximumEpochs, sampleClock=None, sampleRate=512, before=0.5, after=4.0,
+                 baseline=(-0.5, 0.0), channels=1, dtype=np.float32, historySeconds=DEFAULT_HISTORY_SECONDS):
+        self._sampleClock = sampleClock
+        self._samplesBefore = int(round(before * sampleRate))
+        self._samplesAfter = int(round(after * sampleRate))
+        self._epochLength = self._samplesBefore + self._samplesAfter
+        if (self._epochLength <= 0):
+            raise ValueError("an epoch needs at least one sample")
+        self._baseline = None
+        if (baseline is not None):
+            baselineStart = int(round(baseline[0] * sampleRate)) + self._samplesBefore
+            baselineEnd = int(round(baseline[1] * sampleRate)) + self._samplesBefore
+            if (not 0 <= baselineStart < baselineEnd <= self._epochLength):
+                raise ValueError("baseline must be a non-empty part of the epoch")
+            self._baseline = (baselineStart, baselineEnd)
+        self._sampleRate = sampleRate
+        self._epochs = np.zeros((maximumEpochs, channels, self._epochLength), dtype=dtype)
+        self._codes = np.zeros(maximumEpochs, dtype=np.int64)
+        self._markerSamples = np.zeros(maximumEpochs, dtype=np.int64)
+        self._numberOfEpochs = 0
+        historySamples = max(int(historySeconds * sampleRate), self._epochLength)
+        self._samples = np.zeros((channels, 2 * historySamples))
+        self._historySamples = historySamples
+        self._numberOfSamples = 0
+        # running number of the first sample in the buffer
+        self._firstSampleNumber = None
+        # (timeNs, sampleIndex, code), appended from any thread
+        self._newMarkers = collections.deque()
+        # (markerSample, code) waiting for their last sample, in order
+        self._pendingEpochs = []
+        self.droppedMarkerCount = 0
+        self.missingSampleCount = 0
+
+    def addMarker(self, marker):
+        # a Marker, its time is turned into a sample number with sampleClock
+        self._newMarkers.append((marker.timeNs, None, marker.code))
+
+    def addMarkerAtSample(self, sampleIndex, code):
+        self._newMarkers.append((None, sampleIndex, code))
+
+    def addRawValues(self, rawValues, sampleNumbers=None):
+        # rawValues: (samples,) or (channels, samples)
+        rawValues = np.asarray(rawValues)
+        if (rawValues.ndim == 1):
+            rawValues = rawValues[np.newaxis, :]
+        if (sampleNumbers is not None and len(sampleNumbers) > 0):
+            rawValues = self._alignToSampleNumber(rawValues, int(sampleNumbers[0]))
+        elif (self._firstSampleNumber is None):
+            self._firstSampleNumber = 0
+        while (rawValues.shape[1] > 0):
+            if (self._numberOfSamples == self._samples.shape[1]):
+                self._compact()
+            amountOfSamples = min(rawValues.shape[1], self._samples.shape[1] - self._numberOfSamples)
+            self._samples[:, self._numberOfSamples:self._numberOfSamples + amountOfSamples] = rawValues[:, :amountOfSamples]
+            self._numberOfSamples += amountOfSamples
+            rawValues = rawValues[:, amountOfSamples:]
+            self._takeNewMarkers()
+            self._cutCompleteEpochs()
+
+    def _alignToSampleNumber(self, rawValues, firstSampleNumber):
+        if (self._firstSampleNumber is None):
+            self._firstSampleNumber = firstSampleNumber
+            return rawValues
+        gap = firstSampleNumber - (self._firstSampleNumber + self._numberOfSamples)
+        if (gap < 0):
+            # samples that were added already
+            return rawValues[:, -gap:]
+        if (gap > 0):
+            self.missingSampleCount += gap
+            self._numberOfSamples = 0
+            self._firstSampleNumber = firstSampleNumber
+        return rawValues
+
+    def _compact(self):
+        # keeps the last historySamples samples
+        droppedSamples = self._numberOfSamples - self._historySamples
+        self._samples[:, :self._historySamples] = self._samples[:, droppedSamples:self._numberOfSamples]
+        self._numberOfSamples = self._historySamples
+        self._firstSampleNumber += droppedSamples
+
+    def _takeNewMarkers(self):
+        while (len(self._newMarkers) > 0):
+            timeNs, sampleIndex, code = self._newMarkers[0]
+            if (sampleIndex is None):
+                if (self._sampleClock is None or not self._sampleClock.hasEstimate()):
+                    break
+                sampleIndex = self._sampleClock.sampleAtTime(timeNs)
+            self._newMarkers.popleft()
+            self._pendingEpochs.append((sampleIndex, code))
+        self._pendingEpochs.sort(key=lambda pendingEpoch: pendingEpoch[0])
+
+    def _cutCompleteEpochs(self):
+        while (len(self._pendingEpochs) > 0):
+            markerSample, code = self._pendingEpochs[0]
+            epochStart = markerSample - self._samplesBefore - self._firstSampleNumber
+            if (epochStart + self._epochLength > self._numberOfSamples):
+                return
+            self._pendingEpochs.pop(0)
+            if (epochStart < 0 or self._numberOfEpochs == len(self._epochs)):
+                self.droppedMarkerCount += 1
+                continue
+            epoch = self._epochs[self._numberOfEpochs]
+            epoch[:] = self._samples[:, epochStart:epochStart + self._epochLength]
+            if (self._baseline is not None):
+                baselineStart, baselineEnd = self._baseline
+                epoch -= epoch[:, baselineStart:baselineEnd].mean(axis=1, keepdims=True)
+            self._codes[self._numberOfEpochs] = code
+            self._markerSamples[self._numberOfEpochs] = markerSample
+            self._numberOfEpochs += 1
+
+    def numberOfEpochs(self):
+        return self._numberOfEpochs
+
+    def epochs(self):
+        # (epochs, channels, samples) view of the complete epochs, no copy
+        return self._epochs[:self._numberOfEpochs]
+
+    def codes(self):
+        # marker code of every epoch, e.g. as the labels for a classifier
+        return self._codes[:self._numberOfEpochs]
+
+    def markerSamples(self):
+        # sample number of the marker of every epoch
+        return self._markerSamples[:self._numberOfEpochs]
+
+    def times(self):
+        # time of every sample of an epoch relative to its marker, in seconds
+        return np.arange(-self._samplesBefore, self._samplesAfter) / self._sampleRate
+
+    def numberOfPendingMarkers(self):
+        return len(self._newMarkers) + len(self._pendingEpochs)
+
+    def clear(self):
+        # empties the array for the next trials, pending markers are kept
+        self._numberOfEpochs = 0
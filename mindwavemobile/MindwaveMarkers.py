@@ -0,0 +1,71 @@
+import collections
+import threading
+import time
+
+# An event of the experiment, e.g. a cue shown to the subject. timeNs is a
+# time.monotonic_ns() time like the receive times of the data points, so
+# MindwaveSampleClock.sampleAtTime finds the raw sample it happened at.
+Marker = collections.namedtuple("Marker", ("timeNs", "code", "label"))
+
+
+class MindwaveMarkers:
+    # Records markers from any thread, e.g. the one showing the cues while
+    # another reads from the headset. Every marker is handed to the
+    # listeners (see addListener) and, with a path, appended to that file
+    # as a "timeNs,code,label" line and flushed right away, so the markers
+    # of a session survive next to its capture. As with captures, an
+    # existing file is never overwritten, that raises FileExistsError.
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._markers = []
+        self._listeners = []
+        self._markerFile = None
+        if (path is not None):
+            self._markerFile = open(path, "x")
+
+    def addListener(self, listener):
+        # listener(marker) is called in the thread that adds the marker
+        self._listeners.append(listener)
+
+    def addMarker(self, code, label=None, timeNs=None):
+        # Records a marker at timeNs, by default now. Call it right when
+        # the event happens, e.g. just after the cue was shown.
+        if (timeNs is None):
+            timeNs = time.monotonic_ns()
+        marker = Marker(timeNs, code, label)
+        with self._lock:
+            self._markers.append(marker)
+            if (self._markerFile is not None):
+                self._markerFile.write("{},{},{}\n".format(timeNs, code, "" if label is None else label))
+                self._markerFile.flush()
+        for listener in self._listeners:
+            listener(marker)
+        return marker
+
+    def markers(self, startTimeNs=None, endTimeNs=None):
+        # markers in [startTimeNs, endTimeNs), in the order they were added
+        with self._lock:
+            markers = list(self._markers)
+        return [marker for marker in markers
+                if (startTimeNs is None or marker.timeNs >= startTimeNs)
+                and (endTimeNs is None or marker.timeNs < endTimeNs)]
+
+    def close(self):
+        if (self._markerFile is not None):
+            self._markerFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+
+def readMarkerFile(path):
+    # Markers written by MindwaveMarkers, codes as int.
+    markers = []
+    with open(path) as markerFile:
+        for line in markerFile:
+            timeNs, code, label = line.rstrip("\n").split(",", 2)
+            markers.append(Marker(int(timeNs), int(code), label or None))
+    return markers
@@ -1,76 +1,77 @@
-import bluetooth
 import time
-import textwrap
+
+from .MindwaveRingBuffer import MindwaveRingBuffer
+from .MindwaveTransports import RfcommTransport
 
 
 class MindwaveMobileRawReader:
     START_OF_PACKET_BYTE = 0xaa;
-    def __init__(self, address=None):
-        self._buffer = [];
+    def __init__(self, address=None, transport=None):
+        # transport is where the bytes come from (see MindwaveTransports),
+        # by default the headset at address over bluetooth.
+        self._buffer = MindwaveRingBuffer();
         self._bufferPosition = 0;
-        self._isConnected = False;
-        self._mindwaveMobileAddress = address
+        if (transport is None):
+            transport = RfcommTransport(address)
+        self._transport = transport
+        # time.monotonic_ns() of the last received bytes
+        self._lastReceiveTimeNs = None
         
     def connectToMindWaveMobile(self):
-        # First discover mindwave mobile address, then connect.
-        # Headset address of my headset was'9C:B7:0D:72:CD:02';
-        # not sure if it really can be different?
-        # now discovering address because of https://github.com/robintibor/python-mindwave-mobile/issues/4
-        if (self._mindwaveMobileAddress is None):
-            self._mindwaveMobileAddress = self._findMindwaveMobileAddress()
-        if (self._mindwaveMobileAddress is not None):            
-            print ("Discovered Mindwave Mobile...")
-            self._connectToAddress(self._mindwaveMobileAddress)
-        else:
-            self._printErrorDiscoveryMessage()
-        
-    def _findMindwaveMobileAddress(self):
-        nearby_devices = bluetooth.discover_devices(lookup_names = True)
-        for address, name in nearby_devices:
-            if (name == "MindWave Mobile"):
-                return address
-        return None
-        
-    def _connectToAddress(self, mindwaveMobileAddress):
-        self.mindwaveMobileSocket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-        while (not self._isConnected):
-            try:
-                self.mindwaveMobileSocket.connect(
-                    (mindwaveMobileAddress, 1))
-                self._isConnected = True
-            except bluetooth.btcommon.BluetoothError as error:
-                print("Could not connect: ", error, "; Retrying in 5s...")
-                time.sleep(5) 
-           
+        self._transport.connect()
 
     def isConnected(self):
-        return self._isConnected
+        return self._transport.isConnected()
 
-    def _printErrorDiscoveryMessage(self):
-         print((textwrap.dedent("""\
-                    Could not discover Mindwave Mobile. Please make sure the
-                    Mindwave Mobile device is in pairing mode and your computer
-                    has bluetooth enabled.""").replace("\n", " ")))
+    def close(self):
+        self._transport.close()
 
     def _readMoreBytesIntoBuffer(self, amountOfBytes):
-        newBytes = self._readBytesFromMindwaveMobile(amountOfBytes)
-        self._buffer += newBytes
+        # Bytes before the buffer position have been handed out already,
+        # drop them so the fixed size buffer never fills up.
+        self.clearAlreadyReadBuffer()
+        self._readBytesFromMindwaveMobile(amountOfBytes)
     
     def _readBytesFromMindwaveMobile(self, amountOfBytes):
         missingBytes = amountOfBytes
-        # receivedBytes = ""  #py2
-        receivedBytes = b''   #py3
-        
         # Sometimes the socket will not send all the requested bytes
         # on the first request, therefore a loop is necessary...
         while(missingBytes > 0):
-            receivedBytes += self.mindwaveMobileSocket.recv(missingBytes)
-            missingBytes = amountOfBytes - len(receivedBytes)
-        return receivedBytes;
+            freeBuffer = self._buffer.writableView(missingBytes)
+            amountOfReceivedBytes = self._receiveInto(freeBuffer[:missingBytes])
+            if (amountOfReceivedBytes == 0):
+                raise IOError("Connection to Mindwave Mobile was closed.")
+            self._lastReceiveTimeNs = time.monotonic_ns()
+            self._buffer.commitWrite(amountOfReceivedBytes)
+            missingBytes -= amountOfReceivedBytes
+
+    def readAvailableBytesIntoBuffer(self):
+        # Blocks until at least one byte arrived, then returns how many bytes
+        # were appended to the buffer (as many as the socket had ready).
+        amountOfReceivedBytes = self._receiveInto(self._buffer.writableView())
+        if (amountOfReceivedBytes == 0):
+            raise IOError("Connection to Mindwave Mobile was closed.")
+        self._lastReceiveTimeNs = time.monotonic_ns()
+        self._buffer.commitWrite(amountOfReceivedBytes)
+        return amountOfReceivedBytes
+
+    def waitForBytes(self, timeout=None):
+        # True if bytes can be read without blocking within timeout seconds,
+        # None waits until bytes arrive.
+        return self._transport.waitForBytes(timeout)
+
+    def lastReceiveTimeNs(self):
+        return self._lastReceiveTimeNs
+
+    def ringBuffer(self):
+        return self._buffer
+
+    def _receiveInto(self, freeBuffer):
+        return self._transport.receiveInto(freeBuffer)
 
     def peekByte(self):
-        self._ensureMoreBytesCanBeRead();
-        return ord(self._buffer[self._bufferPosition])
+        self._ensureMoreBytesCanBeRead(1);
+        return self._buffer.byteAt(self._bufferPosition)
 
     def getByte(self):
         self._ensureMoreBytesCanBeRead(100);
@@ -81,8 +82,7 @@ class MindwaveMobileRawReader:
             self._readMoreBytesIntoBuffer(amountOfBytes)
     
     def _getNextByte(self):
-        # nextByte = ord(self._buffer[self._bufferPosition]) #py2
-        nextByte = self._buffer[self._bufferPosition]   #py3
+        nextByte = self._buffer.byteAt(self._bufferPosition)
         self._bufferPosition += 1;
         return nextByte;
 
@@ -91,16 +91,16 @@ class MindwaveMobileRawReader:
         return self._getNextBytes(amountOfBytes);
     
     def _getNextBytes(self, amountOfBytes):
-        # nextBytes = list(map(ord, self._buffer[self._bufferPosition: self._bufferPosition + amountOfBytes])) #py2
-        nextBytes = list(self._buffer[self._bufferPosition: self._bufferPosition + amountOfBytes]) #py3
+        # zero-copy view, only valid until more bytes are read from the headset
+        nextBytes = self._buffer.readableView(self._bufferPosition, amountOfBytes)
         self._bufferPosition += amountOfBytes
         return nextBytes
     
     def clearAlreadyReadBuffer(self):
-        self._buffer = self._buffer[self._bufferPosition : ]
+        self._buffer.consume(self._bufferPosition)
         self._bufferPosition = 0;
     
     def _bufferSize(self):
-        return len(self._buffer);
+        return self._buffer.size();
     
 #------------------------------------------------------------------------------ 
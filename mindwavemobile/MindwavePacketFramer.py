@@ -0,0 +1,112 @@
+from .MindwaveRingBuffer import MindwaveRingBuffer
+
+START_OF_PACKET_BYTE = 0xaa
+SYNC_BYTES = bytes([START_OF_PACKET_BYTE, START_OF_PACKET_BYTE])
+# sync bytes, payload length byte and checksum byte
+PACKET_OVERHEAD = 4
+MAXIMUM_PAYLOAD_LENGTH = 169
+
+
+class MindwavePacketFramer:
+    # Splits a ThinkGear byte stream into packets, see
+    # http://wearcam.org/ece516/mindset_communications_protocol.pdf
+    # Bytes can be fed in chunks of any size, an incomplete packet at the
+    # end of a chunk stays in the buffer until the rest arrives.
+    # Yielded payloads are views on the buffer and are only valid until
+    # the next bytes are written into it.
+    # A sync followed by an impossible length or a wrong checksum may have
+    # been a pair of 0xaa bytes inside another packet, so scanning resumes
+    # one byte after that sync instead of skipping the whole false packet.
+    # packetOffset is the position in the stream of the packet yielded
+    # last, counted from the first byte ever fed or read into the buffer.
+    def __init__(self, ringBuffer=None):
+        if (ringBuffer is None):
+            ringBuffer = MindwaveRingBuffer()
+        self._ringBuffer = ringBuffer
+        self.packetCount = 0
+        self.badCheckSumCount = 0
+        self.skippedByteCount = 0
+        self.resyncCount = 0
+        self.packetOffset = None
+        self._streamOffset = 0
+
+    def ringBuffer(self):
+        return self._ringBuffer
+
+    def streamOffset(self):
+        # position in the stream of the first byte still in the buffer
+        return self._streamOffset
+
+    def feed(self, chunk):
+        chunk = memoryview(chunk)
+        while (len(chunk) > 0):
+            amountOfBytes = min(len(chunk), self._ringBuffer.freeSpace())
+            self._ringBuffer.write(chunk[:amountOfBytes])
+            chunk = chunk[amountOfBytes:]
+            yield from self.packets()
+
+    def packets(self):
+        # Yields (payloadBytes, checkSumIsOk) for every complete packet in
+        # the buffer. Bytes of a packet are consumed before it is yielded,
+        # so stopping the iteration early leaves the framer consistent.
+        ringBuffer = self._ringBuffer
+        while (True):
+            if (not self._goToStartOfNextPacket()):
+                return
+            if (ringBuffer.size() < 3):
+                return
+            payloadLength = ringBuffer.byteAt(2)
+            if (payloadLength == START_OF_PACKET_BYTE):
+                # more than two sync bytes, the packet starts one byte later
+                self._skipBytes(1)
+                continue
+            if (payloadLength > MAXIMUM_PAYLOAD_LENGTH):
+                self._resync()
+                continue
+            if (ringBuffer.size() < payloadLength + PACKET_OVERHEAD):
+                return
+            payloadBytes = ringBuffer.readableView(3, payloadLength)
+            checkSum = ringBuffer.byteAt(3 + payloadLength)
+            self.packetOffset = self._streamOffset
+            if (self._checkSumIsOk(payloadBytes, checkSum)):
+                ringBuffer.consume(payloadLength + PACKET_OVERHEAD)
+                self._streamOffset += payloadLength + PACKET_OVERHEAD
+                self.packetCount += 1
+                yield payloadBytes, True
+            else:
+                # the view stays valid, resyncing does not write to the buffer
+                self.badCheckSumCount += 1
+                self._resync()
+                yield payloadBytes, False
+
+    def _resync(self):
+        self.resyncCount += 1
+        self._skipBytes(1)
+
+    def _skipBytes(self, amountOfBytes):
+        self.skippedByteCount += amountOfBytes
+        self._streamOffset += amountOfBytes
+        self._ringBuffer.consume(amountOfBytes)
+
+    def _goToStartOfNextPacket(self):
+        ringBuffer = self._ringBuffer
+        syncPosition = ringBuffer.find(SYNC_BYTES)
+        if (syncPosition == -1):
+            # a sync byte at the very end may be the first half of the next sync
+            bufferSize = ringBuffer.size()
+            if (bufferSize > 0 and ringBuffer.byteAt(bufferSize - 1) == START_OF_PACKET_BYTE):
+                self._skipBytes(bufferSize - 1)
+            else:
+                self._skipBytes(bufferSize)
+            return False
+        self._skipBytes(syncPosition)
+        return True
+
+    def _checkSumIsOk(self, payloadBytes, checkSum):
+        sumOfPayload = sum(payloadBytes)
+        lastEightBits = sumOfPayload % 256
+        invertedLastEightBits = self._computeOnesComplement(lastEightBits) #1's complement!
+        return invertedLastEightBits == checkSum;
+
+    def _computeOnesComplement(self, lastEightBits):
+        return ~lastEightBits + 256
@@ -1,86 +1,179 @@
+import collections
+
 from .MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
     AttentionDataPoint, MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint,\
     UnknownDataPoint
 
 EXTENDED_CODE_BYTE = 0x55
+RAW_VALUE_CODE = 0x80
+# Codes from 0x80 on are followed by a byte with the length of the value.
+FIRST_MULTI_BYTE_CODE = 0x80
+
+# Data row code -> callable that turns the value bytes into a data point,
+# for rows without extended code bytes.
+DATA_ROW_DECODERS = {
+    0x02: PoorSignalLevelDataPoint,
+    0x04: AttentionDataPoint,
+    0x05: MeditationDataPoint,
+    0x16: BlinkDataPoint,
+    RAW_VALUE_CODE: RawDataPoint,
+    0x83: EEGPowersDataPoint,
+}
+# (extended code level, data row code) -> decoder, for rows with extended
+# code bytes. No such rows are documented yet.
+EXTENDED_DATA_ROW_DECODERS = {}
+
+def registerDataRowDecoder(dataRowCode, decoder, extendedCodeLevel=0):
+    # Adds or replaces the decoder for a data row code, e.g. a DataPoint
+    # subclass for a code that newer firmware sends.
+    if (extendedCodeLevel == 0):
+        DATA_ROW_DECODERS[dataRowCode] = decoder
+    else:
+        EXTENDED_DATA_ROW_DECODERS[(extendedCodeLevel, dataRowCode)] = decoder
 
 class MindwavePacketPayloadParser:
-    
-    def __init__(self, payloadBytes):
+
+    def __init__(self, payloadBytes=None, rawSampleColumns=None, keepDataValueBytes=False):
+        # With rawSampleColumns (a MindwaveRawSampleColumns), raw values
+        # are written into its arrays instead of becoming RawDataPoints.
+        # With keepDataValueBytes, every data point gets a copy of its
+        # value bytes in dataValueBytes.
         self._payloadBytes = payloadBytes
         self._payloadIndex = 0
-        
-    def parseDataPoints(self):
+        self._rawSampleColumns = rawSampleColumns
+        self._keepDataValueBytes = keepDataValueBytes
+        # Counted over all payloads parsed with this parser, unknown rows
+        # by (extended code level, data row code).
+        self.unknownDataRowCounts = collections.Counter()
+        self.malformedDataRowCount = 0
+        # raw value rows parsed so far, also those written into rawSampleColumns
+        self.rawSampleCount = 0
+        # Stamped on every data point parsed from now on, set it once for a
+        # batch of packets received together (see MindwaveDataPointReader).
+        self.receiveTimeNs = None
+
+    def parseDataPoints(self, payloadBytes=None):
+        # The parser can be reused for every packet by passing its payload.
+        if (payloadBytes is not None):
+            self._payloadBytes = payloadBytes
+            self._payloadIndex = 0
         dataPoints = []
-        while (not self._atEndOfPayloadBytes()):
+        payloadLength = len(self._payloadBytes)
+        while (self._payloadIndex < payloadLength):
             dataPoint = self._parseOneDataPoint()
-            dataPoints.append(dataPoint)
+            if (dataPoint is not None):
+                dataPoints.append(dataPoint)
         return dataPoints
-        
-    def _atEndOfPayloadBytes(self):
-        return self._payloadIndex == len(self._payloadBytes)
-    
+
     def _parseOneDataPoint(self):
-        dataRowCode = self._extractDataRowCode();
-        dataRowValueBytes = self._extractDataRowValueBytes(dataRowCode)
-        return self._createDataPoint(dataRowCode, dataRowValueBytes)
-    
-    def _extractDataRowCode(self):
-        return self._ignoreExtendedCodeBytesAndGetRowCode()
-        
-    def _ignoreExtendedCodeBytesAndGetRowCode(self):
-        # EXTENDED_CODE_BYTES seem not to be used according to 
-        # http://wearcam.org/ece516/mindset_communications_protocol.pdf
-        # (August 2012)
-        # so we ignore them
-        byte = self._getNextByte()
-        while (byte == EXTENDED_CODE_BYTE):
+        payloadBytes = self._payloadBytes
+        rowIndex = self._payloadIndex
+        dataRowCode = payloadBytes[rowIndex]
+        # Fast paths for the complete fixed-length rows without extended
+        # code bytes: the raw value row (0x80 0x02 hi lo), 512 per second,
+        # and the single byte rows. Anything else takes the full grammar.
+        if (dataRowCode == RAW_VALUE_CODE and rowIndex + 4 <= len(payloadBytes)
+                and payloadBytes[rowIndex + 1] == 2):
+            extendedCodeLevel = 0
+            dataRowValueBytes = payloadBytes[rowIndex + 2:rowIndex + 4]
+            self._payloadIndex = rowIndex + 4
+        elif (dataRowCode < FIRST_MULTI_BYTE_CODE and dataRowCode != EXTENDED_CODE_BYTE
+                and rowIndex + 2 <= len(payloadBytes)):
+            extendedCodeLevel = 0
+            dataRowValueBytes = payloadBytes[rowIndex + 1:rowIndex + 2]
+            self._payloadIndex = rowIndex + 2
+        else:
+            extendedCodeLevel, dataRowCode, dataRowValueBytes = self._extractDataRow()
+            if (dataRowValueBytes is None):
+                # row is cut off by the end of the payload, nothing more to parse
+                self.malformedDataRowCount += 1
+                self._payloadIndex = len(payloadBytes)
+                return None
+        # number of this raw sample or, for other rows, of the next one
+        sampleIndex = self.rawSampleCount
+        if (dataRowCode == RAW_VALUE_CODE and extendedCodeLevel == 0):
+            self.rawSampleCount = sampleIndex + 1
+            if (self._rawSampleColumns is not None and len(dataRowValueBytes) == 2):
+                self._rawSampleColumns.addRawValueBytes(dataRowValueBytes)
+                return None
+        dataPoint = self._createDataPoint(extendedCodeLevel, dataRowCode, dataRowValueBytes)
+        try:
+            dataPoint.receiveTimeNs = self.receiveTimeNs
+            dataPoint.sampleIndex = sampleIndex
+        except AttributeError:
+            # registered decoders may return something else than a DataPoint
+            pass
+        return dataPoint
+
+    def _extractDataRow(self):
+        # Returns (extended code level, data row code, value bytes), the
+        # value bytes are None if the row is cut off.
+        extendedCodeLevel, dataRowCode = self._extractExtendedCodeLevelAndRowCode()
+        if (dataRowCode is None):
+            return extendedCodeLevel, None, None
+        return extendedCodeLevel, dataRowCode, self._extractDataRowValueBytes(extendedCodeLevel, dataRowCode)
+
+    def _extractExtendedCodeLevelAndRowCode(self):
+        # Each EXTENDED_CODE_BYTE before the code raises the extended code
+        # level, see http://wearcam.org/ece516/mindset_communications_protocol.pdf
+        extendedCodeLevel = 0
+        while (self._bytesLeft() > 0):
             byte = self._getNextByte()
-        dataRowCode = byte
-        return dataRowCode
-       
+            if (byte != EXTENDED_CODE_BYTE):
+                return extendedCodeLevel, byte
+            extendedCodeLevel += 1
+        return extendedCodeLevel, None
+
+    def _bytesLeft(self):
+        return len(self._payloadBytes) - self._payloadIndex
+
     def _getNextByte(self):
         nextByte = self._payloadBytes[self._payloadIndex]
         self._payloadIndex += 1
         return nextByte
-    
+
     def _getNextBytes(self, amountOfBytes):
         nextBytes = self._payloadBytes[self._payloadIndex : self._payloadIndex + amountOfBytes]
         self._payloadIndex += amountOfBytes
         return nextBytes
-    
-    def _extractDataRowValueBytes(self, dataRowCode):
-        lengthOfValueBytes = self._extractLengthOfValueBytes(dataRowCode)
+
+    def _extractDataRowValueBytes(self, extendedCodeLevel, dataRowCode):
+        lengthOfValueBytes = self._extractLengthOfValueBytes(extendedCodeLevel, dataRowCode)
+        if (lengthOfValueBytes is None or lengthOfValueBytes > self._bytesLeft()):
+            return None
         dataRowValueBytes = self._getNextBytes(lengthOfValueBytes)
         return dataRowValueBytes
-       
-    def _extractLengthOfValueBytes(self, dataRowCode):
+
+    def _extractLengthOfValueBytes(self, extendedCodeLevel, dataRowCode):
         # If code is one of the mysterious initial code values
         # return before the extended code check
-        if dataRowCode == 0xBA or dataRowCode == 0xBC:
+        if extendedCodeLevel == 0 and (dataRowCode == 0xBA or dataRowCode == 0xBC):
             return 1
 
-        dataRowHasLengthByte = dataRowCode > 0x7f
-        if (dataRowHasLengthByte):
-            return self._getNextByte()
-        else:
+        dataRowHasLengthByte = dataRowCode >= FIRST_MULTI_BYTE_CODE
+        if (not dataRowHasLengthByte):
             return 1
-        
-    def _createDataPoint(self, dataRowCode, dataRowValueBytes):
-        if (dataRowCode == 0x02):
-            return PoorSignalLevelDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x04):
-            return AttentionDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x05):
-            return MeditationDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x16):
-            return BlinkDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x80):
-            return RawDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0x83):
-            return EEGPowersDataPoint(dataRowValueBytes)
-        elif (dataRowCode == 0xba or dataRowCode == 0xbc):
-            return UnknownDataPoint(dataRowValueBytes)
+        if (self._bytesLeft() == 0):
+            return None
+        return self._getNextByte()
+
+    def _createDataPoint(self, extendedCodeLevel, dataRowCode, dataRowValueBytes):
+        if (extendedCodeLevel == 0):
+            decoder = DATA_ROW_DECODERS.get(dataRowCode)
         else:
-            assert False 
-        
+            decoder = EXTENDED_DATA_ROW_DECODERS.get((extendedCodeLevel, dataRowCode))
+        if (decoder is None):
+            return self._createUnknownDataPoint(extendedCodeLevel, dataRowCode, dataRowValueBytes)
+        try:
+            dataPoint = decoder(dataRowValueBytes)
+        except (IndexError, ValueError):
+            # known code, but not the number of value bytes it needs
+            self.malformedDataRowCount += 1
+            return self._createUnknownDataPoint(extendedCodeLevel, dataRowCode, dataRowValueBytes)
+        if (self._keepDataValueBytes):
+            dataPoint.dataValueBytes = bytes(dataRowValueBytes)
+        return dataPoint
+
+    def _createUnknownDataPoint(self, extendedCodeLevel, dataRowCode, dataRowValueBytes):
+        self.unknownDataRowCounts[(extendedCodeLevel, dataRowCode)] += 1
+        return UnknownDataPoint(dataRowValueBytes, dataRowCode, extendedCodeLevel)
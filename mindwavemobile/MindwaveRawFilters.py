@@ -0,0 +1,174 @@
+import collections
+import time
+
+import numpy as np
+
+# Mains frequency is 50 Hz in most of the world and 60 Hz in most of the Americas.
+DEFAULT_NOTCH_FREQUENCY = 50.0
+DEFAULT_NOTCH_QUALITY = 30.0
+DEFAULT_DC_CUTOFF = 0.5
+DEFAULT_MAXIMUM_BLOCK_SIZE = 512
+DEFAULT_LATENCY_HISTORY = 1000
+
+
+def notchSection(frequency, sampleRate, quality=DEFAULT_NOTCH_QUALITY):
+    # (b0, b1, b2, a1, a2) of a notch at frequency, -3 dB width frequency / quality
+    w0 = 2 * np.pi * frequency / sampleRate
+    alpha = np.sin(w0) / (2 * quality)
+    a0 = 1 + alpha
+    return (1 / a0, -2 * np.cos(w0) / a0, 1 / a0, -2 * np.cos(w0) / a0, (1 - alpha) / a0)
+
+
+def dcBlockerSection(cutoff, sampleRate):
+    # y[n] = x[n] - x[n-1] + r * y[n-1]
+    r = np.exp(-2 * np.pi * cutoff / sampleRate)
+    return (1.0, -1.0, 0.0, -r, 0.0)
+
+
+def butterworthSections(cutoff, sampleRate, order, highPass=False):
+    # An even order Butterworth low or high pass as order / 2 biquads,
+    # designed with the bilinear transform and a pre-warped cutoff.
+    if (order < 2 or order % 2 != 0):
+        raise ValueError("order must be even and at least 2")
+    w0 = 2 * np.pi * cutoff / sampleRate
+    sections = []
+    for sectionNumber in range(order // 2):
+        poleAngle = np.pi * (2 * sectionNumber + 1) / (2 * order)
+        quality = 1 / (2 * np.sin(poleAngle))
+        alpha = np.sin(w0) / (2 * quality)
+        a0 = 1 + alpha
+        if (highPass):
+            b0 = (1 + np.cos(w0)) / 2
+            b1 = -(1 + np.cos(w0))
+        else:
+            b0 = (1 - np.cos(w0)) / 2
+            b1 = 1 - np.cos(w0)
+        sections.append((b0 / a0, b1 / a0, b0 / a0, -2 * np.cos(w0) / a0, (1 - alpha) / a0))
+    return sections
+
+
+class _BlockSection:
+    # One biquad in transposed direct form II, written in state space
+    #
+    #     y[n] = C s[n] + D x[n]        s[n+1] = A s[n] + B x[n]
+    #
+    # so a block of n samples is two matrix products instead of a Python
+    # loop per sample: y = C A^k s for every k, plus the block convolved
+    # with the impulse response (a lower triangular Toeplitz matrix). The
+    # state carries over to the next block, so the output is the same as
+    # filtering the whole signal at once.
+    def __init__(self, section, maximumBlockSize):
+        b0, b1, b2, a1, a2 = section
+        A = np.array([[-a1, 1.0], [-a2, 0.0]])
+        B = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        powersOfA = np.empty((maximumBlockSize + 1, 2, 2))
+        powersOfA[0] = np.eye(2)
+        for power in range(1, maximumBlockSize + 1):
+            powersOfA[power] = A @ powersOfA[power - 1]
+        self._powersOfA = powersOfA
+        # A^k B, newest sample first
+        self._stateInputs = (powersOfA[:maximumBlockSize] @ B)[::-1].copy()
+        self._stateOutputs = powersOfA[:maximumBlockSize, 0, :].copy()
+        impulseResponse = np.empty(maximumBlockSize)
+        impulseResponse[0] = b0
+        impulseResponse[1:] = self._stateOutputs[:-1] @ B
+        sampleIndexes = np.arange(maximumBlockSize)
+        lags = sampleIndexes[:, None] - sampleIndexes[None, :]
+        self._convolution = np.where(lags >= 0, impulseResponse[np.maximum(lags, 0)], 0.0)
+        self._state = np.zeros(2)
+
+    def filter(self, block):
+        n = len(block)
+        output = self._stateOutputs[:n] @ self._state + self._convolution[:n, :n] @ block
+        self._state = self._powersOfA[n] @ self._state + self._stateInputs[-n:].T @ block
+        return output
+
+    def reset(self):
+        self._state = np.zeros(2)
+
+
+class MindwaveRawFilters:
+    # Filters raw values block by block: DC removal, a mains notch and a
+    # band-pass, each optional (None leaves it out). The filter state is
+    # kept between blocks, so any split of the signal into blocks gives
+    # the same output as filtering it in one piece.
+    #
+    # filterBlock returns the filtered block as floats. addRawValues takes
+    # the arguments of the onBlock callback of MindwaveRawSampleColumns and
+    # hands the filtered block with the same sample numbers to onBlock, so
+    # stages can be chained, e.g.
+    #
+    #     bandPowers = MindwaveBandPowers()
+    #     rawFilters = MindwaveRawFilters(bandPass=(1.0, 45.0), onBlock=bandPowers.addRawValues)
+    #     rawSampleColumns = MindwaveRawSampleColumns(onBlock=rawFilters.addRawValues)
+    #
+    # The time spent filtering every block is kept for the last
+    # latencyHistory blocks, see latencyReport.
+    def __init__(self, sampleRate=512, notchFrequency=DEFAULT_NOTCH_FREQUENCY, notchQuality=DEFAULT_NOTCH_QUALITY,
+                 bandPass=None, bandPassOrder=4, dcCutoff=DEFAULT_DC_CUTOFF,
+                 maximumBlockSize=DEFAULT_MAXIMUM_BLOCK_SIZE, onBlock=None, latencyHistory=DEFAULT_LATENCY_HISTORY):
+        sections = []
+        if (dcCutoff is not None):
+            sections.append(dcBlockerSection(dcCutoff, sampleRate))
+        if (notchFrequency is not None):
+            sections.append(notchSection(notchFrequency, sampleRate, notchQuality))
+        if (bandPass is not None):
+            lowestFrequency, highestFrequency = bandPass
+            if (not 0 < lowestFrequency < highestFrequency < sampleRate / 2):
+                raise ValueError("bandPass must be (low, high) with 0 < low < high < sampleRate / 2")
+            sections.extend(butterworthSections(lowestFrequency, sampleRate, bandPassOrder, highPass=True))
+            sections.extend(butterworthSections(highestFrequency, sampleRate, bandPassOrder))
+        self._sampleRate = sampleRate
+        self._maximumBlockSize = maximumBlockSize
+        self._sections = [_BlockSection(section, maximumBlockSize) for section in sections]
+        self._onBlock = onBlock
+        self._filteredBlocks = collections.deque()
+        # (number of samples, nanoseconds) of the last blocks
+        self._latencies = collections.deque(maxlen=latencyHistory)
+
+    def filterBlock(self, rawValues):
+        startTime = time.perf_counter_ns()
+        block = np.asarray(rawValues, dtype=np.float64)
+        filteredBlock = np.empty(len(block))
+        for position in range(0, len(block), self._maximumBlockSize):
+            part = block[position:position + self._maximumBlockSize]
+            for section in self._sections:
+                part = section.filter(part)
+            filteredBlock[position:position + len(part)] = part
+        self._latencies.append((len(block), time.perf_counter_ns() - startTime))
+        return filteredBlock
+
+    def addRawValues(self, rawValues, sampleNumbers=None):
+        filteredBlock = self.filterBlock(rawValues)
+        if (self._onBlock is not None):
+            self._onBlock(filteredBlock, sampleNumbers)
+        else:
+            self._filteredBlocks.append((filteredBlock, sampleNumbers))
+
+    def readBlocks(self):
+        # Returns all (filteredValues, sampleNumbers) blocks in order.
+        blocks = list(self._filteredBlocks)
+        self._filteredBlocks.clear()
+        return blocks
+
+    def reset(self):
+        # forgets the filter state, e.g. after the headset reconnected
+        for section in self._sections:
+            section.reset()
+
+    def latencyReport(self):
+        # Filtering time of the last blocks in milliseconds, and the largest
+        # share of its own duration a block needed: above 1.0 the filters
+        # can't keep up with the headset.
+        if (len(self._latencies) == 0):
+            return None
+        numbersOfSamples = np.array([numberOfSamples for numberOfSamples, _ in self._latencies], dtype=np.float64)
+        latencies = np.array([latencyNs for _, latencyNs in self._latencies], dtype=np.float64) / 1e6
+        blockDurations = numbersOfSamples / self._sampleRate * 1e3
+        return {
+            "blocks": len(latencies),
+            "p50Ms": float(np.percentile(latencies, 50)),
+            "p99Ms": float(np.percentile(latencies, 99)),
+            "maximumMs": float(latencies.max()),
+            "maximumRealTimeShare": float(np.max(latencies / np.maximum(blockDurations, 1e-9))),
+        }
@@ -0,0 +1,53 @@
+import collections
+
+import numpy as np
+
+
+class MindwaveRawSampleColumns:
+    # Collects raw values (0x80 rows) without creating a data point per
+    # sample. The two value bytes of a row are big-endian, so they are
+    # copied as they are into a preallocated buffer that numpy reads as a
+    # big-endian int16 array. Every blockSize samples (or on flush) the
+    # block is handed out as native int16 values together with a uint64
+    # array of running sample numbers.
+    DEFAULT_BLOCK_SIZE = 512
+
+    def __init__(self, blockSize=DEFAULT_BLOCK_SIZE, onBlock=None):
+        self._blockSize = blockSize
+        self._rawValueBytes = bytearray(2 * blockSize)
+        self._rawValues = np.frombuffer(self._rawValueBytes, dtype='>i2')
+        self._sampleOffsets = np.arange(blockSize, dtype=np.uint64)
+        self._numberOfSamples = 0
+        self._nextSampleNumber = 0
+        # onBlock(rawValues, sampleNumbers) is called for every block,
+        # without it blocks are kept until readBlocks is called.
+        self._onBlock = onBlock
+        self._blocks = collections.deque()
+
+    def addRawValueBytes(self, valueBytes):
+        position = 2 * self._numberOfSamples
+        self._rawValueBytes[position:position + 2] = valueBytes
+        self._numberOfSamples += 1
+        if (self._numberOfSamples == self._blockSize):
+            self.flush()
+
+    def numberOfBufferedSamples(self):
+        return self._numberOfSamples
+
+    def flush(self):
+        if (self._numberOfSamples == 0):
+            return
+        rawValues = self._rawValues[:self._numberOfSamples].astype(np.int16)
+        sampleNumbers = self._sampleOffsets[:self._numberOfSamples] + np.uint64(self._nextSampleNumber)
+        self._nextSampleNumber += self._numberOfSamples
+        self._numberOfSamples = 0
+        if (self._onBlock is not None):
+            self._onBlock(rawValues, sampleNumbers)
+        else:
+            self._blocks.append((rawValues, sampleNumbers))
+
+    def readBlocks(self):
+        # Returns all flushed (rawValues, sampleNumbers) blocks in order.
+        blocks = list(self._blocks)
+        self._blocks.clear()
+        return blocks
@@ -0,0 +1,103 @@
+import collections
+import threading
+import time
+
+# What happens when the consumer falls behind and the queue is full.
+OVERFLOW_BLOCK = "block"              # reader waits, the socket buffer fills up instead
+OVERFLOW_DROP_OLDEST = "drop-oldest"  # oldest queued data points make room
+OVERFLOW_DROP_NEWEST = "drop-newest"  # new data points are discarded
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+
+class BoundedDataPointQueue:
+    def __init__(self, maxSize, overflowPolicy=OVERFLOW_BLOCK):
+        if (overflowPolicy not in OVERFLOW_POLICIES):
+            raise ValueError("overflowPolicy must be one of {}".format(OVERFLOW_POLICIES))
+        self._maxSize = maxSize
+        self._overflowPolicy = overflowPolicy
+        self._dataPoints = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.droppedDataPointCount = 0
+
+    def putAll(self, dataPoints):
+        with self._condition:
+            for dataPoint in dataPoints:
+                if (len(self._dataPoints) >= self._maxSize and not self._makeRoom()):
+                    continue
+                self._dataPoints.append(dataPoint)
+            self._condition.notify_all()
+
+    def _makeRoom(self):
+        # Returns False if the data point should be dropped instead.
+        if (self._overflowPolicy == OVERFLOW_DROP_NEWEST):
+            self.droppedDataPointCount += 1
+            return False
+        if (self._overflowPolicy == OVERFLOW_DROP_OLDEST):
+            self._dataPoints.popleft()
+            self.droppedDataPointCount += 1
+            return True
+        while (len(self._dataPoints) >= self._maxSize and not self._closed):
+            self._condition.wait()
+        return not self._closed
+
+    def getAll(self, maxDataPoints=None, timeout=None):
+        # Waits at most timeout seconds (None: until data points arrive or
+        # the queue is closed) and returns up to maxDataPoints in order.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while (len(self._dataPoints) == 0 and not self._closed):
+                waitingTime = None if deadline is None else deadline - time.monotonic()
+                if (waitingTime is not None and waitingTime <= 0):
+                    break
+                self._condition.wait(waitingTime)
+            if (maxDataPoints is None or maxDataPoints >= len(self._dataPoints)):
+                dataPoints = list(self._dataPoints)
+                self._dataPoints.clear()
+            else:
+                dataPoints = [self._dataPoints.popleft() for _ in range(maxDataPoints)]
+            self._condition.notify_all()
+            return dataPoints
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def isClosed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._dataPoints)
+
+
+class MindwaveReaderThread(threading.Thread):
+    # Reads, frames and parses in the background so slow processing in the
+    # consumer does not delay recv. readDataPoints(timeout) is called in a
+    # loop and its results go into the queue; the timeout lets the thread
+    # notice stop() while no bytes arrive.
+    POLLING_INTERVAL = 0.1
+
+    def __init__(self, readDataPoints, dataPointQueue):
+        threading.Thread.__init__(self, name="MindwaveReaderThread", daemon=True)
+        self._readDataPoints = readDataPoints
+        self.dataPointQueue = dataPointQueue
+        self._stopRequested = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            while (not self._stopRequested.is_set()):
+                dataPoints = self._readDataPoints(self.POLLING_INTERVAL)
+                if (len(dataPoints) > 0):
+                    self.dataPointQueue.putAll(dataPoints)
+        except OSError as error:
+            # e.g. the headset was switched off, consumers see a closed queue
+            self.error = error
+        finally:
+            self.dataPointQueue.close()
+
+    def stop(self, timeout=None):
+        self._stopRequested.set()
+        self.dataPointQueue.close()
+        self.join(timeout)
@@ -0,0 +1,73 @@
+class MindwaveRingBuffer:
+    # Fixed capacity byte buffer that is allocated once and reused for the
+    # whole connection. Unread bytes always lie in one contiguous region
+    # [readPosition, writePosition), so payloads can be handed out as
+    # memoryview slices without copying. When the writer reaches the end of
+    # the storage, the (small, at most one partial packet) unread region is
+    # moved back to the start instead of wrapping around, which keeps views
+    # contiguous and costs no allocation.
+    DEFAULT_CAPACITY = 4096
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._storage = bytearray(capacity)
+        self._view = memoryview(self._storage)
+        self._readPosition = 0
+        self._writePosition = 0
+
+    def capacity(self):
+        return len(self._storage)
+
+    def size(self):
+        return self._writePosition - self._readPosition
+
+    def freeSpace(self):
+        return self.capacity() - self.size()
+
+    def writableView(self, minimumBytes=1):
+        # Returns a view on the free space behind the unread bytes, to be
+        # filled by e.g. socket.recv_into and then confirmed by commitWrite.
+        if (self.capacity() - self._writePosition < minimumBytes):
+            self._moveUnreadBytesToStart()
+        if (self.capacity() - self._writePosition < minimumBytes):
+            raise BufferError("ring buffer full, cannot write {} more bytes".format(minimumBytes))
+        return self._view[self._writePosition:]
+
+    def commitWrite(self, amountOfBytes):
+        self._writePosition += amountOfBytes
+
+    def write(self, data):
+        amountOfBytes = len(data)
+        self.writableView(amountOfBytes)[:amountOfBytes] = data
+        self.commitWrite(amountOfBytes)
+
+    def _moveUnreadBytesToStart(self):
+        unreadSize = self.size()
+        self._view[0:unreadSize] = self._view[self._readPosition:self._writePosition]
+        self._readPosition = 0
+        self._writePosition = unreadSize
+
+    def readableView(self, offset=0, amountOfBytes=None):
+        # Views are only valid until the next writableView/write call,
+        # which may move the unread bytes.
+        start = self._readPosition + offset
+        if (amountOfBytes is None):
+            return self._view[start:self._writePosition]
+        return self._view[start:start + amountOfBytes]
+
+    def byteAt(self, offset):
+        return self._storage[self._readPosition + offset]
+
+    def find(self, subsequence, offset=0):
+        # Search in the unread bytes, returns the offset relative to the read
+        # position or -1. Runs in C on the underlying bytearray, no copy.
+        position = self._storage.find(subsequence, self._readPosition + offset, self._writePosition)
+        if (position == -1):
+            return -1
+        return position - self._readPosition
+
+    def consume(self, amountOfBytes):
+        self._readPosition += amountOfBytes
+        if (self._readPosition == self._writePosition):
+            # cheap reset, avoids moving anything on the next write
+            self._readPosition = 0
+            self._writePosition = 0
@@ -0,0 +1,135 @@
+import array
+
+DEFAULT_FIT_SECONDS = 60
+
+
+class MindwaveSampleClock:
+    # Host time (time.monotonic_ns()) of every raw sample, reconstructed
+    # from the headset's sample clock instead of the time its packet
+    # happened to be received.
+    #
+    # Packets arrive in bursts and late by a varying amount, but never
+    # before the sample was taken: receive time = sample time + delay with
+    # delay >= minimum delay. For every second of samples the observation
+    # with the smallest delay is kept, and a line through those of the
+    # last fitSeconds seconds gives the sample period of the headset as
+    # measured by the host clock (its drift from the nominal 512 Hz) and
+    # the host time of any sample number. Times are late by the minimum
+    # delay of the link, which is the same for every sample.
+    #
+    # Sample numbers count the raw values received, so samples lost with
+    # a bad packet make the times after it early by one period each until
+    # the fit has moved past the gap.
+    #
+    # The reader feeds it once per batch of packets, so it is on the hot
+    # path: the line is refit once per second from running integer sums,
+    # which are exact, in constant time and without numpy. Only
+    # timesOfSamples, which takes arrays, needs numpy.
+    def __init__(self, sampleRate=512, fitSeconds=DEFAULT_FIT_SECONDS):
+        self._nominalSampleRate = sampleRate
+        self._nominalPeriodNs = 1e9 / sampleRate
+        self._samplesPerInterval = sampleRate
+        self._intervalEnd = sampleRate
+        self._fitSeconds = fitSeconds
+        # (delay, sampleIndex, receiveTimeNs) with the smallest delay of the current second
+        self._intervalMinimum = None
+        # samples and times of the kept observations relative to the first
+        # one, and their sums for the least squares line
+        self._envelopeSamples = array.array("q")
+        self._envelopeTimes = array.array("q")
+        self._referenceSample = None
+        self._referenceTimeNs = None
+        self._sumOfSamples = 0
+        self._sumOfTimes = 0
+        self._sumOfSquaredSamples = 0
+        self._sumOfProducts = 0
+        # (sampleIndex, timeNs, periodNs), replaced as a whole so readers
+        # in another thread never see half an update
+        self._fit = None
+
+    def addObservation(self, sampleIndex, receiveTimeNs):
+        # sampleIndex: the last sample that had been received at receiveTimeNs
+        delay = receiveTimeNs - sampleIndex * self._nominalPeriodNs
+        if (self._intervalMinimum is None or delay < self._intervalMinimum[0]):
+            self._intervalMinimum = (delay, sampleIndex, receiveTimeNs)
+        if (sampleIndex >= self._intervalEnd):
+            self._addToEnvelope(*self._intervalMinimum[1:])
+            self._intervalMinimum = None
+            self._intervalEnd = (sampleIndex // self._samplesPerInterval + 1) * self._samplesPerInterval
+            self._fitEnvelope()
+        elif (len(self._envelopeSamples) == 0):
+            # no second completed yet, nominal rate from the best observation
+            _, bestSampleIndex, bestTimeNs = self._intervalMinimum
+            self._fit = (bestSampleIndex, bestTimeNs, self._nominalPeriodNs)
+
+    def _addToEnvelope(self, sampleIndex, timeNs):
+        if (self._referenceSample is None):
+            self._referenceSample = sampleIndex
+            self._referenceTimeNs = timeNs
+        sample = sampleIndex - self._referenceSample
+        time = timeNs - self._referenceTimeNs
+        self._envelopeSamples.append(sample)
+        self._envelopeTimes.append(time)
+        self._addToSums(sample, time, 1)
+        if (len(self._envelopeSamples) > self._fitSeconds):
+            self._addToSums(self._envelopeSamples.pop(0), self._envelopeTimes.pop(0), -1)
+
+    def _addToSums(self, sample, time, sign):
+        self._sumOfSamples += sign * sample
+        self._sumOfTimes += sign * time
+        self._sumOfSquaredSamples += sign * sample * sample
+        self._sumOfProducts += sign * sample * time
+
+    def _fitEnvelope(self):
+        numberOfObservations = len(self._envelopeSamples)
+        denominator = numberOfObservations * self._sumOfSquaredSamples - self._sumOfSamples ** 2
+        if (numberOfObservations < 2 or denominator == 0):
+            self._fit = (self._referenceSample + self._envelopeSamples[-1],
+                         self._referenceTimeNs + self._envelopeTimes[-1], self._nominalPeriodNs)
+            return
+        periodNs = (numberOfObservations * self._sumOfProducts - self._sumOfSamples * self._sumOfTimes) / denominator
+        interceptNs = (self._sumOfSquaredSamples * self._sumOfTimes
+                       - self._sumOfSamples * self._sumOfProducts) / denominator
+        self._fit = (self._referenceSample, self._referenceTimeNs + interceptNs, periodNs)
+
+    def hasEstimate(self):
+        return self._fit is not None
+
+    def timeOfSample(self, sampleIndex):
+        # monotonic_ns time of one sample, None before the first observation
+        fit = self._fit
+        if (fit is None):
+            return None
+        referenceSample, referenceTimeNs, periodNs = fit
+        # rounded like timesOfSamples, so both give the same time
+        return round(referenceTimeNs) + round((sampleIndex - referenceSample) * periodNs)
+
+    def timesOfSamples(self, sampleNumbers):
+        # int64 monotonic_ns times of an array of sample numbers, e.g. the
+        # sampleNumbers of a MindwaveRawSampleColumns block
+        import numpy as np
+        fit = self._fit
+        if (fit is None):
+            return None
+        referenceSample, referenceTimeNs, periodNs = fit
+        offsets = np.asarray(sampleNumbers).astype(np.int64) - np.int64(referenceSample)
+        return (np.round(offsets * periodNs) + np.int64(round(referenceTimeNs))).astype(np.int64)
+
+    def sampleAtTime(self, timeNs):
+        # number of the sample taken closest to a monotonic_ns time, e.g. of
+        # a marker; None before the first observation
+        fit = self._fit
+        if (fit is None):
+            return None
+        referenceSample, referenceTimeNs, periodNs = fit
+        return referenceSample + int(round((timeNs - referenceTimeNs) / periodNs))
+
+    def sampleRate(self):
+        # sample rate of the headset measured with the host clock
+        if (self._fit is None):
+            return self._nominalSampleRate
+        return 1e9 / self._fit[2]
+
+    def driftPpm(self):
+        # positive if the headset samples faster than its nominal rate
+        return (self.sampleRate() / self._nominalSampleRate - 1) * 1e6
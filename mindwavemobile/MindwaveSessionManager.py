@@ -0,0 +1,146 @@
+import collections
+import heapq
+import threading
+import time
+
+from .MindwaveDataPointReader import MindwaveDataPointReader
+from .MindwaveReaderThread import BoundedDataPointQueue, OVERFLOW_DROP_OLDEST
+
+
+class MindwaveSessionManager:
+    # Records several headsets at once. Every headset is read in its own
+    # thread, and readDataPoints merges the streams into one list of
+    # (timestampNs, address, dataPoint) ordered by time. timestampNs is the
+    # receive time the reader stamped on the data point (receiveTimeNs),
+    # or the time.monotonic_ns() its batch got here if it has none.
+    # Data points are held back for alignmentDelay seconds so a headset
+    # whose data arrives a little later still ends up in the right order.
+    POLLING_INTERVAL = 0.1
+    # stop() waits at most this long for all reading threads, a headset
+    # still being discovered can't be interrupted
+    STOP_TIMEOUT = 5
+
+    def __init__(self, addresses, alignmentDelay=0.25, queueSize=51200,
+                 overflowPolicy=OVERFLOW_DROP_OLDEST, readerFactory=MindwaveDataPointReader):
+        # readerFactory(address) creates the reader for one headset.
+        self._addresses = list(addresses)
+        self._alignmentDelayNs = int(alignmentDelay * 1e9)
+        self._readers = [readerFactory(address) for address in self._addresses]
+        self._deviceQueues = [BoundedDataPointQueue(queueSize, overflowPolicy) for _ in self._addresses]
+        self._pendingDataPoints = [collections.deque() for _ in self._addresses]
+        self._dataPointCounts = [0] * len(self._addresses)
+        self._newDataCondition = threading.Condition()
+        self._stopRequested = threading.Event()
+        self._threads = []
+        self._startTime = None
+
+    def start(self):
+        # Connects to all headsets in parallel, connecting may take a while
+        # when a headset is not ready yet.
+        self._startTime = time.monotonic()
+        for deviceIndex in range(len(self._addresses)):
+            thread = threading.Thread(target=self._readDevice, args=(deviceIndex,),
+                                      name="Mindwave " + self._addresses[deviceIndex], daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        # Stopping a reader closes its transport, which also wakes up a
+        # thread blocked in a read or still connecting. timeout is for all
+        # threads together, None waits for them however long it takes.
+        self._stopRequested.set()
+        for reader in self._readers:
+            reader.stop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def _readDevice(self, deviceIndex):
+        reader = self._readers[deviceIndex]
+        deviceQueue = self._deviceQueues[deviceIndex]
+        try:
+            reader.start()
+            while (not self._stopRequested.is_set() and reader.isConnected()):
+                dataPoints = reader.readDataPoints(timeout=self.POLLING_INTERVAL)
+                if (len(dataPoints) == 0):
+                    continue
+                arrivalTimeNs = time.monotonic_ns()
+                self._dataPointCounts[deviceIndex] += len(dataPoints)
+                deviceQueue.putAll([(self._timestampOf(dataPoint, arrivalTimeNs), deviceIndex, dataPoint)
+                                    for dataPoint in dataPoints])
+                with self._newDataCondition:
+                    self._newDataCondition.notify_all()
+        except OSError as error:
+            # closing the transport in stop() ends a blocked read this way too
+            if (not self._stopRequested.is_set()):
+                print("Reading from {} failed: {}".format(self._addresses[deviceIndex], error))
+        finally:
+            if (self._stopRequested.is_set()):
+                # the reader may have connected after stop() stopped it
+                reader.stop()
+            deviceQueue.close()
+
+    @staticmethod
+    def _timestampOf(dataPoint, arrivalTimeNs):
+        receiveTimeNs = getattr(dataPoint, "receiveTimeNs", None)
+        return arrivalTimeNs if receiveTimeNs is None else receiveTimeNs
+
+    def readDataPoints(self, timeout=None):
+        # Returns the data points of all headsets that are older than the
+        # alignment delay, ordered by receive time. Waits at most timeout
+        # seconds (None: until there are some) and may return an empty list.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._newDataCondition:
+            while (True):
+                self._collectDeviceQueues()
+                dataPoints = self._releaseAlignedDataPoints(time.monotonic_ns() - self._alignmentDelayNs)
+                if (len(dataPoints) > 0 or self._allDevicesFinished()):
+                    return dataPoints
+                waitingTime = self._timeUntilNextRelease()
+                if (deadline is not None):
+                    remainingTime = deadline - time.monotonic()
+                    if (remainingTime <= 0):
+                        return dataPoints
+                    waitingTime = remainingTime if waitingTime is None else min(waitingTime, remainingTime)
+                self._newDataCondition.wait(waitingTime)
+
+    def _collectDeviceQueues(self):
+        for deviceQueue, pendingDataPoints in zip(self._deviceQueues, self._pendingDataPoints):
+            pendingDataPoints.extend(deviceQueue.getAll(timeout=0))
+
+    def _releaseAlignedDataPoints(self, cutoffNs):
+        releasedPerDevice = []
+        for pendingDataPoints in self._pendingDataPoints:
+            released = []
+            while (len(pendingDataPoints) > 0 and pendingDataPoints[0][0] <= cutoffNs):
+                released.append(pendingDataPoints.popleft())
+            releasedPerDevice.append(released)
+        # per device the data points are already in order, only merge them
+        return [(timestampNs, self._addresses[deviceIndex], dataPoint)
+                for timestampNs, deviceIndex, dataPoint in heapq.merge(*releasedPerDevice, key=lambda item: item[0])]
+
+    def _timeUntilNextRelease(self):
+        oldestTimestamps = [pending[0][0] for pending in self._pendingDataPoints if len(pending) > 0]
+        if (len(oldestTimestamps) == 0):
+            return None
+        return max(0, (min(oldestTimestamps) + self._alignmentDelayNs - time.monotonic_ns()) / 1e9)
+
+    def _allDevicesFinished(self):
+        return (all(deviceQueue.isClosed() and len(deviceQueue) == 0 for deviceQueue in self._deviceQueues)
+                and all(len(pending) == 0 for pending in self._pendingDataPoints))
+
+    def statistics(self):
+        # Per address: the reader's counters plus throughput and data points
+        # dropped because this manager's consumer fell behind.
+        elapsedTime = 0 if self._startTime is None else time.monotonic() - self._startTime
+        statisticsPerDevice = {}
+        for deviceIndex, address in enumerate(self._addresses):
+            deviceStatistics = dict(self._readers[deviceIndex].statistics())
+            deviceStatistics["connected"] = self._readers[deviceIndex].isConnected()
+            deviceStatistics["dataPoints"] = self._dataPointCounts[deviceIndex]
+            deviceStatistics["dataPointsPerSecond"] = (
+                self._dataPointCounts[deviceIndex] / elapsedTime if elapsedTime > 0 else 0.0)
+            deviceStatistics["droppedDataPoints"] = (deviceStatistics.get("droppedDataPoints", 0)
+                                                     + self._deviceQueues[deviceIndex].droppedDataPointCount)
+            statisticsPerDevice[address] = deviceStatistics
+        return statisticsPerDevice
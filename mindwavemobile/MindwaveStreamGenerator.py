@@ -0,0 +1,207 @@
+import math
+import random
+import select
+import socket
+import threading
+import time
+
+from .MindwavePacketFramer import START_OF_PACKET_BYTE
+
+RAW_VALUE_CODE = 0x80
+POOR_SIGNAL_CODE = 0x02
+ATTENTION_CODE = 0x04
+MEDITATION_CODE = 0x05
+BLINK_CODE = 0x16
+EEG_POWERS_CODE = 0x83
+
+
+def buildPacket(payload, checkSum=None):
+    if (checkSum is None):
+        checkSum = ~sum(payload) & 0xff
+    return bytes([START_OF_PACKET_BYTE, START_OF_PACKET_BYTE, len(payload)]) + bytes(payload) + bytes([checkSum])
+
+
+class MindwaveStreamGenerator:
+    # Produces the byte stream of a headset without one: rawRate packets
+    # with one raw value each per second, followed every second by one
+    # packet with poor signal level, EEG powers, attention and meditation,
+    # like the Mindwave Mobile sends them. With blinkInterval a blink
+    # strength packet is sent every blinkInterval seconds.
+    #
+    # Streams can be corrupted on purpose to exercise the framer: every
+    # packet is given a wrong checksum with probability badCheckSumRate,
+    # cut short with truncatedPacketRate, and followed by up to
+    # maximumGarbageLength random bytes with garbageRate. Garbage never
+    # contains sync bytes. What was injected is counted in
+    # badCheckSumCount, truncatedPacketCount and garbageByteCount.
+    # The same seed gives the same stream.
+    def __init__(self, rawRate=512, blinkInterval=None, seed=None,
+                 badCheckSumRate=0.0, truncatedPacketRate=0.0, garbageRate=0.0, maximumGarbageLength=16):
+        self._rawRate = rawRate
+        self._blinkInterval = blinkInterval
+        self._random = random.Random(seed)
+        self._badCheckSumRate = badCheckSumRate
+        self._truncatedPacketRate = truncatedPacketRate
+        self._garbageRate = garbageRate
+        self._maximumGarbageLength = maximumGarbageLength
+        self._sampleNumber = 0
+        self.packetCount = 0
+        self.badCheckSumCount = 0
+        self.truncatedPacketCount = 0
+        self.garbageByteCount = 0
+
+    def rawRate(self):
+        return self._rawRate
+
+    def bytesPerSecond(self):
+        # approximately, without corruption
+        return self._rawRate * 8 + 36
+
+    def generateSeconds(self, seconds):
+        return b"".join(self.chunks(seconds))
+
+    def chunks(self, seconds=None):
+        # Yields one second of stream at a time, forever if seconds is None.
+        second = 0
+        while (seconds is None or second < seconds):
+            yield b"".join(self._streamBytes(packet) for packet in self._packetsOfOneSecond(second))
+            second += 1
+
+    def writeFile(self, path, seconds):
+        # The file can be replayed with MindwaveTransports.CaptureFileTransport.
+        with open(path, "wb") as captureFile:
+            for chunk in self.chunks(seconds):
+                captureFile.write(chunk)
+
+    def _packetsOfOneSecond(self, second):
+        for _ in range(self._rawRate):
+            yield self._rawValuePacket()
+        yield self._eSensePacket(second)
+        if (self._blinkInterval is not None and (second + 1) % self._blinkInterval == 0):
+            yield buildPacket([BLINK_CODE, self._random.randint(30, 255)])
+
+    def _rawValuePacket(self):
+        rawValue = self._rawValue(self._sampleNumber)
+        self._sampleNumber += 1
+        return buildPacket(bytes([RAW_VALUE_CODE, 0x02]) + (rawValue & 0xffff).to_bytes(2, "big"))
+
+    def _rawValue(self, sampleNumber):
+        # 10 Hz alpha plus a little 50 Hz mains hum and noise
+        secondsSinceStart = sampleNumber / self._rawRate
+        value = (200 * math.sin(2 * math.pi * 10 * secondsSinceStart)
+                 + 30 * math.sin(2 * math.pi * 50 * secondsSinceStart)
+                 + self._random.gauss(0, 40))
+        return max(-2048, min(2047, int(value)))
+
+    def _eSensePacket(self, second):
+        eegPowers = [self._random.randint(0, 0xffffff) for _ in range(8)]
+        eegPowersBytes = b"".join(power.to_bytes(3, "big") for power in eegPowers)
+        attention = int(50 + 40 * math.sin(second / 10))
+        meditation = int(50 + 40 * math.cos(second / 7))
+        return buildPacket(bytes([POOR_SIGNAL_CODE, 0, EEG_POWERS_CODE, len(eegPowersBytes)])
+                           + eegPowersBytes + bytes([ATTENTION_CODE, attention, MEDITATION_CODE, meditation]))
+
+    def _streamBytes(self, packet):
+        self.packetCount += 1
+        if (self._random.random() < self._badCheckSumRate):
+            self.badCheckSumCount += 1
+            packet = packet[:-1] + bytes([packet[-1] ^ 0xff])
+        if (self._random.random() < self._truncatedPacketRate):
+            self.truncatedPacketCount += 1
+            packet = packet[:self._random.randint(3, len(packet) - 1)]
+        if (self._random.random() < self._garbageRate):
+            garbageLength = self._random.randint(1, self._maximumGarbageLength)
+            self.garbageByteCount += garbageLength
+            packet += bytes(self._random.choice(range(START_OF_PACKET_BYTE)) for _ in range(garbageLength))
+        return packet
+
+
+class MindwaveStreamServer(threading.Thread):
+    # Serves a generated stream on a local socket, so readers can be soak
+    # tested through SocketTransport. Every client gets its own stream of
+    # seconds seconds (None: endless) sent speed times faster than real
+    # time, None sends as fast as the client reads.
+    #
+    #     server = MindwaveStreamServer(lambda: MindwaveStreamGenerator(seed=1), speed=10.0)
+    #     server.start()
+    #     reader = MindwaveDataPointReader(transport=SocketTransport(server.address()))
+    POLLING_INTERVAL = 0.1
+
+    def __init__(self, generatorFactory=MindwaveStreamGenerator, address=("127.0.0.1", 0), speed=1.0, seconds=None):
+        threading.Thread.__init__(self, name="MindwaveStreamServer", daemon=True)
+        self._generatorFactory = generatorFactory
+        self._speed = speed
+        self._seconds = seconds
+        if (isinstance(address, str)):
+            self._serverSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._serverSocket.bind(address)
+            self._serverSocket.listen()
+        else:
+            self._serverSocket = socket.create_server(address)
+        self._stopRequested = threading.Event()
+
+    def address(self):
+        return self._serverSocket.getsockname()
+
+    def run(self):
+        try:
+            while (not self._stopRequested.is_set()):
+                readableSockets, _, _ = select.select([self._serverSocket], [], [], self.POLLING_INTERVAL)
+                if (len(readableSockets) > 0):
+                    connection, _ = self._serverSocket.accept()
+                    threading.Thread(target=self._serveClient, args=(connection,), daemon=True).start()
+        finally:
+            self._serverSocket.close()
+
+    def _serveClient(self, connection):
+        generator = self._generatorFactory()
+        startTime = time.monotonic()
+        # sent in slices of 1/32 s so the stream flows evenly
+        sliceDuration = 1 / 32
+        try:
+            with connection:
+                for second, chunk in enumerate(generator.chunks(self._seconds)):
+                    sliceLength = math.ceil(len(chunk) / 32)
+                    for sliceNumber, position in enumerate(range(0, len(chunk), sliceLength)):
+                        if (self._stopRequested.is_set()):
+                            return
+                        if (self._speed is not None):
+                            sendTime = startTime + (second + sliceNumber * sliceDuration) / self._speed
+                            time.sleep(max(0, sendTime - time.monotonic()))
+                        connection.sendall(chunk[position:position + sliceLength])
+        except OSError:
+            # the client went away
+            pass
+
+    def stop(self, timeout=None):
+        self._stopRequested.set()
+        self.join(timeout)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic Mindwave Mobile byte stream.")
+    parser.add_argument("--file", help="write the stream to this file instead of serving it")
+    parser.add_argument("--port", type=int, default=5555, help="TCP port to serve the stream on")
+    parser.add_argument("--seconds", type=int, help="length of the stream, endless when serving by default")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of real time, 0 for as fast as possible")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--blink-interval", type=int)
+    parser.add_argument("--bad-checksum-rate", type=float, default=0.0)
+    parser.add_argument("--truncated-packet-rate", type=float, default=0.0)
+    parser.add_argument("--garbage-rate", type=float, default=0.0)
+    arguments = parser.parse_args()
+
+    def createGenerator():
+        return MindwaveStreamGenerator(blinkInterval=arguments.blink_interval, seed=arguments.seed,
+                                       badCheckSumRate=arguments.bad_checksum_rate,
+                                       truncatedPacketRate=arguments.truncated_packet_rate,
+                                       garbageRate=arguments.garbage_rate)
+
+    if (arguments.file is not None):
+        createGenerator().writeFile(arguments.file, arguments.seconds or 60)
+    else:
+        server = MindwaveStreamServer(createGenerator, ("127.0.0.1", arguments.port),
+                                      arguments.speed or None, arguments.seconds)
+        print("Serving on", server.address())
+        server.run()
@@ -0,0 +1,222 @@
+import mmap
+import os
+import select
+import socket
+import textwrap
+import threading
+import time
+
+# Byte sources for MindwaveMobileRawReader. A transport has connect(),
+# isConnected(), receiveInto(freeBuffer) which returns the number of bytes
+# written (0 at the end of the stream), waitForBytes(timeout) and close().
+# close() may come from another thread and is final: a connect() that is
+# still running gives up, and a closed transport does not connect again.
+
+# 512 raw value packets of 8 bytes plus about one EEG powers packet per second
+REAL_TIME_BYTES_PER_SECOND = 512 * 8 + 36
+
+
+class RfcommTransport:
+    # The headset itself, over bluetooth RFCOMM with pybluez.
+    def __init__(self, address=None):
+        self._mindwaveMobileAddress = address
+        self._isConnected = False
+        self.mindwaveMobileSocket = None
+        self._closeRequested = threading.Event()
+        self._socketLock = threading.Lock()
+
+    def connect(self):
+        # First discover mindwave mobile address, then connect.
+        # Headset address of my headset was'9C:B7:0D:72:CD:02';
+        # not sure if it really can be different?
+        # now discovering address because of https://github.com/robintibor/python-mindwave-mobile/issues/4
+        if (self._closeRequested.is_set()):
+            return
+        if (self._mindwaveMobileAddress is None):
+            self._mindwaveMobileAddress = findMindwaveMobileAddress()
+        if (self._mindwaveMobileAddress is not None):
+            print ("Discovered Mindwave Mobile...")
+            self._connectToAddress(self._mindwaveMobileAddress)
+        else:
+            self._printErrorDiscoveryMessage()
+
+    def _connectToAddress(self, mindwaveMobileAddress):
+        import bluetooth
+        with self._socketLock:
+            if (self._closeRequested.is_set()):
+                return
+            self.mindwaveMobileSocket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+        while (not self._isConnected and not self._closeRequested.is_set()):
+            try:
+                self.mindwaveMobileSocket.connect(
+                    (mindwaveMobileAddress, 1))
+                self._isConnected = True
+            except (bluetooth.btcommon.BluetoothError, OSError) as error:
+                if (self._closeRequested.is_set()):
+                    break
+                print("Could not connect: ", error, "; Retrying in 5s...")
+                # close() ends the wait
+                self._closeRequested.wait(5)
+        if (self._closeRequested.is_set()):
+            self._isConnected = False
+
+    def _printErrorDiscoveryMessage(self):
+         print((textwrap.dedent("""\
+                    Could not discover Mindwave Mobile. Please make sure the
+                    Mindwave Mobile device is in pairing mode and your computer
+                    has bluetooth enabled.""").replace("\n", " ")))
+
+    def isConnected(self):
+        return self._isConnected
+
+    def receiveInto(self, freeBuffer):
+        return receiveIntoFromSocket(self.mindwaveMobileSocket, freeBuffer)
+
+    def waitForBytes(self, timeout=None):
+        readableSockets, _, _ = select.select([self.mindwaveMobileSocket], [], [], timeout)
+        return len(readableSockets) > 0
+
+    def close(self):
+        with self._socketLock:
+            self._closeRequested.set()
+            if (self.mindwaveMobileSocket is not None):
+                self.mindwaveMobileSocket.close()
+            self._isConnected = False
+
+
+def findMindwaveMobileAddress():
+    import bluetooth
+    nearby_devices = bluetooth.discover_devices(lookup_names = True)
+    for address, name in nearby_devices:
+        if (name == "MindWave Mobile"):
+            return address
+    return None
+
+
+def receiveIntoFromSocket(sourceSocket, freeBuffer):
+    # recv_into writes straight into the preallocated buffer, the
+    # pybluez socket only offers recv so copy in that case.
+    if (hasattr(sourceSocket, "recv_into")):
+        return sourceSocket.recv_into(freeBuffer)
+    receivedBytes = sourceSocket.recv(len(freeBuffer))
+    freeBuffer[:len(receivedBytes)] = receivedBytes
+    return len(receivedBytes)
+
+
+class SocketTransport:
+    # A local stand-in for the headset, e.g. a process replaying or
+    # generating ThinkGear bytes. address is (host, port) for TCP or a
+    # path for a UNIX socket.
+    def __init__(self, address):
+        self._address = address
+        self._socket = None
+        self._closed = False
+        self._socketLock = threading.Lock()
+
+    def connect(self):
+        if (self._closed):
+            return
+        if (isinstance(self._address, (str, bytes, os.PathLike))):
+            connectedSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connectedSocket.connect(self._address)
+        else:
+            connectedSocket = socket.create_connection(self._address)
+        with self._socketLock:
+            if (self._closed):
+                # closed while connecting, don't leak the new socket
+                connectedSocket.close()
+            else:
+                self._socket = connectedSocket
+
+    def isConnected(self):
+        return self._socket is not None
+
+    def receiveInto(self, freeBuffer):
+        # close() may come from another thread, e.g. MindwaveSessionManager.stop(),
+        # a closed transport reads like the end of the stream
+        connectedSocket = self._socket
+        if (connectedSocket is None):
+            return 0
+        return connectedSocket.recv_into(freeBuffer)
+
+    def waitForBytes(self, timeout=None):
+        connectedSocket = self._socket
+        if (connectedSocket is None):
+            return True
+        readableSockets, _, _ = select.select([connectedSocket], [], [], timeout)
+        return len(readableSockets) > 0
+
+    def close(self):
+        with self._socketLock:
+            self._closed = True
+            if (self._socket is not None):
+                self._socket.close()
+                self._socket = None
+
+
+class CaptureFileTransport:
+    # Replays a file with the bytes received from a headset. The file is
+    # memory-mapped, so replaying does not read it into memory first.
+    # speed None replays as fast as the reader consumes, 1.0 replays at
+    # bytesPerSecond, 10.0 ten times faster.
+    def __init__(self, path, speed=None, bytesPerSecond=REAL_TIME_BYTES_PER_SECOND, chunkSize=1024):
+        self._path = path
+        self._speed = speed
+        self._bytesPerSecond = bytesPerSecond
+        self._chunkSize = chunkSize
+        self._file = None
+        self._capture = None
+        self._position = 0
+        self._startTime = None
+
+    def connect(self):
+        self._file = open(self._path, "rb")
+        if (os.fstat(self._file.fileno()).st_size > 0):
+            self._capture = memoryview(mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            self._capture = memoryview(b"")
+        self._position = 0
+        self._startTime = time.monotonic()
+
+    def isConnected(self):
+        return self._capture is not None
+
+    def receiveInto(self, freeBuffer):
+        self.waitForBytes(None)
+        amountOfBytes = min(len(freeBuffer), self._chunkSize, self._availableBytes())
+        freeBuffer[:amountOfBytes] = self._capture[self._position:self._position + amountOfBytes]
+        self._position += amountOfBytes
+        return amountOfBytes
+
+    def _availableBytes(self):
+        # bytes that would have been received by now when replaying in time
+        remainingBytes = len(self._capture) - self._position
+        if (self._speed is None):
+            return remainingBytes
+        elapsedTime = time.monotonic() - self._startTime
+        dueBytes = int(elapsedTime * self._speed * self._bytesPerSecond) - self._position
+        return min(remainingBytes, max(0, dueBytes))
+
+    def waitForBytes(self, timeout=None):
+        # At the end of the file this returns True, so receiveInto can
+        # report the end of the stream.
+        if (self._position >= len(self._capture) or self._availableBytes() > 0):
+            return True
+        nextByteTime = self._startTime + (self._position + 1) / (self._speed * self._bytesPerSecond)
+        waitingTime = nextByteTime - time.monotonic()
+        if (timeout is not None and waitingTime > timeout):
+            time.sleep(max(0, timeout))
+            return False
+        time.sleep(max(0, waitingTime))
+        return True
+
+    def close(self):
+        if (self._capture is not None):
+            capture = self._capture.obj if isinstance(self._capture.obj, mmap.mmap) else None
+            self._capture.release()
+            if (capture is not None):
+                capture.close()
+            self._capture = None
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
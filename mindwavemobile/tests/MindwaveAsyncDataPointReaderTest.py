@@ -0,0 +1,62 @@
+import asyncio
+import time
+import unittest
+from mindwavemobile.MindwaveAsyncDataPointReader import AsyncMindwaveDataPointReader
+from mindwavemobile.MindwaveStreamGenerator import buildPacket
+
+
+class AsyncDataPointReaderTest(unittest.TestCase):
+    def testAsyncIterationYieldsDataPointsInOrder(self):
+        async def readAll():
+            streamReader = asyncio.StreamReader()
+            streamReader.feed_data(buildPacket([0x80, 0x02, 0x00, 0x01, 0x04, 0x25]))
+            streamReader.feed_data(buildPacket([0x05, 0x35]))
+            streamReader.feed_eof()
+            reader = AsyncMindwaveDataPointReader(streamReader=streamReader)
+            await reader.start()
+            return [str(dataPoint) async for dataPoint in reader]
+        dataPoints = asyncio.run(readAll())
+        self.assertEqual(dataPoints, ["Raw Value: 1", "Attention Level: 37", "Meditation Level: 53"],
+                         "should read every data point in order until the end of the stream")
+
+    def testReadDataPointsReturnsEmptyListAfterTimeout(self):
+        async def readWithTimeout():
+            reader = AsyncMindwaveDataPointReader(streamReader=asyncio.StreamReader())
+            return await reader.readDataPoints(timeout=0.01)
+        self.assertEqual(asyncio.run(readWithTimeout()), [], "should give up after the timeout")
+
+    def testReadDataPointsReturnsWholeBatch(self):
+        async def readBatch():
+            streamReader = asyncio.StreamReader()
+            streamReader.feed_data(buildPacket([0x04, 0x10]) + buildPacket([0x04, 0x11]) + buildPacket([0x04, 0x12]))
+            reader = AsyncMindwaveDataPointReader(streamReader=streamReader)
+            firstBatch = await reader.readDataPoints(maxDataPoints=2)
+            secondBatch = await reader.readDataPoints()
+            return [dataPoint.attentionValue for dataPoint in firstBatch + secondBatch]
+        self.assertEqual(asyncio.run(readBatch()), [0x10, 0x11, 0x12], "should split the batch at maxDataPoints")
+
+    def testDataPointsAreStampedLikeTheSynchronousReader(self):
+        async def readStamped():
+            streamReader = asyncio.StreamReader()
+            reader = AsyncMindwaveDataPointReader(streamReader=streamReader)
+            streamReader.feed_data(buildPacket([0x80, 0x02, 0x00, 0x01]) + buildPacket([0x80, 0x02, 0x00, 0x02]))
+            firstBatch = await reader.readDataPoints()
+            await asyncio.sleep(0.01)
+            streamReader.feed_data(buildPacket([0x04, 0x25]) + buildPacket([0x80, 0x02, 0x00, 0x03]))
+            secondBatch = await reader.readDataPoints()
+            return reader, firstBatch, secondBatch
+        startTimeNs = time.monotonic_ns()
+        reader, firstBatch, secondBatch = asyncio.run(readStamped())
+        dataPoints = firstBatch + secondBatch
+        self.assertEqual([dataPoint.sampleIndex for dataPoint in dataPoints], [0, 1, 2, 2],
+                         "should number the raw samples")
+        self.assertTrue(all(dataPoint.receiveTimeNs >= startTimeNs for dataPoint in dataPoints),
+                        "should stamp the monotonic receive time")
+        self.assertEqual(len({dataPoint.receiveTimeNs for dataPoint in firstBatch}), 1,
+                         "packets of one chunk share its receive time")
+        self.assertGreater(secondBatch[0].receiveTimeNs, firstBatch[0].receiveTimeNs)
+        self.assertTrue(reader.sampleClock().hasEstimate(), "should feed the sample clock")
+
+
+if __name__ == '__main__':
+    unittest.main()
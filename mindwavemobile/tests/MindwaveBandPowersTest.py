@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from mindwavemobile.MindwaveBandPowers import MindwaveBandPowers
+from mindwavemobile.MindwaveRawSampleColumns import MindwaveRawSampleColumns
+
+
+def sine(frequency, numberOfSamples, amplitude=100.0, sampleRate=512):
+    return amplitude * np.sin(2 * np.pi * frequency * np.arange(numberOfSamples) / sampleRate)
+
+
+class BandPowersTest(unittest.TestCase):
+    def testSinePowerIsInItsBand(self):
+        bandPowers = MindwaveBandPowers()
+        bandPowers.addRawValues(sine(11.0, 1024))
+        results = bandPowers.readBandPowers()
+        powers = np.concatenate([powers for powers, _ in results])
+        self.assertEqual(len(powers), 9, "should compute a window every 64 samples once 512 arrived")
+        highAlpha = bandPowers.bandNames().index("highAlpha")
+        self.assertTrue((powers.argmax(axis=1) == highAlpha).all(), "should put an 11 Hz sine into highAlpha")
+        # a sine of amplitude A has a power of A^2 / 2
+        np.testing.assert_allclose(powers.sum(axis=1), 100.0 ** 2 / 2, rtol=0.02)
+
+    def testSampleNumbersAreTheLastSampleOfEachWindow(self):
+        bandPowers = MindwaveBandPowers(windowSize=256, hopSize=32)
+        bandPowers.addRawValues(sine(6.0, 5000))
+        sampleNumbers = np.concatenate([sampleNumbers for _, sampleNumbers in bandPowers.readBandPowers()])
+        self.assertEqual(sampleNumbers.tolist(), list(range(255, 5000, 32)), "should number every window")
+
+    def testResultDoesNotDependOnTheBlockSize(self):
+        rawValues = np.random.default_rng(3).normal(0, 50, 3000).round()
+        singleSamples = MindwaveBandPowers(taper="hamming")
+        for rawValue in rawValues:
+            singleSamples.addRawValue(rawValue)
+        blocks = MindwaveBandPowers(taper="hamming")
+        for position in range(0, len(rawValues), 700):
+            blocks.addRawValues(rawValues[position:position + 700])
+        np.testing.assert_allclose(np.concatenate([powers for powers, _ in singleSamples.readBandPowers()]),
+                                   np.concatenate([powers for powers, _ in blocks.readBandPowers()]))
+
+    def testCanReceiveRawSampleColumnBlocks(self):
+        received = []
+        bandPowers = MindwaveBandPowers(onBandPowers=lambda powers, sampleNumbers: received.append(len(powers)))
+        rawSampleColumns = MindwaveRawSampleColumns(blockSize=128, onBlock=bandPowers.addRawValues)
+        for rawValue in sine(20.0, 1024).astype(int).tolist():
+            rawSampleColumns.addRawValueBytes((rawValue & 0xffff).to_bytes(2, "big"))
+        self.assertEqual(sum(received), 9, "should hand out every window")
+        self.assertEqual(bandPowers.readBandPowers(), [], "should not keep handed out results")
+
+
+if __name__ == '__main__':
+    unittest.main()
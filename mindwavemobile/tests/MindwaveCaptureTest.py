@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from mindwavemobile.MindwaveCapture import MindwaveCaptureRecorder, MindwaveCaptureReader, RecordingTransport
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import RawDataPoint
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+from mindwavemobile.MindwaveTransports import CaptureFileTransport
+
+CHUNK_SIZE = 1000
+
+
+def framePayloads(streamBytes):
+    return [bytes(payloadBytes) for payloadBytes, checkSumIsOk in MindwavePacketFramer().feed(streamBytes) if checkSumIsOk]
+
+
+class CaptureTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.capturePath = os.path.join(self.directory, "session.bin")
+        self.streamBytes = MindwaveStreamGenerator(seed=5, garbageRate=0.01).generateSeconds(5)
+        with MindwaveCaptureRecorder(self.capturePath, packetIndexInterval=100) as recorder:
+            for chunkNumber, position in enumerate(range(0, len(self.streamBytes), CHUNK_SIZE)):
+                recorder.recordChunk(self.streamBytes[position:position + CHUNK_SIZE], timestampNs=chunkNumber * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testCaptureKeepsEveryByte(self):
+        with MindwaveCaptureReader(self.capturePath) as captureReader:
+            self.assertEqual(bytes(captureReader.readBytes()), self.streamBytes, "should store the bytes as received")
+            payloads = [bytes(payloadBytes) for _, _, payloadBytes in captureReader.packets()]
+        self.assertEqual(payloads, framePayloads(self.streamBytes), "should find every packet again")
+
+    def testSeeksByPacketNumber(self):
+        payloads = framePayloads(self.streamBytes)
+        with MindwaveCaptureReader(self.capturePath) as captureReader:
+            for packetNumber in (0, 99, 100, 1234, len(payloads) - 1):
+                offset = captureReader.offsetOfPacket(packetNumber)
+                self.assertEqual(bytes(captureReader.readBytes(offset + 3, offset + 3 + len(payloads[packetNumber]))),
+                                 payloads[packetNumber], "should find packet {}".format(packetNumber))
+            self.assertIsNone(captureReader.offsetOfPacket(len(payloads)), "should not find packets after the end")
+            timedDataPoints = captureReader.dataPointsOfPackets(1000, 5)
+        self.assertEqual(len(timedDataPoints), 5, "should parse only the requested packets")
+
+    def testSeeksByTime(self):
+        with MindwaveCaptureReader(self.capturePath) as captureReader:
+            timedDataPoints = captureReader.dataPointsBetween(3000, 5000)
+            for timestampNs, _ in timedDataPoints:
+                self.assertTrue(3000 <= timestampNs < 5000, "should only return data points received in the window")
+            numberOfRawValues = sum(1 for _, dataPoint in timedDataPoints if isinstance(dataPoint, RawDataPoint))
+        # two chunks of 1000 bytes hold about 245 raw value packets of 8 bytes
+        self.assertGreater(numberOfRawValues, 200, "should return the packets of two chunks")
+
+    def testRecordingTransportRecordsWhatTheReaderReceives(self):
+        recordedPath = os.path.join(self.directory, "recorded.bin")
+        transport = RecordingTransport(CaptureFileTransport(self.capturePath), MindwaveCaptureRecorder(recordedPath))
+        dataPointReader = MindwaveDataPointReader(transport=transport)
+        dataPointReader.start()
+        try:
+            while (True):
+                dataPointReader.readDataPoints(timeout=1)
+        except IOError:
+            pass
+        dataPointReader.stop()
+        with open(recordedPath, "rb") as recordedFile:
+            self.assertEqual(recordedFile.read(), self.streamBytes, "should record the received bytes")
+        self.assertRaises(FileExistsError, MindwaveCaptureRecorder, recordedPath)
+
+
+if __name__ == '__main__':
+    unittest.main()
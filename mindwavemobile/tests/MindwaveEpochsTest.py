@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from mindwavemobile.MindwaveEpochs import MindwaveEpochs
+from mindwavemobile.MindwaveMarkers import MindwaveMarkers, readMarkerFile
+from mindwavemobile.MindwaveSampleClock import MindwaveSampleClock
+
+
+class EpochsTest(unittest.TestCase):
+    def testEpochsAreCutAroundTheirMarkers(self):
+        epochs = MindwaveEpochs(maximumEpochs=4, before=0.25, after=0.5, baseline=(-0.25, 0.0))
+        for sampleIndex, code in ((1000, 1), (3000, 2), (5000, 1)):
+            epochs.addMarkerAtSample(sampleIndex, code)
+        rawValues = np.arange(6000, dtype=np.int16)
+        for position in range(0, len(rawValues), 100):
+            epochs.addRawValues(rawValues[position:position + 100], np.arange(position, position + 100, dtype=np.uint64))
+        self.assertEqual(epochs.epochs().shape, (3, 1, 384), "should hold trials x channels x samples")
+        self.assertEqual(epochs.codes().tolist(), [1, 2, 1])
+        self.assertEqual(epochs.markerSamples().tolist(), [1000, 3000, 5000])
+        # a ramp minus the mean of its first 128 samples
+        expected = np.arange(872, 1256) - np.arange(872, 1000).mean()
+        np.testing.assert_allclose(epochs.epochs()[0, 0], expected)
+        self.assertEqual(epochs.times()[128], 0.0, "marker should be at time 0")
+
+    def testMarkerTimesAreTurnedIntoSamples(self):
+        sampleClock = MindwaveSampleClock()
+        sampleClock.addObservation(0, 10 ** 9)
+        epochs = MindwaveEpochs(maximumEpochs=2, sampleClock=sampleClock, before=0.0, after=0.25, baseline=None)
+        with MindwaveMarkers() as markers:
+            markers.addListener(epochs.addMarker)
+            thread = threading.Thread(target=markers.addMarker, args=(7,), kwargs={"timeNs": 10 ** 9 + 10 ** 9 // 2})
+            thread.start()
+            thread.join()
+        epochs.addRawValues(np.arange(2000))
+        self.assertEqual(epochs.markerSamples().tolist(), [256], "should find the sample half a second later")
+        self.assertEqual(epochs.epochs()[0, 0, 0], 256)
+
+    def testMarkersThatDoNotFitAreDropped(self):
+        epochs = MindwaveEpochs(maximumEpochs=1, before=1.0, after=1.0, historySeconds=2.0)
+        epochs.addRawValues(np.zeros(5000))
+        epochs.addMarkerAtSample(100, 1)
+        epochs.addMarkerAtSample(4000, 1)
+        epochs.addMarkerAtSample(4500, 1)
+        epochs.addRawValues(np.zeros(2000))
+        self.assertEqual(epochs.numberOfEpochs(), 1, "should keep the marker that fits")
+        self.assertEqual(epochs.droppedMarkerCount, 2, "should drop the old marker and the one without room")
+
+    def testMissingSamplesAreCountedNotFilled(self):
+        epochs = MindwaveEpochs(maximumEpochs=2, before=0.0, after=0.25, baseline=None)
+        epochs.addMarkerAtSample(90, 1)
+        epochs.addMarkerAtSample(150, 2)
+        epochs.addRawValues(np.arange(100), np.arange(100))
+        epochs.addRawValues(np.arange(110, 300), np.arange(110, 300))
+        self.assertEqual(epochs.missingSampleCount, 10)
+        self.assertEqual(epochs.droppedMarkerCount, 1, "should drop the epoch across the gap")
+        self.assertEqual(epochs.codes().tolist(), [2])
+        self.assertEqual(epochs.epochs()[0, 0].tolist(), list(range(150, 278)),
+                         "should keep the samples after the gap at their place")
+
+    def testMarkersAreWrittenToTheirFile(self):
+        path = os.path.join(tempfile.mkdtemp(), "session.bin.markers")
+        with MindwaveMarkers(path) as markers:
+            markers.addMarker(1, "derecha, pie", timeNs=5)
+            markers.addMarker(0, timeNs=9)
+        self.assertEqual([tuple(marker) for marker in readMarkerFile(path)], [(5, 1, "derecha, pie"), (9, 0, None)])
+        self.assertRaises(FileExistsError, MindwaveMarkers, path)
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
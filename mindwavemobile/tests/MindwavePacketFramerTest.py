@@ -0,0 +1,73 @@
+import unittest
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwaveStreamGenerator import buildPacket
+
+
+class PacketFramerTest(unittest.TestCase):
+    def framePackets(self, framer, chunk):
+        return [(bytes(payloadBytes), checkSumIsOk) for payloadBytes, checkSumIsOk in framer.feed(chunk)]
+
+    def testFindsAllPacketsInOneChunk(self):
+        chunk = buildPacket([0x80, 0x02, 0x01, 0x02]) + buildPacket([0x04, 0x25])
+        packets = self.framePackets(MindwavePacketFramer(), chunk)
+        self.assertEqual(packets, [(b"\x80\x02\x01\x02", True), (b"\x04\x25", True)],
+                         "should find both packets")
+
+    def testCarriesPartialPacketOverToNextChunk(self):
+        framer = MindwavePacketFramer()
+        packet = buildPacket([0x05, 0x35])
+        self.assertEqual(self.framePackets(framer, packet[:4]), [], "should wait for the rest of the packet")
+        self.assertEqual(self.framePackets(framer, packet[4:]), [(b"\x05\x35", True)],
+                         "should complete packet with the next chunk")
+
+    def testSkipsGarbageBetweenPackets(self):
+        chunk = b"\x01\xaa\x02" + buildPacket([0x02, 0x00]) + b"\xff\xfe" + buildPacket([0x16, 0x15])
+        packets = self.framePackets(MindwavePacketFramer(), chunk)
+        self.assertEqual(packets, [(b"\x02\x00", True), (b"\x16\x15", True)],
+                         "should ignore bytes outside of packets")
+
+    def testSyncSplitAcrossChunksIsFound(self):
+        framer = MindwavePacketFramer()
+        packet = buildPacket([0x04, 0x10])
+        self.assertEqual(self.framePackets(framer, b"\x00" + packet[:1]), [], "no packet yet")
+        self.assertEqual(self.framePackets(framer, packet[1:]), [(b"\x04\x10", True)],
+                         "should find sync spread over two chunks")
+
+    def testAdditionalSyncByteIsSkipped(self):
+        chunk = b"\xaa" + buildPacket([0x04, 0x10])
+        packets = self.framePackets(MindwavePacketFramer(), chunk)
+        self.assertEqual(packets, [(b"\x04\x10", True)], "should start packet after the last sync byte")
+
+    def testWrongCheckSumIsReported(self):
+        chunk = buildPacket([0x04, 0x10], checkSum=0x00)
+        packets = self.framePackets(MindwavePacketFramer(), chunk)
+        self.assertEqual(packets, [(b"\x04\x10", False)], "should flag the wrong checksum")
+
+    def testScanningResumesAfterFalseSyncWithWrongCheckSum(self):
+        framer = MindwavePacketFramer()
+        goodPacket = buildPacket([0x04, 0x25])
+        # the false packet announces two payload bytes, its checksum byte
+        # is the length byte of the real packet
+        packets = self.framePackets(framer, b"\xaa\xaa\x02" + goodPacket)
+        self.assertEqual(packets, [(b"\xaa\xaa", False), (b"\x04\x25", True)],
+                         "should find the packet inside the false one")
+        self.assertEqual((framer.badCheckSumCount, framer.resyncCount, framer.packetCount), (1, 1, 1),
+                         "should count the bad checksum and the resync")
+
+    def testImpossiblePayloadLengthIsSkipped(self):
+        framer = MindwavePacketFramer()
+        packets = self.framePackets(framer, b"\xaa\xaa\xc8" + buildPacket([0x05, 0x35]))
+        self.assertEqual(packets, [(b"\x05\x35", True)], "should not wait for 200 payload bytes")
+        self.assertEqual(framer.resyncCount, 1, "should count the resync")
+        self.assertEqual(framer.skippedByteCount, 3, "should count the bytes of the false sync")
+
+    def testLongRunOfBadPacketsDoesNotRecurse(self):
+        framer = MindwavePacketFramer()
+        badPackets = buildPacket([0x04, 0x10], checkSum=0x00) * 5000
+        for position in range(0, len(badPackets), 1000):
+            self.framePackets(framer, badPackets[position:position + 1000])
+        self.assertEqual(framer.badCheckSumCount, 5000, "should count every bad packet")
+
+
+if __name__ == '__main__':
+    unittest.main()
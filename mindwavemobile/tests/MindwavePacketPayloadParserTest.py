@@ -1,7 +1,9 @@
 import unittest
-from MindwavePacketPayloadParser import MindwavePacketPayloadParser
-from MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
-    MeditationDataPoint, AttentionDataPoint, EEGPowersDataPoint, BlinkDataPoint
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser,\
+    registerDataRowDecoder, DATA_ROW_DECODERS
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint,\
+    MeditationDataPoint, AttentionDataPoint, EEGPowersDataPoint, BlinkDataPoint,\
+    UnknownDataPoint
 
 
 
@@ -72,6 +74,84 @@ class ParseRawValueTest(unittest.TestCase):
         self.assertEqual(dataPoint.lowGamma, (0xaf << 16) | (0x13 << 8) | 0xbf, "lowGamma should be parsed correctly")
         self.assertEqual(dataPoint.midGamma, (0x0 << 16) | (0x1 << 8) | 0x0, "midGamma should be parsed correctly")
         
-        
+
+class DataRowDecoderTest(unittest.TestCase):
+    def tearDown(self):
+        DATA_ROW_DECODERS.pop(0x03, None)
+
+    def testRegisteredDecoderIsUsed(self):
+        registerDataRowDecoder(0x03, lambda dataValueBytes: ("heart rate", dataValueBytes[0]))
+        dataPoints = MindwavePacketPayloadParser([0x03, 0x48]).parseDataPoints()
+        self.assertEqual(dataPoints, [("heart rate", 0x48)], "should decode with the registered decoder")
+
+    def testValueBytesAreOnlyKeptWhenAskedFor(self):
+        payload = [0x80, 0x02, 0x60, 0x0]
+        dataPoint = MindwavePacketPayloadParser(payload).parseDataPoints()[0]
+        self.assertIsNone(dataPoint.dataValueBytes, "value bytes should not be kept by default")
+        dataPoint = MindwavePacketPayloadParser(payload, keepDataValueBytes=True).parseDataPoints()[0]
+        self.assertEqual(dataPoint.dataValueBytes, b"\x60\x00", "value bytes should be kept when asked for")
+
+    def testDataPointsHaveNoInstanceDictionary(self):
+        dataPoint = MindwavePacketPayloadParser([0x04, 0x25]).parseDataPoints()[0]
+        self.assertFalse(hasattr(dataPoint, "__dict__"), "data points should only use slots")
+
+    def testNegativeRawValueIsParsed(self):
+        dataPoint = MindwavePacketPayloadParser([0x80, 0x02, 0xff, 0x38]).parseDataPoints()[0]
+        self.assertEqual(dataPoint.rawValue, -200, "should parse two's complement raw value")
+
+
+class UnknownDataRowTest(unittest.TestCase):
+    def testUnknownSingleByteCodeBecomesUnknownDataPoint(self):
+        payloadParser = MindwavePacketPayloadParser([0x03, 0x48, 0x04, 0x25])
+        dataPoints = payloadParser.parseDataPoints()
+        self.assertIs(dataPoints[0].__class__, UnknownDataPoint, "unknown code should not stop parsing")
+        self.assertEqual((dataPoints[0].dataRowCode, dataPoints[0].dataValueBytes), (0x03, b"\x48"),
+                         "should keep code and value of unknown row")
+        self.assertIs(dataPoints[1].__class__, AttentionDataPoint, "should parse the row after the unknown one")
+        self.assertEqual(payloadParser.unknownDataRowCounts[(0, 0x03)], 1, "should count the unknown code")
+
+    def testUnknownMultiByteCodeUsesLengthByte(self):
+        dataPoints = MindwavePacketPayloadParser([0x86, 0x02, 0x01, 0x02, 0x05, 0x35]).parseDataPoints()
+        self.assertEqual(dataPoints[0].dataValueBytes, b"\x01\x02", "should read value of announced length")
+        self.assertEqual(dataPoints[1].meditationValue, 0x35, "should parse the row after the unknown one")
+
+    def testExtendedCodeLevelIsKept(self):
+        payloadParser = MindwavePacketPayloadParser([0x55, 0x55, 0x04, 0x11, 0x04, 0x25])
+        dataPoints = payloadParser.parseDataPoints()
+        self.assertIs(dataPoints[0].__class__, UnknownDataPoint, "extended code should not be taken for attention")
+        self.assertEqual(dataPoints[0].extendedCodeLevel, 2, "should count the extended code bytes")
+        self.assertEqual(dataPoints[1].attentionValue, 0x25, "should parse the following normal row")
+        self.assertEqual(payloadParser.unknownDataRowCounts[(2, 0x04)], 1, "should count per level and code")
+
+    def testTruncatedRowIsSkipped(self):
+        payloadParser = MindwavePacketPayloadParser([0x04, 0x25, 0x83, 0x18, 0x01])
+        dataPoints = payloadParser.parseDataPoints()
+        self.assertEqual(len(dataPoints), 1, "only the complete row should be parsed")
+        self.assertEqual(payloadParser.malformedDataRowCount, 1, "should count the cut off row")
+
+    def testShortRawValueRowIsMalformed(self):
+        for payload in ([0x80, 0x01, 0x05], [0x80, 0x00]):
+            payloadParser = MindwavePacketPayloadParser(payload)
+            dataPoints = payloadParser.parseDataPoints()
+            self.assertIs(dataPoints[0].__class__, UnknownDataPoint, "should not make up a raw value")
+            self.assertEqual(payloadParser.malformedDataRowCount, 1, "should count the short row")
+
+    def testShortEEGPowersRowIsMalformed(self):
+        payloadParser = MindwavePacketPayloadParser([0x83, 0x03, 0x01, 0x02, 0x03, 0x04, 0x25])
+        dataPoints = payloadParser.parseDataPoints()
+        self.assertIs(dataPoints[0].__class__, UnknownDataPoint, "should not make up EEG powers")
+        self.assertEqual(dataPoints[0].dataValueBytes, b"\x01\x02\x03", "should keep the short value")
+        self.assertEqual(dataPoints[1].attentionValue, 0x25, "should parse the row after the short one")
+        self.assertEqual(payloadParser.malformedDataRowCount, 1, "should count the short row")
+
+    def testCutOffFixedLengthRowsAreSkipped(self):
+        for payload in ([0x04, 0x25, 0x80, 0x02, 0x01], [0x04, 0x25, 0x05]):
+            payloadParser = MindwavePacketPayloadParser(payload)
+            dataPoints = payloadParser.parseDataPoints()
+            self.assertEqual([dataPoint.attentionValue for dataPoint in dataPoints], [0x25],
+                             "only the complete row should be parsed")
+            self.assertEqual(payloadParser.malformedDataRowCount, 1, "should count the cut off row")
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
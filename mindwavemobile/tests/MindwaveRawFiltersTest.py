@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from mindwavemobile.MindwaveRawFilters import MindwaveRawFilters, notchSection, dcBlockerSection, butterworthSections
+
+
+def filterOffline(signal, sections):
+    # the whole signal through every biquad, one sample at a time
+    for b0, b1, b2, a1, a2 in sections:
+        output, s1, s2 = [], 0.0, 0.0
+        for x in signal:
+            y = b0 * x + s1
+            s1 = b1 * x - a1 * y + s2
+            s2 = b2 * x - a2 * y
+            output.append(y)
+        signal = output
+    return np.array(signal)
+
+
+def sine(frequency, numberOfSamples, amplitude=100.0, sampleRate=512):
+    return amplitude * np.sin(2 * np.pi * frequency * np.arange(numberOfSamples) / sampleRate)
+
+
+class RawFiltersTest(unittest.TestCase):
+    def testBlocksGiveTheOfflineResult(self):
+        signal = np.random.default_rng(7).normal(300, 80, 3000).round()
+        sections = ([dcBlockerSection(0.5, 512), notchSection(60.0, 512)]
+                    + butterworthSections(1.0, 512, 4, highPass=True) + butterworthSections(40.0, 512, 4))
+        expected = filterOffline(signal, sections)
+        for blockSize in (1, 37, 512, 1500):
+            rawFilters = MindwaveRawFilters(notchFrequency=60.0, bandPass=(1.0, 40.0))
+            filtered = np.concatenate([rawFilters.filterBlock(signal[position:position + blockSize])
+                                       for position in range(0, len(signal), blockSize)])
+            np.testing.assert_allclose(filtered, expected, atol=1e-8, err_msg="block size {}".format(blockSize))
+
+    def testNotchAndBandPassRemoveTheirFrequencies(self):
+        rawFilters = MindwaveRawFilters(notchFrequency=50.0, bandPass=(1.0, 40.0))
+        filtered = rawFilters.filterBlock(sine(10.0, 5120) + sine(50.0, 5120) + sine(100.0, 5120) + 500)
+        # amplitudes after the filters settled, 0.2 Hz per bin
+        amplitudes = np.abs(np.fft.rfft(filtered[2560:])) * 2 / 2560
+        self.assertAlmostEqual(amplitudes[50], 100.0, delta=5.0, msg="should keep 10 Hz")
+        for bin in (0, 250, 500):
+            self.assertLess(amplitudes[bin], 2.0, "should remove {} Hz".format(bin / 5))
+
+    def testFilteredBlocksKeepTheirSampleNumbers(self):
+        rawFilters = MindwaveRawFilters()
+        sampleNumbers = np.arange(100, 200, dtype=np.uint64)
+        rawFilters.addRawValues(np.zeros(100, dtype=np.int16), sampleNumbers)
+        [(filteredValues, filteredSampleNumbers)] = rawFilters.readBlocks()
+        self.assertEqual(len(filteredValues), 100, "should filter the whole block")
+        self.assertIs(filteredSampleNumbers, sampleNumbers, "should hand out the sample numbers")
+        self.assertEqual(rawFilters.latencyReport()["blocks"], 1, "should measure every block")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from mindwavemobile.MindwaveRawSampleColumns import MindwaveRawSampleColumns
+from mindwavemobile.MindwaveDataPoints import AttentionDataPoint
+
+
+class RawSampleColumnsTest(unittest.TestCase):
+    def testRawValuesAreWrittenIntoColumns(self):
+        rawSampleColumns = MindwaveRawSampleColumns(blockSize=4)
+        payloadParser = MindwavePacketPayloadParser(rawSampleColumns=rawSampleColumns)
+        dataPoints = payloadParser.parseDataPoints([0x80, 0x02, 0x60, 0x00, 0x04, 0x25, 0x80, 0x02, 0xff, 0xfe])
+        self.assertEqual(len(dataPoints), 1, "only the attention value should become a data point")
+        self.assertIs(dataPoints[0].__class__, AttentionDataPoint, "should parse attention value")
+        rawSampleColumns.flush()
+        [(rawValues, sampleNumbers)] = rawSampleColumns.readBlocks()
+        self.assertEqual(rawValues.tolist(), [0x6000, -2], "should decode signed big-endian raw values")
+        self.assertEqual(sampleNumbers.tolist(), [0, 1], "should number the samples")
+
+    def testFullBlocksAreHandedOut(self):
+        blocks = []
+        rawSampleColumns = MindwaveRawSampleColumns(blockSize=2,
+            onBlock=lambda rawValues, sampleNumbers: blocks.append((rawValues.tolist(), sampleNumbers.tolist())))
+        payloadParser = MindwavePacketPayloadParser(rawSampleColumns=rawSampleColumns)
+        for rawValue in range(5):
+            payloadParser.parseDataPoints([0x80, 0x02, 0x00, rawValue])
+        self.assertEqual(blocks, [([0, 1], [0, 1]), ([2, 3], [2, 3])], "should hand out every full block")
+        self.assertEqual(rawSampleColumns.numberOfBufferedSamples(), 1, "last sample should wait for the next block")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import socket
+import threading
+import unittest
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveStreamGenerator import buildPacket
+from mindwavemobile.MindwaveTransports import SocketTransport
+from mindwavemobile.MindwaveReaderThread import BoundedDataPointQueue, MindwaveReaderThread,\
+    OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST
+
+
+class BoundedDataPointQueueTest(unittest.TestCase):
+    def testDropOldestKeepsNewestDataPoints(self):
+        dataPointQueue = BoundedDataPointQueue(3, OVERFLOW_DROP_OLDEST)
+        dataPointQueue.putAll(range(5))
+        self.assertEqual(dataPointQueue.getAll(), [2, 3, 4], "should keep the newest data points")
+        self.assertEqual(dataPointQueue.droppedDataPointCount, 2, "should count dropped data points")
+
+    def testDropNewestKeepsOldestDataPoints(self):
+        dataPointQueue = BoundedDataPointQueue(3, OVERFLOW_DROP_NEWEST)
+        dataPointQueue.putAll(range(5))
+        self.assertEqual(dataPointQueue.getAll(), [0, 1, 2], "should keep the oldest data points")
+        self.assertEqual(dataPointQueue.droppedDataPointCount, 2, "should count dropped data points")
+
+    def testBlockWaitsForConsumer(self):
+        dataPointQueue = BoundedDataPointQueue(2, OVERFLOW_BLOCK)
+        producer = threading.Thread(target=dataPointQueue.putAll, args=(range(6),))
+        producer.start()
+        receivedDataPoints = []
+        while (len(receivedDataPoints) < 6):
+            receivedDataPoints.extend(dataPointQueue.getAll(timeout=1))
+        producer.join(1)
+        self.assertEqual(receivedDataPoints, list(range(6)), "should pass every data point in order")
+        self.assertEqual(dataPointQueue.droppedDataPointCount, 0, "should not drop anything")
+
+    def testGetAllReturnsEmptyListAfterTimeout(self):
+        dataPointQueue = BoundedDataPointQueue(2)
+        self.assertEqual(dataPointQueue.getAll(timeout=0.01), [], "should give up after the timeout")
+
+    def testUnknownPolicyIsRejected(self):
+        self.assertRaises(ValueError, BoundedDataPointQueue, 2, "drop-everything")
+
+
+class ReaderThreadTest(unittest.TestCase):
+    def testReadingErrorClosesQueue(self):
+        def readDataPoints(timeout):
+            raise IOError("connection closed")
+        readerThread = MindwaveReaderThread(readDataPoints, BoundedDataPointQueue(10))
+        readerThread.start()
+        readerThread.join(1)
+        self.assertTrue(readerThread.dataPointQueue.isClosed(), "queue should be closed")
+        self.assertIsInstance(readerThread.error, IOError, "should keep the error for the consumer")
+
+    def testDataPointsAreQueuedUntilStopped(self):
+        batches = iter([[1, 2], [3]])
+        readerThread = MindwaveReaderThread(lambda timeout: next(batches, []), BoundedDataPointQueue(10))
+        readerThread.start()
+        receivedDataPoints = []
+        while (len(receivedDataPoints) < 3):
+            receivedDataPoints.extend(readerThread.dataPointQueue.getAll(timeout=1))
+        readerThread.stop(1)
+        self.assertEqual(receivedDataPoints, [1, 2, 3], "should queue the data points in order")
+        self.assertFalse(readerThread.is_alive(), "thread should end after stop")
+
+
+class BackgroundDataPointReaderTest(unittest.TestCase):
+    def testReadDataPointsRaisesOnceTheTransportDied(self):
+        serverSocket = socket.create_server(("127.0.0.1", 0))
+
+        def serve():
+            # sends a few raw values, then the headset goes away
+            connection, _ = serverSocket.accept()
+            with connection:
+                connection.sendall(b"".join(buildPacket([0x80, 0x02, 0x00, rawValue]) for rawValue in range(10)))
+
+        serverThread = threading.Thread(target=serve, daemon=True)
+        serverThread.start()
+        dataPointReader = MindwaveDataPointReader(readInBackground=True,
+                                                  transport=SocketTransport(serverSocket.getsockname()))
+        dataPointReader.start()
+        rawValues = []
+        with self.assertRaises(IOError):
+            # bounded, a closed queue must not keep returning empty lists
+            for _ in range(1000):
+                rawValues.extend(dataPoint.rawValue for dataPoint in dataPointReader.readDataPoints(timeout=1))
+        dataPointReader.stop()
+        serverThread.join(1)
+        serverSocket.close()
+        self.assertEqual(rawValues, list(range(10)), "should hand out everything read before the error")
+
+
+if __name__ == '__main__':
+    unittest.main()
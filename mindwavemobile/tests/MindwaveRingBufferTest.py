@@ -0,0 +1,41 @@
+import unittest
+from mindwavemobile.MindwaveRingBuffer import MindwaveRingBuffer
+
+
+class RingBufferTest(unittest.TestCase):
+    def testWrittenBytesCanBeReadBack(self):
+        ringBuffer = MindwaveRingBuffer(16)
+        ringBuffer.write(b"\xaa\xaa\x04")
+        self.assertEqual(ringBuffer.size(), 3, "should contain the written bytes")
+        self.assertEqual(ringBuffer.byteAt(2), 0x04, "should read the third byte")
+        self.assertEqual(bytes(ringBuffer.readableView()), b"\xaa\xaa\x04", "view should show unread bytes")
+
+    def testConsumedBytesAreNotReadable(self):
+        ringBuffer = MindwaveRingBuffer(16)
+        ringBuffer.write(b"\x01\x02\x03\x04")
+        ringBuffer.consume(3)
+        self.assertEqual(bytes(ringBuffer.readableView()), b"\x04", "only unread byte should remain")
+
+    def testUnreadBytesAreMovedToStartWhenEndIsReached(self):
+        ringBuffer = MindwaveRingBuffer(8)
+        ringBuffer.write(b"\x01\x02\x03\x04\x05\x06")
+        ringBuffer.consume(5)
+        ringBuffer.write(b"\x07\x08\x09\x0a")
+        self.assertEqual(bytes(ringBuffer.readableView()), b"\x06\x07\x08\x09\x0a",
+                         "unread bytes should stay contiguous after reaching the end")
+
+    def testWritingMoreThanFreeSpaceFails(self):
+        ringBuffer = MindwaveRingBuffer(4)
+        ringBuffer.write(b"\x01\x02\x03")
+        self.assertRaises(BufferError, ringBuffer.write, b"\x04\x05")
+
+    def testFindSearchesOnlyUnreadBytes(self):
+        ringBuffer = MindwaveRingBuffer(16)
+        ringBuffer.write(b"\xaa\xaa\x01\x02\xaa\xaa")
+        ringBuffer.consume(1)
+        self.assertEqual(ringBuffer.find(b"\xaa\xaa"), 3, "should find second sync relative to read position")
+        self.assertEqual(ringBuffer.find(b"\x55"), -1, "should not find missing bytes")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, EEGPowersDataPoint
+from mindwavemobile.MindwaveSampleClock import MindwaveSampleClock
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator
+from mindwavemobile.MindwaveTransports import CaptureFileTransport
+
+
+class SampleClockTest(unittest.TestCase):
+    def testEstimatesDriftFromLateBursts(self):
+        # headset 150 ppm fast, samples arrive in bursts of 32 up to 30 ms late
+        random = np.random.default_rng(1)
+        periodNs = 1e9 / (512 * (1 + 150e-6))
+        startNs = 5 * 10 ** 12
+        sampleClock = MindwaveSampleClock()
+        for lastSample in range(31, 512 * 120, 32):
+            delayNs = 2e6 + random.exponential(5e6)
+            sampleClock.addObservation(lastSample, int(startNs + lastSample * periodNs + delayNs))
+        self.assertAlmostEqual(sampleClock.driftPpm(), 150, delta=5)
+        sampleNumbers = np.arange(512 * 100, 512 * 110, dtype=np.uint64)
+        errorsNs = sampleClock.timesOfSamples(sampleNumbers) - (startNs + sampleNumbers * periodNs)
+        # late by the minimum delay of 2 ms, for every sample alike
+        self.assertTrue((np.abs(errorsNs - 2e6) < 0.5e6).all(), "should reconstruct the sample times")
+        self.assertEqual(sampleClock.timeOfSample(512 * 100), sampleClock.timesOfSamples([512 * 100])[0])
+
+    def testHasNoEstimateWithoutObservations(self):
+        sampleClock = MindwaveSampleClock()
+        self.assertIsNone(sampleClock.timeOfSample(0), "should not guess a time")
+        sampleClock.addObservation(10, 10 ** 9)
+        self.assertEqual(sampleClock.timeOfSample(11) - sampleClock.timeOfSample(10), round(1e9 / 512))
+
+    def testReaderIsImportedWithoutNumpy(self):
+        # numpy is an optional extra, the reader and its sample clock must work without it
+        script = ("import sys; sys.modules['numpy'] = None\n"
+                  "from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader\n"
+                  "from mindwavemobile.MindwaveSampleClock import MindwaveSampleClock\n"
+                  "sampleClock = MindwaveSampleClock()\n"
+                  "for second in range(1, 4): sampleClock.addObservation(512 * second, second * 10 ** 9)\n"
+                  "assert sampleClock.timeOfSample(1024) == 2 * 10 ** 9\n")
+        projectDirectory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run([sys.executable, "-c", script], cwd=projectDirectory, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def testReaderStampsDataPoints(self):
+        captureFile = tempfile.NamedTemporaryFile(delete=False)
+        captureFile.write(MindwaveStreamGenerator(seed=2).generateSeconds(3))
+        captureFile.close()
+        dataPointReader = MindwaveDataPointReader(transport=CaptureFileTransport(captureFile.name, chunkSize=256))
+        dataPointReader.start()
+        dataPoints = []
+        try:
+            while (True):
+                dataPoints.extend(dataPointReader.readDataPoints(timeout=1))
+        except IOError:
+            pass
+        dataPointReader.stop()
+        os.remove(captureFile.name)
+        rawDataPoints = [dataPoint for dataPoint in dataPoints if isinstance(dataPoint, RawDataPoint)]
+        self.assertEqual([dataPoint.sampleIndex for dataPoint in rawDataPoints], list(range(len(rawDataPoints))),
+                         "should number the raw samples")
+        receiveTimes = [dataPoint.receiveTimeNs for dataPoint in dataPoints]
+        self.assertEqual(receiveTimes, sorted(receiveTimes), "should stamp packets in the order they arrived")
+        for dataPoint in dataPoints:
+            if isinstance(dataPoint, EEGPowersDataPoint):
+                self.assertEqual(dataPoint.sampleIndex % 512, 0, "should point at the next raw sample")
+        self.assertTrue(dataPointReader.sampleClock().hasEstimate(), "should feed the sample clock")
+
+
+if __name__ == '__main__':
+    unittest.main()
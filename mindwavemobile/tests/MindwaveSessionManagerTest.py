@@ -0,0 +1,121 @@
+import time
+import unittest
+from mindwavemobile.MindwaveSessionManager import MindwaveSessionManager
+
+
+class FakeReader:
+    # Returns prepared batches, one per call, with a pause before each.
+    def __init__(self, batches, pause):
+        self._batches = list(batches)
+        self._pause = pause
+        self._connected = False
+        self.stopped = False
+
+    def start(self):
+        self._connected = True
+
+    def stop(self):
+        self.stopped = True
+        self._connected = False
+
+    def isConnected(self):
+        return self._connected
+
+    def readDataPoints(self, maxDataPoints=None, timeout=None):
+        time.sleep(self._pause)
+        if (len(self._batches) == 0):
+            self._connected = False
+            return []
+        return self._batches.pop(0)
+
+    def statistics(self):
+        return {"badCheckSums": 0}
+
+
+class SlowlyConnectingReader(FakeReader):
+    # connects after a while, whether stop() was called or not
+    def start(self):
+        time.sleep(0.2)
+        self._connected = True
+
+
+class StampedDataPoint:
+    def __init__(self, name, receiveTimeNs):
+        self.name = name
+        self.receiveTimeNs = receiveTimeNs
+
+
+class SessionManagerTest(unittest.TestCase):
+    def createSessionManager(self):
+        fakeReaders = {
+            "first": FakeReader([["a1"], ["a2"], ["a3"]], 0.03),
+            "second": FakeReader([["b1", "b2"], ["b3"]], 0.05),
+        }
+        return MindwaveSessionManager(["first", "second"], alignmentDelay=0.01,
+                                      readerFactory=lambda address: fakeReaders[address])
+
+    def readUntilFinished(self, sessionManager):
+        mergedDataPoints = []
+        while (True):
+            dataPoints = sessionManager.readDataPoints(timeout=1)
+            if (len(dataPoints) == 0):
+                return mergedDataPoints
+            mergedDataPoints.extend(dataPoints)
+
+    def testStreamsAreMergedInTimeOrder(self):
+        sessionManager = self.createSessionManager()
+        sessionManager.start()
+        mergedDataPoints = self.readUntilFinished(sessionManager)
+        sessionManager.stop(1)
+        timestamps = [timestampNs for timestampNs, _, _ in mergedDataPoints]
+        self.assertEqual(timestamps, sorted(timestamps), "data points should be ordered by receive time")
+        self.assertEqual(sorted(dataPoint for _, _, dataPoint in mergedDataPoints),
+                         ["a1", "a2", "a3", "b1", "b2", "b3"], "should contain every data point once")
+        self.assertEqual([dataPoint for _, address, dataPoint in mergedDataPoints if address == "second"],
+                         ["b1", "b2", "b3"], "should keep the order of each headset")
+
+    def testStreamsAreMergedByReceiveTime(self):
+        # batches arrive at the same time, their data points were received in turns
+        startTimeNs = time.monotonic_ns()
+        fakeReaders = {
+            "first": FakeReader([[StampedDataPoint("a1", startTimeNs + 1), StampedDataPoint("a2", startTimeNs + 3)]], 0.02),
+            "second": FakeReader([[StampedDataPoint("b1", startTimeNs + 2), StampedDataPoint("b2", startTimeNs + 4)]], 0.02),
+        }
+        # held back until both batches arrived
+        sessionManager = MindwaveSessionManager(["first", "second"], alignmentDelay=0.2,
+                                                readerFactory=lambda address: fakeReaders[address])
+        sessionManager.start()
+        mergedDataPoints = self.readUntilFinished(sessionManager)
+        sessionManager.stop(1)
+        self.assertEqual([dataPoint.name for _, _, dataPoint in mergedDataPoints], ["a1", "b1", "a2", "b2"])
+        self.assertEqual(mergedDataPoints[0][0], startTimeNs + 1, "should use the receive time as timestamp")
+
+    def testStopStopsEveryReader(self):
+        fakeReaders = {"first": FakeReader([], 0.01), "second": FakeReader([], 0.01)}
+        sessionManager = MindwaveSessionManager(["first", "second"],
+                                                readerFactory=lambda address: fakeReaders[address])
+        sessionManager.start()
+        sessionManager.stop(1)
+        self.assertTrue(all(fakeReader.stopped for fakeReader in fakeReaders.values()),
+                        "should close the transport of every headset")
+
+    def testReaderConnectingAfterStopIsStopped(self):
+        fakeReader = SlowlyConnectingReader([], 0.01)
+        sessionManager = MindwaveSessionManager(["first"], readerFactory=lambda address: fakeReader)
+        sessionManager.start()
+        sessionManager.stop(1)
+        self.assertFalse(fakeReader.isConnected(), "should close a connection opened after stop")
+
+    def testStatisticsArePerDevice(self):
+        sessionManager = self.createSessionManager()
+        sessionManager.start()
+        self.readUntilFinished(sessionManager)
+        sessionManager.stop(1)
+        statistics = sessionManager.statistics()
+        self.assertEqual(statistics["first"]["dataPoints"], 3, "should count data points of first headset")
+        self.assertEqual(statistics["second"]["dataPoints"], 3, "should count data points of second headset")
+        self.assertEqual(statistics["second"]["droppedDataPoints"], 0, "should not drop anything")
+
+
+if __name__ == '__main__':
+    unittest.main()
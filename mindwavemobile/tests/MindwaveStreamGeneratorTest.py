@@ -0,0 +1,68 @@
+import unittest
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveDataPoints import RawDataPoint, EEGPowersDataPoint, BlinkDataPoint
+from mindwavemobile.MindwavePacketFramer import MindwavePacketFramer
+from mindwavemobile.MindwavePacketPayloadParser import MindwavePacketPayloadParser
+from mindwavemobile.MindwaveStreamGenerator import MindwaveStreamGenerator, MindwaveStreamServer
+from mindwavemobile.MindwaveTransports import SocketTransport
+
+
+def parseStream(streamBytes):
+    framer = MindwavePacketFramer()
+    payloadParser = MindwavePacketPayloadParser()
+    dataPoints = []
+    for payloadBytes, checkSumIsOk in framer.feed(streamBytes):
+        if (checkSumIsOk):
+            dataPoints.extend(payloadParser.parseDataPoints(payloadBytes))
+    return framer, dataPoints
+
+
+def countDataPoints(dataPoints, dataPointClass):
+    return sum(1 for dataPoint in dataPoints if isinstance(dataPoint, dataPointClass))
+
+
+class StreamGeneratorTest(unittest.TestCase):
+    def testCleanStreamHasEveryDataPoint(self):
+        generator = MindwaveStreamGenerator(seed=1, blinkInterval=2)
+        framer, dataPoints = parseStream(generator.generateSeconds(4))
+        self.assertEqual(countDataPoints(dataPoints, RawDataPoint), 4 * 512, "should send 512 raw values per second")
+        self.assertEqual(countDataPoints(dataPoints, EEGPowersDataPoint), 4, "should send EEG powers every second")
+        self.assertEqual(countDataPoints(dataPoints, BlinkDataPoint), 2, "should blink every other second")
+        self.assertEqual(framer.badCheckSumCount + framer.skippedByteCount, 0, "should not corrupt anything")
+
+    def testSameSeedGivesSameStream(self):
+        self.assertEqual(MindwaveStreamGenerator(seed=7).generateSeconds(1),
+                         MindwaveStreamGenerator(seed=7).generateSeconds(1), "should be reproducible")
+
+    def testFramerSurvivesInjectedCorruption(self):
+        generator = MindwaveStreamGenerator(seed=3, badCheckSumRate=0.01, truncatedPacketRate=0.01, garbageRate=0.02)
+        framer, dataPoints = parseStream(generator.generateSeconds(10))
+        corruptedPackets = generator.badCheckSumCount + generator.truncatedPacketCount
+        self.assertGreater(corruptedPackets, 0, "should have injected corruption")
+        self.assertGreater(generator.garbageByteCount, 0, "should have injected garbage")
+        self.assertGreaterEqual(framer.badCheckSumCount, generator.badCheckSumCount, "should notice bad checksums")
+        # a truncated packet may take the packet after it along
+        self.assertGreaterEqual(framer.packetCount, generator.packetCount - corruptedPackets - generator.truncatedPacketCount,
+                                "should find every intact packet")
+
+
+class StreamServerTest(unittest.TestCase):
+    def testReaderReceivesServedStream(self):
+        server = MindwaveStreamServer(lambda: MindwaveStreamGenerator(seed=2), speed=None, seconds=3)
+        server.start()
+        dataPointReader = MindwaveDataPointReader(transport=SocketTransport(server.address()))
+        dataPointReader.start()
+        dataPoints = []
+        try:
+            while (True):
+                dataPoints.extend(dataPointReader.readDataPoints(timeout=1))
+        except IOError:
+            # the server closes the connection at the end of the stream
+            pass
+        dataPointReader.stop()
+        server.stop(1)
+        self.assertEqual(countDataPoints(dataPoints, RawDataPoint), 3 * 512, "should receive the whole stream")
+
+
+if __name__ == '__main__':
+    unittest.main()
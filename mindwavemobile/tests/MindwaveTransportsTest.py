@@ -0,0 +1,141 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+import unittest.mock
+from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveStreamGenerator import buildPacket
+from mindwavemobile.MindwaveTransports import CaptureFileTransport, SocketTransport, RfcommTransport
+
+
+def buildRawValuePacket(rawValue):
+    return buildPacket(bytes([0x80, 0x02]) + (rawValue & 0xffff).to_bytes(2, "big"))
+
+
+def buildStream(numberOfPackets):
+    return b"".join(buildRawValuePacket(i - 1000) for i in range(numberOfPackets))
+
+
+def readAllRawValues(dataPointReader):
+    rawValues = []
+    try:
+        while (True):
+            dataPoints = dataPointReader.readDataPoints(timeout=1)
+            if (len(dataPoints) == 0):
+                break
+            rawValues.extend(dataPoint.rawValue for dataPoint in dataPoints)
+    except IOError:
+        # end of the stream
+        pass
+    return rawValues
+
+
+class CaptureFileTransportTest(unittest.TestCase):
+    def setUp(self):
+        captureFile = tempfile.NamedTemporaryFile(delete=False)
+        captureFile.write(buildStream(3000))
+        captureFile.close()
+        self.capturePath = captureFile.name
+
+    def tearDown(self):
+        os.remove(self.capturePath)
+
+    def testReplaysAllPacketsInOrder(self):
+        dataPointReader = MindwaveDataPointReader(transport=CaptureFileTransport(self.capturePath))
+        dataPointReader.start()
+        rawValues = readAllRawValues(dataPointReader)
+        dataPointReader.stop()
+        self.assertEqual(rawValues, [i - 1000 for i in range(3000)], "should replay every raw value in order")
+        self.assertEqual(dataPointReader.statistics()["badCheckSums"], 0, "should not see broken packets")
+
+    def testPacedReplayWaitsForBytes(self):
+        transport = CaptureFileTransport(self.capturePath, speed=1.0, bytesPerSecond=1000)
+        transport.connect()
+        self.assertTrue(transport.waitForBytes(0.1), "should have bytes after the first millisecond")
+        freeBuffer = bytearray(4096)
+        self.assertLess(transport.receiveInto(memoryview(freeBuffer)), 500, "should not hand out the whole file at once")
+        transport.close()
+
+
+class SocketTransportTest(unittest.TestCase):
+    def testReadsPacketsFromLocalServer(self):
+        streamBytes = buildStream(3000)
+        serverSocket = socket.create_server(("127.0.0.1", 0))
+
+        def serve():
+            connection, _ = serverSocket.accept()
+            with connection:
+                for position in range(0, len(streamBytes), 777):
+                    connection.sendall(streamBytes[position:position + 777])
+
+        serverThread = threading.Thread(target=serve, daemon=True)
+        serverThread.start()
+        dataPointReader = MindwaveDataPointReader(transport=SocketTransport(serverSocket.getsockname()))
+        dataPointReader.start()
+        rawValues = readAllRawValues(dataPointReader)
+        dataPointReader.stop()
+        serverThread.join(1)
+        serverSocket.close()
+        self.assertEqual(rawValues, [i - 1000 for i in range(3000)], "should read every raw value in order")
+
+    def testClosedTransportDoesNotConnect(self):
+        serverSocket = socket.create_server(("127.0.0.1", 0))
+        transport = SocketTransport(serverSocket.getsockname())
+        transport.close()
+        transport.connect()
+        serverSocket.close()
+        self.assertFalse(transport.isConnected(), "should not open a socket after close")
+
+
+def createUnreachableBluetoothModule():
+    # stands in for pybluez, every connection attempt fails
+    class BluetoothError(OSError):
+        pass
+
+    class BluetoothSocket:
+        def __init__(self, protocol):
+            self.closed = False
+
+        def connect(self, address):
+            raise BluetoothError("Host is down")
+
+        def close(self):
+            self.closed = True
+
+    bluetooth = types.ModuleType("bluetooth")
+    bluetooth.RFCOMM = 3
+    bluetooth.BluetoothSocket = BluetoothSocket
+    bluetooth.btcommon = types.SimpleNamespace(BluetoothError=BluetoothError)
+    return bluetooth
+
+
+class RfcommTransportTest(unittest.TestCase):
+    def testCloseEndsConnectRetries(self):
+        transport = RfcommTransport(address="9C:B7:0D:72:CD:02")
+        with unittest.mock.patch.dict(sys.modules, {"bluetooth": createUnreachableBluetoothModule()}):
+            with unittest.mock.patch("builtins.print"):
+                connectThread = threading.Thread(target=transport.connect, daemon=True)
+                connectThread.start()
+                time.sleep(0.1)
+                closeTime = time.monotonic()
+                transport.close()
+                connectThread.join(2)
+        self.assertFalse(connectThread.is_alive(), "connect should give up once the transport is closed")
+        self.assertLess(time.monotonic() - closeTime, 1, "should not wait for the next retry")
+        self.assertFalse(transport.isConnected())
+        self.assertTrue(transport.mindwaveMobileSocket.closed, "should close the socket")
+
+    def testClosedTransportDoesNotConnect(self):
+        transport = RfcommTransport(address="9C:B7:0D:72:CD:02")
+        transport.close()
+        with unittest.mock.patch.dict(sys.modules, {"bluetooth": createUnreachableBluetoothModule()}):
+            transport.connect()
+        self.assertIsNone(transport.mindwaveMobileSocket, "should not create a socket after close")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,13 +3,12 @@
 
 # TO-DO LIST
 # - Add a periodic visual or sound alarm and set an amount of time the MindWave will run.
-# - Implement digital filters.
 
 # This module reads data from the Mindwave Mobile EEG headset and prints it 
 # to the console. It connects to the headset, reads data points, 
 # and displays the values for:
 # - EEG Power Bands (Delta, Theta, Low Alpha, High Alpha, Low Beta, High Beta, Low Gamma, Mid Gamma)
-# - Raw Data
+# - Raw Data (also filtered, see MindwaveRawFilters.py)
 # - Meditation
 # - Attention
 # - Amount of Noise (also known as Poor Signal Level)
@@ -19,6 +18,7 @@ import time
 import bluetooth
 from mindwavemobile.MindwaveDataPoints import RawDataPoint, PoorSignalLevelDataPoint, AttentionDataPoint, MeditationDataPoint, BlinkDataPoint, EEGPowersDataPoint
 from mindwavemobile.MindwaveDataPointReader import MindwaveDataPointReader
+from mindwavemobile.MindwaveRawFilters import MindwaveRawFilters
 
 # Main execution block.
 
@@ -32,7 +32,13 @@ if __name__ == '__main__':
         # Initialize all variables
         rawValue = attention = meditation = amountOfNoise = blink = None
         delta = theta = lowAlpha = highAlpha = lowBeta = highBeta = lowGamma = midGamma = None
-        data_header = "eeg_power;raw_value;attention;meditation;amount_of_noise"
+        data_header = "eeg_power;raw_value;filtered_raw_value;attention;meditation;amount_of_noise"
+
+        # DC removal, 50 Hz notch and 1-45 Hz band-pass. The raw values
+        # received between two EEG power packets are filtered as one block.
+        rawFilters = MindwaveRawFilters(notchFrequency=50.0, bandPass=(1.0, 45.0))
+        rawValues = []
+        filteredRawValue = None
 
         # Print Header
         # eeg_power = [Delta,Theta,LowAlpha,HighAlpha,LowBeta,HighBeta,LowGamma,MidGamma]
@@ -40,44 +46,50 @@ if __name__ == '__main__':
 
         # Endless read cycle
         while(True):
-            # DataPoint is the class that reads the next data point from the headset.
-            dataPoint = mindwaveDataPointReader.readNextDataPoint()
-
-            # Checks if the dataPoint object belongs to one of the specified
-            # data point classes. If the dataPoint is an instance of one 
-            # of these classes, the code then proceeds to extract 
-            # the specific data value from that data point object.
-            if isinstance(dataPoint, (PoorSignalLevelDataPoint, AttentionDataPoint, 
-                                      MeditationDataPoint, BlinkDataPoint, 
-                                      RawDataPoint, EEGPowersDataPoint)):
+            # Reads all the data points parsed from the bytes received so far,
+            # in the same order the headset sent them.
+            for dataPoint in mindwaveDataPointReader.readDataPoints():
+
+                # Checks if the dataPoint object belongs to one of the specified
+                # data point classes. If the dataPoint is an instance of one 
+                # of these classes, the code then proceeds to extract 
+                # the specific data value from that data point object.
+                if isinstance(dataPoint, (PoorSignalLevelDataPoint, AttentionDataPoint, 
+                                          MeditationDataPoint, BlinkDataPoint, 
+                                          RawDataPoint, EEGPowersDataPoint)):
         
-                if isinstance(dataPoint, PoorSignalLevelDataPoint):
-                    amountOfNoise = dataPoint.amountOfNoise
+                    if isinstance(dataPoint, PoorSignalLevelDataPoint):
+                        amountOfNoise = dataPoint.amountOfNoise
+
+                    elif isinstance(dataPoint, AttentionDataPoint):
+                        attention = dataPoint.attentionValue
 
-                elif isinstance(dataPoint, AttentionDataPoint):
-                    attention = dataPoint.attentionValue
+                    elif isinstance(dataPoint, MeditationDataPoint):
+                        meditation = dataPoint.meditationValue
 
-                elif isinstance(dataPoint, MeditationDataPoint):
-                    meditation = dataPoint.meditationValue
+                    elif isinstance(dataPoint, BlinkDataPoint):
+                        blink = dataPoint.blinkValue
 
-                elif isinstance(dataPoint, BlinkDataPoint):
-                    blink = dataPoint.blinkValue
+                    elif isinstance(dataPoint, RawDataPoint):
+                        rawValue = dataPoint.rawValue
+                        rawValues.append(rawValue)
 
-                elif isinstance(dataPoint, RawDataPoint):
-                    rawValue = dataPoint.rawValue
+                    elif isinstance(dataPoint, EEGPowersDataPoint):
+                        delta, theta = dataPoint.delta, dataPoint.theta 
+                        lowAlpha, highAlpha = dataPoint.lowAlpha, dataPoint.highAlpha
+                        lowBeta, highBeta = dataPoint.lowBeta, dataPoint.highBeta
+                        lowGamma, midGamma = dataPoint.lowGamma, dataPoint.midGamma
 
-                elif isinstance(dataPoint, EEGPowersDataPoint):
-                    delta, theta = dataPoint.delta, dataPoint.theta 
-                    lowAlpha, highAlpha = dataPoint.lowAlpha, dataPoint.highAlpha
-                    lowBeta, highBeta = dataPoint.lowBeta, dataPoint.highBeta
-                    lowGamma, midGamma = dataPoint.lowGamma, dataPoint.midGamma
+                        if rawValues:
+                            filteredRawValue = round(rawFilters.filterBlock(rawValues)[-1], 2)
+                            rawValues = []
                     
-                    # Prints on console all data collected in a cycle.
-                    print(
-                        f"[{delta},{theta},{lowAlpha},{highAlpha},"\
-                        f"{lowBeta},{highBeta},{lowGamma},{midGamma}];"\
-                        f"{rawValue};{attention};{meditation};{amountOfNoise}"
-                    )
+                        # Prints on console all data collected in a cycle.
+                        print(
+                            f"[{delta},{theta},{lowAlpha},{highAlpha},"\
+                            f"{lowBeta},{highBeta},{lowGamma},{midGamma}];"\
+                            f"{rawValue};{filteredRawValue};{attention};{meditation};{amountOfNoise}"
+                        )
     
     # Error message when device is not connected or couldn't be found.
     else:
@@ -10,4 +10,7 @@ setup(name='mindwavemobile',
       install_requires=[
           'pybluez',
       ],
+      extras_require={
+          'numpy': ['numpy'],
+      },
       zip_safe=False)